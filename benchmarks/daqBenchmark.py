@@ -0,0 +1,289 @@
+
+from __future__ import print_function
+
+#
+# End-to-end throughput benchmark of daqIDEA with synthetic samples from
+# fakeDaq through the fakeConnect controllers, so it runs without winIDEA,
+# DAQ hardware and isystem.connect, e.g. in CI (Linux: set 
+# QT_QPA_PLATFORM=offscreen without a display):
+#
+#   python benchmarks/daqBenchmark.py [--variables N] [--rate HZ] [--samples N]
+#                                     [--table-window all|chart|last]
+#                                     [--save FILE] [--compare FILE] [--tolerance F]
+#
+# The samples are acquired through the real application window, so the
+# DAQ configuration, the reader thread, the ingest and frame timers, the
+# data table and the charts all run like in a live acquisition. The
+# variables are sampled at
+# the same times, with the defaults the data table has 1M rows. With 
+# --compare the results are checked against a run saved with --save, the
+# exit code is 1 if one of them got worse by more than the tolerance.
+#
+
+import os, sys, time, json, random, argparse, tempfile
+
+# The fake controllers are used even if isystem.connect is installed, see 
+# iconnect
+os.environ['DAQIDEA_FAKE_CONNECT'] = '1'
+
+# The modules of the application are in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import globals
+
+# Logging and properties of the application go to the winIDEA application
+# data directory
+if not os.path.isdir(globals.appDataISystem):
+    os.makedirs(globals.appDataISystem)
+
+from PyQt5 import QtCore, QtWidgets
+import daqIDEA, daqManager, fakeDaq, fakeConnect, exporters, variableConfiguration, pipelineStats
+
+# Name, unit and True if larger is better of every result
+BENCHMARKS = [('ingest', 'samples/s', True),
+              ('chartFrame', 'ms', False),
+              ('chartBlit', 'ms', False),
+              ('tableScroll', 'ms', False),
+              ('tablePublish', 'ms', False),
+              ('tableFormat', 'ms', False),
+              ('exportCsv', 'rows/s', True),
+              ('exportExcel', 'rows/s', True)]
+
+# Rows of the Excel export, it is much slower than the others
+EXCEL_BENCHMARK_ROWS = 50000
+
+# Data table modes of --table-window
+TABLE_WINDOW_MODES = {'all': globals.TABLE_WINDOW_ALL,
+                      'chart': globals.TABLE_WINDOW_CHART,
+                      'last': globals.TABLE_WINDOW_LAST_ROWS}
+
+
+#
+# Returns the application window connected to a fakeDaq.FakeTarget sampling
+# the signals as fast as they are read
+#
+def createWindow(signals):
+    target = fakeDaq.FakeTarget(signals, speed=None)
+    
+    window = daqIDEA.ApplicationWindow()
+    window.guiSetup()
+    window.daqIdeaConfig = variableConfiguration.ApplicationConfiguration()
+    window.daqManager = daqManager.DaqManager(fakeConnect.ConnectionMgr(target))
+    window.initVariableTableGui()
+    window.initVariableTableGui(fakeDaq.createConfiguration(signals))
+    for varConfig in window.daqIdeaConfig.variableConfigs:
+        varConfig.variable = window.daqManager.getVariableByName(varConfig.name)
+    window.resize(1280, 800)
+    window.show()
+    return window
+
+
+def getSampleCount(dm):
+    return sum(len(store) for store in dm.getRawData())
+
+
+#
+# Acquires sampleCount samples at maximum speed through the GUI timers.
+# Returns samples per second.
+#
+def benchmarkIngest(app, window, signals, sampleCount):
+    dm = window.daqManager
+
+    start = time.time()
+    window.chartPlayButtonPressed()
+    while getSampleCount(dm) < sampleCount:
+        app.processEvents()
+    elapsed = time.time() - start
+
+    count = getSampleCount(dm)
+    window.chartStopButtonPressed()
+    return count / elapsed
+
+
+#
+# Returns the average time of chart frames with new bounds (full redraw)
+# and with unchanged bounds (blitted) in ms. The frames are drawn like by
+# the frame timer, the charts follow the data until the given time.
+#
+def benchmarkChart(window, frames):
+    canvas = window.canvasGraph
+    lastTime = window.daqManager.getLastSampleTime()
+    interval = window.daqIdeaConfig.animationTimeInterval
+
+    def drawFrames(endTimes):
+        start = time.time()
+        for t in endTimes:
+            canvas.fitEndTime = t
+            try:
+                canvas.updateCharts()
+            finally:
+                canvas.fitEndTime = None
+        return (time.time() - start) / len(endTimes) * 1000
+
+    canvas.showDataUntil(lastTime)
+
+    endTimes = [interval + (lastTime - interval) * i / float(frames) for i in range(frames)]
+    frameTime = drawFrames(endTimes)
+    drawFrames([lastTime])
+    blitTime = drawFrames([lastTime] * frames)
+
+    return frameTime, blitTime
+
+
+#
+# Returns the average time to scroll the data table to a random row and
+# paint it in ms
+#
+def benchmarkTableScroll(window, pages):
+    table = window.dataTable
+    model = table.model()
+    rng = random.Random(0)
+
+    start = time.time()
+    for i in range(pages):
+        row = rng.randrange(model.getRowCount())
+        table.scrollTo(model.index(row, 0), QtWidgets.QAbstractItemView.PositionAtTop)
+        table.viewport().repaint()
+    return (time.time() - start) / pages * 1000
+
+
+#
+# Returns the average time to publish the new rows of a frame to the data
+# table during the ingest benchmark in ms
+#
+def getTablePublishTime():
+    mean = pipelineStats.stats.getHistogram('table.publish.time', 's').getMean()
+    if mean == None:
+        return 0.0
+    return mean * 1000
+
+
+#
+# Returns the average time to change the format of the variables, which
+# formats the visible cells again, and repaint the data table in ms
+#
+def benchmarkTableFormat(window, count):
+    table = window.dataTable
+    model = table.model()
+
+    start = time.time()
+    for i in range(count):
+        model.updateFormatting()
+        table.viewport().repaint()
+    return (time.time() - start) / count * 1000
+
+
+def getRowCount(sampleData):
+    cursors = exporters.getFirstIndices(sampleData)
+    return sum(len(rowTimes) for rowTimes, times, values in exporters.iterMergedBlocks(sampleData, cursors))
+
+
+#
+# Returns exported rows per second of the CSV and the Excel export
+#
+def benchmarkExport(window, signals):
+    names = [signal.name for signal in signals]
+    directory = tempfile.mkdtemp(prefix='daqBenchmark-')
+    fileName = os.path.join(directory, 'export')
+
+    try:
+        data = [store.snapshot() for store in window.daqManager.getRawData()]
+        start = time.time()
+        exporters.exportToCharSeparatedValues(fileName + '.csv', data, ',', names, True)
+        csvRate = getRowCount(data) / (time.time() - start)
+
+        duration = EXCEL_BENCHMARK_ROWS / sum(signal.rate for signal in signals)
+        data = fakeDaq.createStores(signals, duration)
+        start = time.time()
+        exporters.exportToExcel(None, fileName + '.xlsx', data, names, True)
+        excelRate = getRowCount(data) / (time.time() - start)
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+    return csvRate, excelRate
+
+
+def runBenchmarks(args):
+    app = QtWidgets.QApplication.instance()
+    if app == None:
+        app = QtWidgets.QApplication(sys.argv)
+
+    signals = fakeDaq.createSignals(args.variables, args.rate)
+    window = createWindow(signals)
+    window.chartTableWindowCombo.setCurrentIndex(TABLE_WINDOW_MODES[args.table_window])
+    app.processEvents()
+
+    results = dict()
+    results['ingest'] = benchmarkIngest(app, window, signals, args.samples)
+    results['chartFrame'], results['chartBlit'] = benchmarkChart(window, args.frames)
+    results['tableScroll'] = benchmarkTableScroll(window, args.frames)
+    results['tablePublish'] = getTablePublishTime()
+    results['tableFormat'] = benchmarkTableFormat(window, args.frames)
+    results['exportCsv'], results['exportExcel'] = benchmarkExport(window, signals)
+
+    # Pipeline statistics of the run, to see where the time went
+    results['pipeline'] = pipelineStats.stats.toDict()
+
+    window.daqManager.closeSpills()
+    return results
+
+
+#
+# Returns the names of the results that are worse than in 'baseline' by
+# more than the tolerance (a fraction)
+#
+def getRegressions(results, baseline, tolerance):
+    regressions = []
+    for name, unit, largerIsBetter in BENCHMARKS:
+        if name not in baseline:
+            continue
+        if largerIsBetter:
+            worse = results[name] < baseline[name] * (1 - tolerance)
+        else:
+            worse = results[name] > baseline[name] * (1 + tolerance)
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='daqIDEA throughput benchmark with synthetic samples')
+    parser.add_argument('--variables', type=int, default=4, help='number of variables')
+    parser.add_argument('--rate', type=float, default=10000.0, help='samples per second of every variable')
+    parser.add_argument('--samples', type=int, default=4000000, help='number of samples acquired')
+    parser.add_argument('--frames', type=int, default=50, help='number of chart frames and table pages')
+    parser.add_argument('--table-window', choices=sorted(TABLE_WINDOW_MODES), default='chart',
+                        help='rows of the data table during the acquisition')
+    parser.add_argument('--save', help='save the results to this JSON file')
+    parser.add_argument('--compare', help='compare the results to a JSON file saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression, 0.2 = 20%%')
+    args = parser.parse_args()
+
+    results = runBenchmarks(args)
+
+    baseline = dict()
+    if args.compare != None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    for name, unit, largerIsBetter in BENCHMARKS:
+        line = '%-12s %14.2f %-10s' % (name, results[name], unit)
+        if name in baseline:
+            line += ' (baseline %.2f)' % baseline[name]
+        print(line)
+
+    if args.save != None:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    regressions = getRegressions(results, baseline, args.tolerance)
+    if len(regressions) > 0:
+        print('Regressions: %s' % ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
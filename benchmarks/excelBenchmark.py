@@ -0,0 +1,155 @@
+
+from __future__ import print_function
+
+#
+# Benchmark of the Excel export in rows/s, the column-wise export from the
+# sample stores against the former export of the formatted table cells:
+#
+#   python benchmarks/excelBenchmark.py [--rows N] [--variables N] [--full]
+#
+# The variables are sampled at interleaved times, so without --full (the 
+# full data model) most cells are empty. Both workbooks are read back and 
+# compared, the exit code is 1 if their values differ.
+#
+
+import os, sys, time, shutil, argparse, tempfile
+
+# The modules of the application are in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import globals
+
+# Logging and properties of the application go to the winIDEA application
+# data directory
+if not os.path.isdir(globals.appDataISystem):
+    os.makedirs(globals.appDataISystem)
+
+import numpy as np
+import openpyxl
+import daqManager, exporters, widgets
+
+
+#
+# Returns a DaqManager with 'variables' float variables and 'rows' table
+# rows. Every variable is sampled at every 'variables'-th row time,
+# starting with its own offset.
+#
+def createManager(rows, variables):
+    dm = daqManager.DaqManager(None)
+    dm.resetPlotData([None] * variables, [np.float64] * variables)
+    dm.resetDownsampleMetadata(variables)
+
+    rng = np.random.RandomState(0)
+    rowTimes = np.arange(rows) / 10000.0
+    for i, store in enumerate(dm.sampleData):
+        store.extend(rowTimes[i::variables], 1000.0 * rng.standard_normal(len(rowTimes[i::variables])))
+    dm.timeIndex.merge(rowTimes)
+    return dm
+
+
+#
+# Writes the table cells like the Excel export before it was column-wise:
+# every cell is formatted by a DaqTableColumn as shown in the data table
+#
+def exportByCell(fileName, dm, varNames, dataModelFull):
+    book = openpyxl.Workbook(write_only = True)
+    sheet = book.create_sheet()
+    sheet.title = 'Variables'
+
+    columns = [widgets.DaqTableColumn(daqIdx, globals.formatterStrings[globals.formatFloat[0]], 
+                                      store, dm.timeIndex)
+               for daqIdx, store in enumerate(dm.sampleData)]
+    
+    sheet.append(['Time [s]'] + list(varNames))
+    for r in range(len(dm.timeIndex)):
+        values = [dm.timeIndex[r]]
+        for column in columns:
+            column.update()
+            values.append(column.getText(r, dataModelFull))
+        sheet.append(values)
+    
+    book.save(fileName)
+
+
+def exportByColumn(fileName, dm, varNames, dataModelFull):
+    exporters.exportToExcel(None, fileName, dm.sampleData, varNames, dataModelFull)
+
+
+#
+# Returns the rows of the first sheet of a workbook with the cell values 
+# as floats, None for empty cells
+#
+def readRows(fileName):
+    book = openpyxl.load_workbook(fileName, read_only = True)
+    rows = []
+    for row in book.worksheets[0].iter_rows(min_row=2, values_only=True):
+        rows.append([None if value in (None, '') else float(value) for value in row])
+    book.close()
+    return rows
+
+
+#
+# Returns True if the rows of two workbooks have the same values, within 
+# the 6 decimals of the cell formatting
+#
+def compareRows(rows1, rows2):
+    if len(rows1) != len(rows2):
+        return False
+    for row1, row2 in zip(rows1, rows2):
+        for value1, value2 in zip(row1, row2):
+            if (value1 == None) != (value2 == None):
+                return False
+            if value1 != None and abs(value1 - value2) > 1e-6 + 1e-9 * abs(value1):
+                return False
+    return True
+
+
+#
+# Exports the table of a DaqManager both ways. Returns the rows/s of the 
+# per-cell and the column-wise export and True if the workbooks match.
+#
+def benchmarkExport(dm, dataModelFull):
+    varNames = ['var%d' % i for i in range(len(dm.sampleData))]
+    rows = len(dm.timeIndex)
+    directory = tempfile.mkdtemp(prefix='excelBenchmark-')
+    try:
+        rates = []
+        fileNames = []
+        for name, export in [('cells', exportByCell), ('columns', exportByColumn)]:
+            fileName = os.path.join(directory, name + '.xlsx')
+            start = time.time()
+            export(fileName, dm, varNames, dataModelFull)
+            rates.append(rows / (time.time() - start))
+            fileNames.append(fileName)
+        
+        bMatch = compareRows(readRows(fileNames[0]), readRows(fileNames[1]))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    
+    return rates[0], rates[1], bMatch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='daqIDEA Excel export per cell and column-wise')
+    parser.add_argument('--rows', type=int, default=200000, help='number of table rows')
+    parser.add_argument('--variables', type=int, default=4, help='number of variables')
+    parser.add_argument('--full', action='store_true', help='fill in missing values (full data model)')
+    args = parser.parse_args()
+
+    dm = createManager(args.rows, args.variables)
+    try:
+        cellRate, columnRate, bMatch = benchmarkExport(dm, args.full)
+    finally:
+        dm.closeSpills()
+    
+    print('%d rows x %d variables' % (args.rows, args.variables))
+    print('per cell    %10.0f rows/s' % cellRate)
+    print('column-wise %10.0f rows/s  %.1fx' % (columnRate, columnRate / cellRate))
+    if not bMatch:
+        print('The exported values differ')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
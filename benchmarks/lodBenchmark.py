@@ -0,0 +1,112 @@
+
+from __future__ import print_function
+
+#
+# Benchmark of the chart data of a long acquisition with and without the
+# LOD pyramid, with one synthetic variable:
+#
+#   python benchmarks/lodBenchmark.py [--samples N] [--rate HZ] [--pixels N]
+#
+# The samples are added to the sample store and the pyramid in batches like
+# by DaqManager.deQueueSamplingData(). Then the chart data of windows from
+# the whole acquisition down to a few pixels worth of samples is queried 
+# with DaqManager.getChartPlotData(), once with the pyramid and once with
+# the slot statistics computed from the raw samples. The default of 100M 
+# samples needs about 2 GB of memory.
+#
+
+import os, sys, time, argparse
+
+# The modules of the application are in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import globals
+
+# Logging and properties of the application go to the winIDEA application
+# data directory
+if not os.path.isdir(globals.appDataISystem):
+    os.makedirs(globals.appDataISystem)
+
+import numpy as np
+import daqManager
+
+# Samples per batch, about the samples of one ingest at 100 kHz
+BATCH_SIZE = 1 << 12
+
+
+#
+# Returns a DaqManager with one variable sampled 'count' times at 'rate'.
+# Returns it and the ingest time per sample in ns.
+#
+def createManager(count, rate):
+    dm = daqManager.DaqManager(None)
+    dm.resetPlotData([None], [np.float64])
+    dm.resetDownsampleMetadata(1)
+    store = dm.sampleData[0]
+    pyramid = dm.sampleLod[0]
+    random = np.random.RandomState(0)
+
+    elapsed = 0.0
+    for k in range(0, count, BATCH_SIZE):
+        times = np.arange(k, min(k + BATCH_SIZE, count)) / rate
+        values = 100.0 * np.sin(2 * np.pi * times) + random.standard_normal(len(times))
+
+        start = time.time()
+        store.extend(times, values)
+        pyramid.extend(times, values)
+        elapsed += time.time() - start
+
+    return dm, elapsed / count * 1e9
+
+
+#
+# Returns the average time of getChartPlotData() in ms and the number of 
+# points it returned
+#
+def benchmarkQuery(dm, minTime, maxTime, pixels, repeat):
+    start = time.time()
+    for i in range(repeat):
+        x, y, isEnvelope = dm.getChartPlotData(0, minTime, maxTime, 1.0, pixels)
+    return (time.time() - start) / repeat * 1000, len(x)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='daqIDEA chart data with and without the LOD pyramid')
+    parser.add_argument('--samples', type=int, default=100000000, help='number of samples')
+    parser.add_argument('--rate', type=float, default=100000.0, help='samples per second')
+    parser.add_argument('--pixels', type=int, default=1000, help='chart width in pixels')
+    parser.add_argument('--repeat', type=int, default=5, help='queries per window')
+    args = parser.parse_args()
+
+    dm, ingest = createManager(args.samples, args.rate)
+    pyramid = dm.sampleLod[0]
+    print('%d samples, ingest %.1f ns/sample, pyramid %.1f MB, store %.1f MB' % 
+          (args.samples, ingest, pyramid.getMemorySize() / 1e6, 
+           dm.sampleData[0].getMemorySize() / 1e6))
+
+    print('%12s %12s %12s %12s' % ('window [s]', 'lod [ms]', 'raw [ms]', 'points'))
+    
+    duration = args.samples / args.rate
+    width = duration
+    while width * args.rate > args.pixels:
+        minTime = (duration - width) / 2
+        maxTime = minTime + width
+        
+        lodTime, points = benchmarkQuery(dm, minTime, maxTime, args.pixels, args.repeat)
+        
+        getSlots = pyramid.getSlots
+        pyramid.getSlots = lambda t0, s, c: None
+        try:
+            rawTime, rawPoints = benchmarkQuery(dm, minTime, maxTime, args.pixels, args.repeat)
+        finally:
+            pyramid.getSlots = getSlots
+        
+        print('%12.4f %12.3f %12.3f %12d' % (width, lodTime, rawTime, points))
+        width /= 10
+
+    dm.closeSpills()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
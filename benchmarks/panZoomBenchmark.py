@@ -0,0 +1,181 @@
+
+from __future__ import print_function
+
+#
+# Benchmark of the raw chart data lookup during random pan and zoom 
+# sequences, like mouse drags and scrolls in a stopped chart, against the
+# edge walking it replaced:
+#
+#   python benchmarks/panZoomBenchmark.py [--samples N] [--steps N]
+#
+# Every step returns the same samples with both lookups, the exit code is 1
+# if they differ.
+#
+
+import os, sys, time, random, argparse
+
+# The modules of the application are in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import globals
+
+# Logging and properties of the application go to the winIDEA application
+# data directory
+if not os.path.isdir(globals.appDataISystem):
+    os.makedirs(globals.appDataISystem)
+
+import numpy as np
+import daqManager
+
+# Zoom factor of one scroll step, see MyDynamicMplCanvas.mouseScroll()
+ZOOM_FACTOR = 1.4
+
+
+#
+# Returns a DaqManager with one variable sampled 'count' times at 'rate',
+# with random jitter and a few repeated times
+#
+def createManager(count, rate):
+    dm = daqManager.DaqManager(None)
+    dm.resetPlotData([None], [np.float64])
+    dm.resetDownsampleMetadata(1)
+
+    rng = np.random.RandomState(0)
+    times = np.cumsum(rng.exponential(1.0 / rate, count))
+    times[rng.randint(1, count, count // 100)] = times[rng.randint(1, count, count // 100) - 1]
+    times.sort()
+    dm.sampleData[0].extend(times, rng.standard_normal(count))
+    return dm
+
+
+#
+# Returns 'steps' (minTime, maxTime) windows of pans, zooms, jumps to
+# another part of the acquisition and small tail-follow shifts
+#
+def createWindows(duration, steps, seed=0):
+    rng = random.Random(seed)
+    minTime = 0.0
+    maxTime = min(10.0, duration)
+
+    windows = []
+    for i in range(steps):
+        width = maxTime - minTime
+        action = rng.choice(['pan', 'zoom', 'jump', 'follow'])
+        if action == 'pan':
+            shift = rng.uniform(-1.0, 1.0) * width
+            minTime += shift
+            maxTime += shift
+        elif action == 'zoom':
+            factor = ZOOM_FACTOR ** rng.choice([-3, -2, -1, 1, 2, 3])
+            center = rng.uniform(minTime, maxTime)
+            minTime = center - (center - minTime) * factor
+            maxTime = center + (maxTime - center) * factor
+        elif action == 'jump':
+            width = rng.uniform(0.001, 0.5) * duration
+            minTime = rng.uniform(-0.1 * duration, duration)
+            maxTime = minTime + width
+        else:
+            shift = width * 0.01
+            minTime += shift
+            maxTime += shift
+        windows.append((minTime, maxTime))
+    return windows
+
+
+#
+# getRawPlotData() before the window was searched: the bounds of the last
+# call are moved one sample at a time
+#
+def getRawPlotDataByWalking(dm, varIndex, minTime, maxTime, scaleFactor):
+    store = dm.sampleData[varIndex]
+    x = store.getTime
+    n = len(store)
+
+    left = dm.lastMinIndex[varIndex]
+    if (left == None):
+        left = 0
+
+    right = dm.lastMaxIndex[varIndex]
+    if (right == None):
+        right = n-1
+
+    while (left > 0) and (x(left) > minTime):
+        left -= 1
+    while (right < n) and (x(right) < maxTime):
+        right += 1
+
+    while (left+1 < n) and (x(left+1) < minTime):
+        left += 1
+    while (right-1 >= 0) and (x(right-1) > maxTime):
+        right -= 1
+
+    xp = store.getTimes(left, right+1)
+    yp = store.getValues(left, right+1)
+
+    if (scaleFactor != 1):
+        yp = yp * scaleFactor
+
+    dm.lastMinIndex[varIndex] = left
+    dm.lastMaxIndex[varIndex] = right
+
+    return xp, yp
+
+
+#
+# Returns the total time [s] of the lookups of all windows and the windows
+#
+def runWindows(dm, getRawPlotData, windows, scaleFactor):
+    dm.resetDownsampleMetadata(1)
+    results = []
+
+    elapsed = 0.0
+    for minTime, maxTime in windows:
+        start = time.time()
+        xp, yp = getRawPlotData(0, minTime, maxTime, scaleFactor)
+        elapsed += time.time() - start
+        results.append((xp, yp))
+    return elapsed, results
+
+
+#
+# Returns the edge walking and the search time per step [ms] and the
+# indices of the steps with different results
+#
+def benchmarkPanZoom(dm, windows, scaleFactor=2.0):
+    walk = lambda *args: getRawPlotDataByWalking(dm, *args)
+    walkTime, walked = runWindows(dm, walk, windows, scaleFactor)
+    searchTime, searched = runWindows(dm, dm.getRawPlotData, windows, scaleFactor)
+
+    mismatches = []
+    for step, ((wx, wy), (sx, sy)) in enumerate(zip(walked, searched)):
+        if not (np.array_equal(wx, sx) and np.array_equal(wy, sy)):
+            mismatches.append(step)
+
+    n = len(windows)
+    return walkTime / n * 1000, searchTime / n * 1000, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='daqIDEA raw chart data lookup during pan and zoom')
+    parser.add_argument('--samples', type=int, default=2000000, help='number of samples')
+    parser.add_argument('--rate', type=float, default=10000.0, help='samples per second')
+    parser.add_argument('--steps', type=int, default=400, help='number of pan and zoom steps')
+    args = parser.parse_args()
+
+    dm = createManager(args.samples, args.rate)
+    windows = createWindows(args.samples / args.rate, args.steps)
+    walkTime, searchTime, mismatches = benchmarkPanZoom(dm, windows)
+    dm.closeSpills()
+
+    print('edge walking %10.4f ms/step' % walkTime)
+    print('search       %10.4f ms/step' % searchTime)
+    print('speed-up     %10.1fx' % (walkTime / searchTime))
+
+    if len(mismatches) > 0:
+        print('Different windows at steps: %s' % ', '.join(str(s) for s in mismatches))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+
+from __future__ import print_function
+
+#
+# Benchmark of the transfer of DAQ samples from the reader thread to the
+# sample stores, the bulk decoding into the sample ring against the former
+# queue row per sample:
+#
+#   python benchmarks/ringBenchmark.py [--samples N] [--variables N]
+#
+# Both transfers must give the same times and values, the exit code is 1
+# if they differ.
+#
+
+import os, sys, time, argparse
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# The modules of the application are in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import globals
+
+# Logging and properties of the application go to the winIDEA application
+# data directory
+if not os.path.isdir(globals.appDataISystem):
+    os.makedirs(globals.appDataISystem)
+
+import numpy as np
+import daqManager, fakeDaq, replay, sampleRing
+
+
+#
+# Returns a DaqManager on a FakeDaqController with stores of the given
+# value types, ready to decode samples
+#
+def createManager(valueTypes):
+    dm = daqManager.DaqManager(None)
+    dm.daqCtrl = fakeDaq.FakeDaqController([])
+    dm.daqTimeFactor = replay.REPLAY_TICK_NS / 1e9
+    dm.daqTimeStart = 0.0
+    dm.sampleKinds = dict()
+    dm.resetPlotData([None] * len(valueTypes), valueTypes)
+    return dm
+
+
+#
+# Returns 'count' DAQ samples of 'varCount' variables in turn, the even
+# ones float, the odd ones integer
+#
+def createSamples(count, varCount):
+    samples = []
+    for k in range(count):
+        index = k % varCount
+        if index % 2 == 0:
+            samples.append(replay.ReplaySample(index, k, 0.5 * k, True))
+        else:
+            samples.append(replay.ReplaySample(index, k, k, False))
+    return samples
+
+
+#
+# Reader and GUI side of the sample queue before the bulk decoding: one
+# queue row per sample
+#
+def transferPerSample(dm, daqSamples, sampleQueue):
+    for daqSample in daqSamples:
+        varIndex = daqSample.getIndex()
+        sampleTime = daqSample.getTime()
+        t = dm.daqCtrl.getDataValue(daqSample)
+
+        bIsValid = True
+        sampleValue = 0
+        if t.isTypeSigned() or t.isTypeUnsigned():
+            sampleValue = t.getLong()
+        elif t.isTypeFloat():
+            dVal = t.getDouble()
+            if (float('inf') == dVal):
+                sampleValue = 0
+                bIsValid = False
+            else:
+                sampleValue = dVal
+
+        if bIsValid:
+            sampleQueue.put([varIndex, sampleTime, sampleValue])
+
+    newTimes = [[] for store in dm.sampleData]
+    newValues = [[] for store in dm.sampleData]
+    while (not sampleQueue.empty()):
+        row = sampleQueue.get()
+        varIdx = row[0]
+        newTimes[varIdx].append(row[1] * dm.daqTimeFactor - dm.daqTimeStart)
+        newValues[varIdx].append(row[2])
+    return newTimes, newValues
+
+
+def transferBulk(dm, daqSamples, sampleQueue):
+    sampleQueue.pushMany(*dm.decodeSamples(daqSamples))
+
+    newTimes = [[] for store in dm.sampleData]
+    newValues = [[] for store in dm.sampleData]
+
+    def consume(indices, ticks, values, intValues):
+        sampleTimes = ticks * dm.daqTimeFactor - dm.daqTimeStart
+        for varIdx in np.unique(indices):
+            m = indices == varIdx
+            newTimes[varIdx].append(sampleTimes[m])
+            newValues[varIdx].append(values[m])
+
+    sampleQueue.drainInto(consume)
+    return [np.concatenate(t) for t in newTimes], [np.concatenate(v) for v in newValues]
+
+
+#
+# Returns True if the times and values of both transfers are the same
+#
+def compareTransfers(perSample, bulk):
+    (oldTimes, oldValues), (newTimes, newValues) = perSample, bulk
+    for varIdx in range(len(oldTimes)):
+        if not np.allclose(newTimes[varIdx], oldTimes[varIdx]):
+            return False
+        if not np.array_equal(newValues[varIdx], oldValues[varIdx]):
+            return False
+    return True
+
+
+#
+# Returns the best of 'runs' times [s] of a transfer and its result
+#
+def measure(transfer, dm, daqSamples, createQueue, runs=3):
+    best = None
+    for run in range(runs):
+        sampleQueue = createQueue()
+        start = time.time()
+        result = transfer(dm, daqSamples, sampleQueue)
+        elapsed = time.time() - start
+        if best == None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='daqIDEA sample transfer per sample and in bulk')
+    parser.add_argument('--samples', type=int, default=200000, help='number of samples')
+    parser.add_argument('--variables', type=int, default=4, help='number of variables')
+    args = parser.parse_args()
+
+    dm = createManager([np.float64, np.int64] * ((args.variables + 1) // 2))
+    daqSamples = createSamples(args.samples, args.variables)
+
+    perSample, perSampleResult = measure(transferPerSample, dm, daqSamples, queue.Queue)
+    bulk, bulkResult = measure(transferBulk, dm, daqSamples, lambda: sampleRing.SampleRing(args.samples))
+
+    print('%d samples of %d variables' % (args.samples, args.variables))
+    print('per sample %8.3f s  %10.0f samples/s' % (perSample, args.samples / perSample))
+    print('bulk       %8.3f s  %10.0f samples/s  %.1fx' % (bulk, args.samples / bulk, perSample / bulk))
+
+    if not compareTransfers(perSampleResult, bulkResult):
+        print('The transferred samples differ')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+
+from __future__ import print_function
+
+#
+# Startup benchmark of the variable list with and without the symbol cache,
+# with the application downloaded in the most recently used winIDEA, or 
+# with --fake on a fakeDaq.FakeTarget, so it can be replayed without 
+# winIDEA, e.g. in CI:
+#
+#   python benchmarks/symbolBenchmark.py [--runs N]
+#   python benchmarks/symbolBenchmark.py --fake [--variables N] [--latency S] [--runs N]
+#
+# A cold start lists the variables from winIDEA and looks up the array
+# dimensions, a warm start loads both from the symbol cache written by the
+# cold one. 'listed' is the time until the variable list is usable,
+# 'resolved' the time until all array dimensions are known. The cache files
+# are written to a temporary directory, the one of daqIDEA is not changed.
+#
+# The fake target has two download files in a temporary directory, with
+# scalars, structures and arrays of one and two dimensions. Every call of
+# a controller takes 'latency' seconds, like a round-trip to winIDEA.
+#
+
+import os, sys, time, shutil, argparse, tempfile
+
+# The fake controllers are used even if isystem.connect is installed, see 
+# iconnect
+if '--fake' in sys.argv:
+    os.environ['DAQIDEA_FAKE_CONNECT'] = '1'
+
+# The modules of the application are in src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import globals
+
+# Logging and properties of the application go to the winIDEA application
+# data directory
+if not os.path.isdir(globals.appDataISystem):
+    os.makedirs(globals.appDataISystem)
+
+from iconnect import ic
+import daqManager, fakeDaq, fakeConnect
+
+# Type names of the variables of the fake target, in turn
+FAKE_TYPE_NAMES = ['int', 'float', 'unsigned short', 'int[16]', 'struct point',
+                   'double', 'unsigned char[8][4]', 'signed char']
+
+
+#
+# Returns a fakeDaq.FakeTarget with 'count' variables in two download files 
+# in 'directory'. The files exist, so their symbols can be cached.
+#
+def createFakeTarget(directory, count, latency):
+    downloadFiles = []
+    for fileIdx, fileName in enumerate(['app.elf', 'boot.elf']):
+        path = os.path.join(directory, fileName)
+        with open(path, 'wb') as f:
+            f.write(b'\x7fELF' + b'\0' * 1020)
+
+        variables = []
+        for i in range(fileIdx, count, 2):
+            variables.append(('var%d' % i, FAKE_TYPE_NAMES[i // 2 % len(FAKE_TYPE_NAMES)]))
+        downloadFiles.append((path, fileName, variables))
+
+    return fakeDaq.FakeTarget([], downloadFiles=downloadFiles, latency=latency)
+
+
+#
+# Creates a DaqManager and waits for the array dimensions. Returns the
+# listed and resolved times [s] and the number of variables.
+#
+def benchmarkStartup(cmgr):
+    start = time.time()
+    dm = daqManager.DaqManager(cmgr)
+    listed = time.time() - start
+
+    while dm.isResolvingSymbols():
+        time.sleep(0.01)
+        dm.applyResolvedSymbols()
+    resolved = time.time() - start
+
+    return listed, resolved, len(dm.getVariables())
+
+
+#
+# Runs cold and warm starts with the symbol cache in a temporary directory.
+# Returns (name, listed, resolved, variable count) of every start.
+#
+def benchmarkStartups(cmgr, runs):
+    results = []
+    globals.symbolCacheDirectory = tempfile.mkdtemp(prefix='symbolBenchmark-')
+    try:
+        for run in range(runs):
+            shutil.rmtree(globals.symbolCacheDirectory)
+            for name in ['cold', 'warm']:
+                results.append((name,) + benchmarkStartup(cmgr))
+    finally:
+        shutil.rmtree(globals.symbolCacheDirectory, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='daqIDEA variable list startup with and without the symbol cache')
+    parser.add_argument('--runs', type=int, default=3, help='number of cold and warm starts')
+    parser.add_argument('--fake', action='store_true', help='use a fake target instead of winIDEA')
+    parser.add_argument('--variables', type=int, default=2000, help='number of variables of the fake target')
+    parser.add_argument('--latency', type=float, default=0.0005, help='seconds per call of the fake target')
+    args = parser.parse_args()
+
+    targetDirectory = None
+    if args.fake:
+        targetDirectory = tempfile.mkdtemp(prefix='symbolBenchmark-target-')
+        cmgr = fakeConnect.ConnectionMgr(createFakeTarget(targetDirectory, args.variables, args.latency))
+    else:
+        cmgr = ic.ConnectionMgr()
+        cmgr.connectMRU('')
+
+    try:
+        for name, listed, resolved, count in benchmarkStartups(cmgr, args.runs):
+            print('%-5s listed %8.3f s  resolved %8.3f s  %d variables' % (name, listed, resolved, count))
+    finally:
+        if targetDirectory != None:
+            shutil.rmtree(targetDirectory, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,375 @@
+
+from __future__ import print_function
+
+import os
+import time
+import struct
+import datetime
+import xml.dom.minidom
+import numpy as np
+
+import sampleStore, variableConfiguration
+
+# File signature and format version
+CAPTURE_MAGIC = b'DAQCAPT\x00'
+CAPTURE_VERSION = 1
+
+XML_CAPTURE_ROOT = 'daqIdeaCapture'
+XML_STORES = 'stores'
+XML_STORE = 'store'
+
+# Start of the file: magic, version and size of the XML header that follows
+FILE_HEADER = struct.Struct('<8sII')
+
+# Start of a record: DAQ index, reserved, sample count. It is followed by
+# the sample times (float64) and values (type of the store) of the record.
+RECORD_HEADER = struct.Struct('<iIq')
+
+# Samples per record. Records of this size map to sample store chunks
+# without copying.
+CAPTURE_RECORD_SIZE = sampleStore.CHUNK_SIZE
+
+# Seconds between writing the buffered samples of all stores as tail
+# records, so a capture that was not closed loses at most these samples
+CAPTURE_FLUSH_INTERVAL = 1.0
+
+# Seconds between forcing the written records to the disk
+CAPTURE_SYNC_INTERVAL = 10.0
+
+
+#
+# Capture file layout (little endian):
+#
+#   FILE_HEADER
+#   XML header, padded with spaces to a multiple of 8 bytes. It holds the
+#       value type of every sample store and the daqIDEA configuration of
+#       variableConfiguration.createDomModel().
+#   Records of RECORD_HEADER, times and values
+#
+# The records of one store hold its samples in time order. All records
+# have CAPTURE_RECORD_SIZE samples, except the tail records at the end of
+# the file with the remaining samples of every store. The file ends after
+# the last complete record, so a capture that was not closed can still be
+# opened.
+#
+
+
+#
+# Returns the XML header for the configuration and the value type of every
+# DAQ index
+#
+def createHeader(config, valueTypes):
+    impl = xml.dom.minidom.getDOMImplementation()
+    dom = impl.createDocument(None, XML_CAPTURE_ROOT, None)
+    root_el = dom.documentElement
+    root_el.setAttribute('version', str(CAPTURE_VERSION))
+    root_el.setAttribute('created', datetime.datetime.now().isoformat())
+
+    stores_el = dom.createElement(XML_STORES)
+    root_el.appendChild(stores_el)
+
+    storeElements = []
+    for valueType in valueTypes:
+        store_el = dom.createElement(XML_STORE)
+        store_el.setAttribute('type', np.dtype(valueType).name)
+        stores_el.appendChild(store_el)
+        storeElements.append(store_el)
+
+    # Variable configuration index of every store
+    for varIdx, varConfig in enumerate(config.variableConfigs):
+        if varConfig.enabled and varConfig.daqConfigIndex >= 0:
+            storeElements[varConfig.daqConfigIndex].setAttribute('variable', str(varIdx))
+
+    configDom = variableConfiguration.createDomModel(config)
+    root_el.appendChild(dom.importNode(configDom.documentElement, True))
+
+    header = dom.toxml(encoding='utf-8')
+    return header + b' ' * (-len(header) % 8)
+
+
+#
+# Writes a capture file incrementally during acquisition. Samples are
+# buffered per store and written as full records of CAPTURE_RECORD_SIZE
+# samples, which the reader maps as sample store chunks.
+#
+# The buffered rest is written as tail records at the end of the file by
+# flush(), every CAPTURE_FLUSH_INTERVAL by flushIfDue() and on close(). 
+# The tail records are replaced by the next flush() and removed before
+# the next full record is written, so the file never holds partial
+# records between full ones. The removed samples are written again by the
+# next flushIfDue().
+#
+class CaptureWriter():
+
+    fileName = None
+    file = None
+    valueTypes = None
+
+    # Buffered times/values arrays and their sample count of every store
+    pendingTimes = None
+    pendingValues = None
+    pendingCounts = None
+
+    sampleCount = 0
+
+    # End of the full records, the tail records follow if bTailsWritten. 
+    # bTailsRemoved is set when flushed samples were removed with them.
+    tailOffset = 0
+    bTailsWritten = False
+    bTailsRemoved = False
+
+    # Clock and times of the last flush() and fsync
+    clock = None
+    flushTime = 0.0
+    syncTime = 0.0
+
+    def __init__(self, fileName, config, valueTypes, clock=time.time):
+        self.fileName = fileName
+        self.valueTypes = [np.dtype(t) for t in valueTypes]
+        self.clock = clock
+        self.flushTime = clock()
+        self.syncTime = self.flushTime
+
+        header = createHeader(config, self.valueTypes)
+
+        self.file = open(fileName, 'wb')
+        self.file.write(FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, len(header)))
+        self.file.write(header)
+        self.file.flush()
+        self.tailOffset = self.file.tell()
+
+        self.pendingTimes = [[] for t in valueTypes]
+        self.pendingValues = [[] for t in valueTypes]
+        self.pendingCounts = [0] * len(valueTypes)
+        self.sampleCount = 0
+
+    #
+    # Adds samples of the store with DAQ index daqIdx. The arrays are
+    # copied, so they may be views that change later.
+    #
+    def write(self, daqIdx, times, values):
+        if len(times) == 0:
+            return
+
+        self.pendingTimes[daqIdx].append(np.array(times, dtype=np.float64))
+        self.pendingValues[daqIdx].append(np.array(values, dtype=self.valueTypes[daqIdx]))
+        self.pendingCounts[daqIdx] += len(times)
+        self.sampleCount += len(times)
+
+        if self.pendingCounts[daqIdx] >= CAPTURE_RECORD_SIZE:
+            self.removeTails()
+            while self.pendingCounts[daqIdx] >= CAPTURE_RECORD_SIZE:
+                self.writeRecord(daqIdx)
+            self.tailOffset = self.file.tell()
+
+    #
+    # Writes a record of samples of a store
+    #
+    def writeSamples(self, daqIdx, times, values):
+        self.file.write(RECORD_HEADER.pack(daqIdx, 0, len(times)))
+        self.file.write(times.astype('<f8').tobytes())
+        self.file.write(values.astype(values.dtype.newbyteorder('<')).tobytes())
+
+    #
+    # Writes the first CAPTURE_RECORD_SIZE buffered samples of a store as a
+    # full record
+    #
+    def writeRecord(self, daqIdx):
+        times = np.concatenate(self.pendingTimes[daqIdx])
+        values = np.concatenate(self.pendingValues[daqIdx])
+        count = CAPTURE_RECORD_SIZE
+
+        self.writeSamples(daqIdx, times[:count], values[:count])
+
+        self.pendingTimes[daqIdx] = [times[count:]]
+        self.pendingValues[daqIdx] = [values[count:]]
+        self.pendingCounts[daqIdx] -= count
+
+    #
+    # Removes the tail records, the file ends with the full records
+    #
+    def removeTails(self):
+        if self.bTailsWritten:
+            self.file.seek(self.tailOffset)
+            self.file.truncate()
+            self.bTailsWritten = False
+            self.bTailsRemoved = True
+
+    #
+    # Writes the buffered samples of all stores as tail records, replacing
+    # the previous ones, and passes them to the operating system, every 
+    # CAPTURE_SYNC_INTERVAL also to the disk. The samples stay buffered.
+    #
+    def flush(self):
+        self.removeTails()
+
+        for daqIdx, count in enumerate(self.pendingCounts):
+            if count > 0:
+                times = np.concatenate(self.pendingTimes[daqIdx])
+                values = np.concatenate(self.pendingValues[daqIdx])
+                self.pendingTimes[daqIdx] = [times]
+                self.pendingValues[daqIdx] = [values]
+
+                self.writeSamples(daqIdx, times, values)
+                self.bTailsWritten = True
+        self.file.flush()
+        self.bTailsRemoved = False
+
+        self.flushTime = self.clock()
+        if self.flushTime - self.syncTime >= CAPTURE_SYNC_INTERVAL:
+            os.fsync(self.file.fileno())
+            self.syncTime = self.flushTime
+
+    #
+    # Calls flush() if the last one is CAPTURE_FLUSH_INTERVAL ago or its
+    # samples were removed with the tail records. Called on every ingest,
+    # also when no samples arrive.
+    #
+    def flushIfDue(self):
+        if self.bTailsRemoved  or  self.clock() - self.flushTime >= CAPTURE_FLUSH_INTERVAL:
+            self.flush()
+
+    def getSampleCount(self):
+        return self.sampleCount
+
+    def close(self):
+        if self.file == None:
+            return
+
+        self.flush()
+        self.file.close()
+        self.file = None
+
+
+#
+# Capture file opened for reading. The samples are not loaded, 'stores'
+# are sample stores whose chunks are views of a memory map of the file.
+# Only records smaller than a chunk are copied to merge them, which are
+# only the tail records of captures written by a CaptureWriter.
+#
+# 'config' is the variableConfiguration.ApplicationConfiguration of the
+# capture, with daqConfigIndex set for the variables that have a store.
+#
+class CaptureFile():
+
+    fileName = None
+    created = None
+    config = None
+    stores = None
+
+    data = None
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+
+        self.data = np.memmap(fileName, dtype=np.uint8, mode='r')
+        if len(self.data) < FILE_HEADER.size:
+            raise ValueError("'%s' is not a daqIDEA capture file" % fileName)
+
+        magic, version, headerSize = FILE_HEADER.unpack_from(self.data, 0)
+        if magic != CAPTURE_MAGIC:
+            raise ValueError("'%s' is not a daqIDEA capture file" % fileName)
+        if version > CAPTURE_VERSION:
+            raise ValueError("Capture file '%s' has unsupported version %d" % (fileName, version))
+
+        offset = FILE_HEADER.size
+        valueTypes = self.parseHeader(self.data[offset:offset+headerSize].tobytes())
+        offset += headerSize
+
+        self.stores = [sampleStore.SampleStore(t) for t in valueTypes]
+        self.readRecords(offset)
+
+    #
+    # Reads the configuration and returns the value type of every store
+    #
+    def parseHeader(self, header):
+        dom = xml.dom.minidom.parseString(header.rstrip())
+        root_el = dom.documentElement
+        if root_el.tagName != XML_CAPTURE_ROOT:
+            raise ValueError("'%s' has no capture header" % self.fileName)
+
+        self.created = root_el.getAttribute('created')
+
+        self.config = variableConfiguration.ApplicationConfiguration()
+        configElements = root_el.getElementsByTagName(variableConfiguration.XML_ROOT)
+        if len(configElements) > 0:
+            variableConfiguration.parseGlobalConfiguration(configElements[0], self.config)
+            variableConfiguration.parseVariableConfiguration(configElements[0], self.config)
+
+        valueTypes = []
+        for daqIdx, store_el in enumerate(root_el.getElementsByTagName(XML_STORE)):
+            valueTypes.append(np.dtype(str(store_el.getAttribute('type'))))
+
+            if store_el.hasAttribute('variable'):
+                varIdx = int(store_el.getAttribute('variable'))
+                self.config.variableConfigs[varIdx].daqConfigIndex = daqIdx
+
+        return valueTypes
+
+    #
+    # Adds the records from 'offset' on to the stores. Full records become
+    # chunks as they are, smaller ones are merged into chunks.
+    #
+    def readRecords(self, offset):
+        data = self.data
+        size = len(data)
+
+        # Merged samples of the partial last chunk of every store
+        partTimes = [[] for store in self.stores]
+        partValues = [[] for store in self.stores]
+        partCounts = [0] * len(self.stores)
+
+        while offset + RECORD_HEADER.size <= size:
+            daqIdx, reserved, count = RECORD_HEADER.unpack_from(data, offset)
+            if daqIdx < 0 or daqIdx >= len(self.stores) or count < 0:
+                raise ValueError("Corrupt record in capture file '%s' at offset %d" % (self.fileName, offset))
+
+            store = self.stores[daqIdx]
+            valueType = store.valueType.newbyteorder('<')
+
+            timesOffset = offset + RECORD_HEADER.size
+            valuesOffset = timesOffset + count * 8
+            end = valuesOffset + count * valueType.itemsize
+            if end > size:
+                # Incomplete last record
+                break
+
+            times = np.frombuffer(data, dtype='<f8', count=count, offset=timesOffset)
+            values = np.frombuffer(data, dtype=valueType, count=count, offset=valuesOffset)
+            offset = end
+
+            if count == store.chunkSize and partCounts[daqIdx] == 0:
+                store.appendChunk(times, values)
+                continue
+
+            # Merge small records into a chunk
+            partTimes[daqIdx].append(times)
+            partValues[daqIdx].append(values)
+            partCounts[daqIdx] += count
+
+            # Only full chunks are added, so the last chunk of the store is
+            # always full here
+            if partCounts[daqIdx] >= store.chunkSize:
+                times = np.concatenate(partTimes[daqIdx])
+                values = np.concatenate(partValues[daqIdx])
+                n = len(times) - len(times) % store.chunkSize
+                store.extend(times[:n], values[:n])
+
+                partTimes[daqIdx] = [times[n:]]
+                partValues[daqIdx] = [values[n:]]
+                partCounts[daqIdx] = len(times) - n
+
+        for daqIdx, store in enumerate(self.stores):
+            if partCounts[daqIdx] > 0:
+                store.extend(np.concatenate(partTimes[daqIdx]),
+                             np.concatenate(partValues[daqIdx]))
+
+    def getSampleCount(self):
+        return sum(len(store) for store in self.stores)
+
+    #
+    # Releases the memory map. The stores must not be used afterwards.
+    #
+    def close(self):
+        self.stores = None
+        self.data = None
@@ -16,7 +16,19 @@ from matplotlib.figure import Figure
 from matplotlib.patches import *
 
 from PyQt5 import QtCore, QtGui, QtWidgets
-import globals
+import globals, frameScheduler
+from pipelineStats import stats
+
+#
+# Moves a subplot to position 'num' of a rows x cols grid. Axes lost
+# change_geometry() in matplotlib 3.6.
+#
+def setSubplotGeometry(subplot, rows, cols, num):
+    if hasattr(subplot, 'change_geometry'):
+        subplot.change_geometry(rows, cols, num)
+    else:
+        from matplotlib.gridspec import GridSpec
+        subplot.set_subplotspec(GridSpec(rows, cols, figure=subplot.figure)[num-1])
 
 class MyMplCanvas(FigureCanvas):
     
@@ -47,7 +59,7 @@ class MyMplCanvas(FigureCanvas):
         n = len(self.subplots)
         
         for i in range(len(self.subplots)):
-            self.subplots[i].change_geometry(n+1, 1, i+1)
+            setSubplotGeometry(self.subplots[i], n+1, 1, i+1)
             self.subplots[i].tick_params(axis='x', labelsize=0, which='both')
                      
         sp = self.fig.add_subplot(n+1, 1, n+1)
@@ -70,7 +82,7 @@ class MyMplCanvas(FigureCanvas):
         # Adjust grid and indexes of rest
         n = len(self.subplots)
         for i in range(len(self.subplots)):
-            self.subplots[i].change_geometry(n, 1, i+1)
+            setSubplotGeometry(self.subplots[i], n, 1, i+1)
             self.subplots[i].tick_params(axis='x', labelsize=0, which='both')
             
         self.subplots[-1].tick_params(axis='both', labelsize=8, which='both')
@@ -95,11 +107,20 @@ class MyDynamicMplCanvas(MyMplCanvas):
     # Animation updates
     chartPlotTimer = None
     chartPlotSignal = None
+    
+    # Samples are taken from the DAQ manager on their own timer, redraws 
+    # are paced by the frame scheduler
+    ingestTimer = None
+    renderScheduler = None
     chartAminationRunning = False
     chartAminationPaused = False
     
     animationStopTime = 0
     
+    # End of the time interval to fit the bounds to when the animation is
+    # not running, see showDataUntil()
+    fitEndTime = None
+    
     zoomRectangle = Rectangle((0, 0), 0, 0, 
                               fill=True, alpha=0.1, 
                               fc='r', ec='k', linestyle='dotted')
@@ -109,12 +130,23 @@ class MyDynamicMplCanvas(MyMplCanvas):
     lastPanX = None
     lastPanY = None
     
-    averageTimeStatistic = globals.AverageInt(50)
+    # (varConfig, subplot, line, tail line) of every plotted variable. The 
+    # artists are created once per configuration and updated with set_data.
+    plotLines = []
+    artistKey = None
+    layoutDirty = True
+    
+    # Figure background without the animated artists and the axis limits
+    # it was drawn with. Frames with the same limits are blitted.
+    background = None
+    drawnLimits = None
     
     
     def __init__(self, parent, *args, **kwargs):
         MyMplCanvas.__init__(self, *args, **kwargs)
         self.myParent = parent
+        
+        self.mpl_connect('draw_event', self.onDraw)
 
 
     def startAnimation(self):
@@ -122,6 +154,7 @@ class MyDynamicMplCanvas(MyMplCanvas):
             
             # IF animation was un-paused or played for the first time
             if (self.chartAminationPaused):
+                self.ingestTimer.start(globals.CHART_INGEST_INTERVAL_MS)
                 self.chartPlotTimer.start(globals.CHART_PLOT_UPDATE_INTERVAL_MS)
             else:
                 self.myParent.dataTable.model().updateDataModel()
@@ -131,11 +164,20 @@ class MyDynamicMplCanvas(MyMplCanvas):
                 if not isOK:
                     return False
                 
+                self.renderScheduler = frameScheduler.FrameScheduler(
+                                    globals.CHART_PLOT_UPDATE_INTERVAL_MS / 1000.0,
+                                    globals.CHART_MIN_REFRESH_INTERVAL_MS / 1000.0)
+                
+                self.ingestTimer = QtCore.QTimer(self)
+                self.ingestTimer.timeout.connect(self.ingestSamples)
+                self.ingestTimer.start(globals.CHART_INGEST_INTERVAL_MS)
+                
                 self.chartPlotTimer = QtCore.QTimer(self)
-                self.chartPlotTimer.timeout.connect(self.updateCharts)
+                self.chartPlotTimer.timeout.connect(self.updateFrame)
                 self.chartPlotTimer.start(globals.CHART_PLOT_UPDATE_INTERVAL_MS)
                 for s in self.subplots:
                     s.clear()
+                self.artistKey = None
             
             self.chartAminationRunning = True
             self.chartAminationPaused = False
@@ -145,26 +187,45 @@ class MyDynamicMplCanvas(MyMplCanvas):
         
     def pauseAnimation(self):
         if (self.chartAminationRunning and not self.chartAminationPaused):
+            self.ingestTimer.stop()
             self.chartPlotTimer.stop()
             self.chartAminationRunning = False
             self.animationStopTime = self.myParent.daqManager.getTimeSinceStart()
             self.chartAminationPaused = True
+            self.myParent.dataTable.model().publishRows()
         
         
     def stopAnimation(self):
         if (self.chartAminationRunning or self.chartAminationPaused):
             
+            self.ingestTimer.stop()
+            self.ingestTimer.timeout.disconnect(self.ingestSamples)
             self.chartPlotTimer.stop()
-            self.chartPlotTimer.timeout.disconnect(self.updateCharts)
+            self.chartPlotTimer.timeout.disconnect(self.updateFrame)
             
             self.chartAminationRunning = False
             self.animationStopTime = self.myParent.daqManager.getTimeSinceStart()
             self.chartAminationPaused = False
             self.myParent.daqManager.stopSampling()
+            self.myParent.dataTable.model().publishRows()
         else:
             logging.error('chart.stopAnimation()')
         
         
+    #
+    # Shows the animation time interval ending at time t with the bounds 
+    # fitted to the data, like a running animation. Used for data that was 
+    # not acquired live, e.g. from a capture file.
+    #
+    def showDataUntil(self, t):
+        self.artistKey = None
+        self.fitEndTime = t
+        try:
+            self.updateCharts()
+        finally:
+            self.fitEndTime = None
+        
+        
     def isAnimationRunning(self):
          return self.chartAminationRunning
      
@@ -177,6 +238,170 @@ class MyDynamicMplCanvas(MyMplCanvas):
          return not self.chartAminationRunning and not self.chartAminationPaused
     
     
+    #
+    # The layout and the legends are recomputed for the new size by the 
+    # next frame
+    #
+    def resizeEvent(self, event):
+        MyMplCanvas.resizeEvent(self, event)
+        self.layoutDirty = True
+        self.drawnLimits = None
+    
+    
+    #
+    # Ingest timer: moves the queued samples to the DAQ manager data
+    #
+    def ingestSamples(self):
+        if (not self.isAnimationRunning()):
+            return
+        
+        start = time.time()
+        
+        tableModel = self.myParent.dataTable.model()
+        self.myParent.daqManager.deQueueSamplingData(tableModel)
+        
+        self.renderScheduler.ingestDone(start, time.time())
+    
+    
+    #
+    # Frame timer: redraws the charts and publishes the new table rows if 
+    # the scheduler says it is time
+    #
+    def updateFrame(self):
+        start = time.time()
+        if not self.renderScheduler.isFrameDue(start):
+            return
+        
+        self.updateCharts()
+        self.myParent.dataTable.model().publishRows()
+        
+        self.renderScheduler.frameDone(start, time.time())
+    
+    
+    #
+    # Publishes the frame rate, dropped frames and ingest latency of the 
+    # render scheduler to the pipeline statistics
+    #
+    def updateSchedulerStats(self):
+        scheduler = self.renderScheduler
+        if scheduler == None:
+            return
+        
+        stats.setGauge('chart.frame.rate', scheduler.getFrameRate(), 'fps')
+        stats.setGauge('chart.frame.interval', scheduler.getFrameInterval(), 's')
+        stats.setGauge('chart.frames.dropped', scheduler.getDroppedFrames(), 'frames')
+        stats.setGauge('ingest.latency', scheduler.getIngestLatency(), 's')
+        stats.setGauge('ingest.latency.max', scheduler.getMaxIngestLatency(), 's')
+    
+    
+    #
+    # Identifies the charts and the plotted variables. The artists are 
+    # recreated when it changes.
+    #
+    def getArtistKey(self):
+        key = [tuple(id(sp) for sp in self.subplots), tuple(self.axe2plot)]
+        
+        for varConfig in self.myParent.daqIdeaConfig.variableConfigs:
+            if (varConfig.enabled  and  varConfig.daqConfigIndex != -1):
+                key.append((varConfig.daqConfigIndex, varConfig.name, varConfig.floatColor))
+        
+        return tuple(key)
+    
+    
+    #
+    # Creates the lines and legends of all enabled variables. Lines are 
+    # animated, so they are not part of the background used for blitting.
+    #
+    def createArtists(self):
+        for sp in self.subplots:
+            sp.clear()
+            sp.grid(True)
+        
+        self.plotLines = []
+        
+        daqVarIdx = -1
+        for varConfig in self.myParent.daqIdeaConfig.variableConfigs:
+            
+            # Draw only enabled variables
+            if (not varConfig.enabled  or 
+                varConfig.daqConfigIndex == -1):
+                continue
+            
+            daqVarIdx += 1
+            
+            subplot = self.subplots[self.axe2plot[daqVarIdx]]
+            
+            line, = subplot.plot(
+                                 [], []
+                                 , color=varConfig.floatColor, label=varConfig.name 
+                                 , clip_on=True, antialiased=True
+                                 , drawstyle='steps-post'
+                                 , marker='.', picker=5
+                                 , animated=True
+                                 )
+
+            # The last sample of each chart is drawn as a dotted line to the current time
+            tail, = subplot.plot(
+                                 [], []
+                                 , color=varConfig.floatColor, label='_nolegend_' 
+                                 , linestyle='--'
+                                 , clip_on=True, antialiased=True
+                                 , drawstyle='default'
+                                 , picker=5
+                                 , animated=True
+                                 )
+            
+            self.plotLines.append((varConfig, subplot, line, tail))
+            
+        for sp in self.subplots:
+            sp.legend(loc='upper left', fontsize='small', frameon=False)
+            
+        self.zoomRectangle.set_animated(True)
+        self.layoutDirty = True
+    
+    
+    #
+    # Called after every full redraw of the figure
+    #
+    def onDraw(self, event):
+        self.background = self.copy_from_bbox(self.fig.bbox)
+        self.drawAnimatedArtists()
+    
+    
+    def drawAnimatedArtists(self):
+        for sp in self.subplots:
+            for a in sp.get_children():
+                if a.get_animated():
+                    sp.draw_artist(a)
+    
+    
+    #
+    # Redraws the whole figure if the layout or any axis limits changed, 
+    # otherwise only the animated artists are drawn over the background.
+    # The ticks and labels outside of the axes change with the limits, so a
+    # chart scrolling with the live data is fully redrawn on every frame; 
+    # blitting helps while it is paused, zoomed into the past or its limits
+    # are fixed.
+    #
+    def drawFrame(self):
+        if self.layoutDirty:
+            self.fig.tight_layout()
+            self.layoutDirty = False
+            self.drawnLimits = None
+        
+        limits = [(sp.get_xlim(), sp.get_ylim()) for sp in self.subplots]
+        
+        if (limits != self.drawnLimits  or  self.background == None):
+            self.drawnLimits = limits
+            self.draw()
+            stats.count('chart.frames.full', 1, 'frames')
+        else:
+            stats.count('chart.frames.blit', 1, 'frames')
+            self.restore_region(self.background)
+            self.drawAnimatedArtists()
+            self.blit(self.fig.bbox)
+    
+    
     def updateCharts(self):
         if None == self.myParent.daqManager:
             return
@@ -188,22 +413,23 @@ class MyDynamicMplCanvas(MyMplCanvas):
         
         if self.myParent.daqManager.isDaqConfigured():
 
-            if (self.isAnimationRunning()):
-                tableModel = self.myParent.dataTable.model()
-                self.myParent.daqManager.deQueueSamplingData(tableModel)
-
             # Add/remove unused charts
             while len(self.subplots) < self.requiredChartCount:
                 self.addSubplot()
             while len(self.subplots) > self.requiredChartCount:
                 self.removeSubplot()
 
-            for sp in self.subplots:
-                sp.clear()
-                sp.grid(True)
+            # Create the artists if the charts or variables changed
+            artistKey = self.getArtistKey()
+            if (artistKey != self.artistKey):
+                self.createArtists()
+                self.artistKey = artistKey
 
+            # The bounds follow the data while the animation is running
+            fitBounds = self.isAnimationRunning() or self.fitEndTime != None
+            
             # Reset the bounds so we can calculate them during plotting
-            if (self.isAnimationRunning()):
+            if (fitBounds):
                 for b in self.lastBounds.values():
                     b[0] = sys.float_info.max
                     b[1] = -sys.float_info.max
@@ -211,24 +437,17 @@ class MyDynamicMplCanvas(MyMplCanvas):
                     b[3] = -sys.float_info.max
                 
             #
-            # Plot all variables to their corresponding charts
+            # Update the data of all variables
             #
-            daqVarIdx = -1
-            for varIdx, varConfig in enumerate(self.myParent.daqIdeaConfig.variableConfigs):
-                
-                # Draw only enabled variables
-                if (not varConfig.enabled  or 
-                    varConfig.daqConfigIndex == -1):
-                    continue
-                
-                daqVarIdx += 1
+            for varConfig, subplot, line, tail in self.plotLines:
                 
-                subplot = self.subplots[self.axe2plot[daqVarIdx]]
-
                 bounds = self.lastBounds[subplot]
 
-                if (self.isAnimationRunning()):
-                    t = self.myParent.daqManager.getTimeSinceStart()
+                if (fitBounds):
+                    if (self.fitEndTime != None):
+                        t = self.fitEndTime
+                    else:
+                        t = self.myParent.daqManager.getTimeSinceStart()
                     maxx = float(max(t, self.myParent.daqIdeaConfig.animationTimeInterval))
                     minx = float(maxx - self.myParent.daqIdeaConfig.animationTimeInterval)
                 else:
@@ -236,20 +455,24 @@ class MyDynamicMplCanvas(MyMplCanvas):
                     maxx = bounds[1]
 
                 #
-                # Get latest plot data
+                # Get latest plot data, the min/max envelope if there are 
+                # more samples than pixels
                 #
                 
-                xp, yp = self.myParent.daqManager.getRawPlotData(varConfig.daqConfigIndex, minx, maxx, varConfig.scale)
+                pixelCount = int(subplot.bbox.width)
+                xp, yp, isEnvelope = self.myParent.daqManager.getChartPlotData(varConfig.daqConfigIndex, 
+                                                                               minx, maxx, varConfig.scale, 
+                                                                               pixelCount)
 
                 # Calculate Y bounds
-                if (self.isAnimationRunning()):
+                if (fitBounds):
                     # If nop data then set to [-1, 1] interval
                     if (len(yp) <= 0):
                         miny = -1.0
                         maxy = 1.0
                     else:
-                        miny = min(yp)
-                        maxy = max(yp)
+                        miny = np.min(yp)
+                        maxy = np.max(yp)
                     
                         # If only one sample then stretch the chart by 0.5 over and under
                         if (miny == maxy):
@@ -269,126 +492,19 @@ class MyDynamicMplCanvas(MyMplCanvas):
                     bounds[2] = min(miny, bounds[2])
                     bounds[3] = max(maxy, bounds[3])
                     
-                subplot.plot(
-                             xp, yp
-                             , color=varConfig.floatColor, label=varConfig.name 
-                             , clip_on=True, antialiased=True
-                             , drawstyle='steps-post'
-                             , marker='.', picker=5
-                             )
-
-                # Draw the last sample of each chart as a dotted line to the current time
-                subplot.plot(
-                             [xp[-1], maxx], [yp[-1], yp[-1]]
-                             , color=varConfig.floatColor, label=varConfig.name 
-                             , linestyle='--'
-                             , clip_on=True, antialiased=True
-                             , drawstyle='default'
-                             , picker=5
-                             )
-
-                '''
-                # Here yp is the average of all y's in the time slice
-                xp, yp, minyp, maxyp = self.myParent.daqManager.getDownsampledPlotData(daqVarIdx, minx, maxx, varConfig.scale, 1000)
-
-                rawx, rawy = self.myParent.daqManager.getRawPlotData(daqVarIdx, minx, maxx, varConfig.scale)
-
-                # Calculate Y bounds
-                if (self.isAnimationRunning()):
-                    # If nop data then set to [-1, 1] interval
-                    if (len(yp) <= 0):
-                        miny = -1.0
-                        maxy = 1.0
-                    else:
-                        if (minyp == None)  and  (maxyp == None):
-                            miny = min(yp)
-                            maxy = max(yp)
-                        else:
-                            miny = min(minyp)
-                            maxy = max(maxyp)
-                            
-                    
-                        # If only one sample then stretch the chart by 0.5 over and under
-                        if (miny == maxy):
-                            miny -= 0.5
-                            maxy += 0.5
-
-                    # Ir we have a normal chart then add 5% bounds over and under
-                    margin = 0.05
-                    d = maxy - miny
-                    
-                    miny -= d * margin
-                    maxy += d * margin
-                    
-                    
-                    bounds[0] = min(minx, bounds[0])
-                    bounds[1] = max(maxx, bounds[1])
-                    bounds[2] = min(miny, bounds[2])
-                    bounds[3] = max(maxy, bounds[3])
+                line.set_data(xp, yp)
                 
-                #
-                # Plot the data
-                #
-                # Old school
-                if (self.myParent.specialEnabled[globals.mainApplicationWindow.SPEC_RAW]):
-                    subplot.plot(
-                                 rawx, rawy
-                                 , color='b', label=varConfig.name 
-                                 , clip_on=True, antialiased=True
-                                 )
+                # Sample markers only for raw samples
+                line.set_marker('' if isEnvelope else '.')
 
-                # Average
-                if (self.myParent.specialEnabled[globals.mainApplicationWindow.SPEC_AVG]):
-                    subplot.plot(
-                                 xp, yp
-                                 , color=varConfig.floatColor, label=varConfig.name
-                                 , clip_on=True, antialiased=False
-                                 #, drawstyle='steps-post'
-                                 #, marker='.', picker=5
-                                 )
+                # Draw the last sample of each chart as a dotted line to the current time
+                if (len(xp) > 0):
+                    tail.set_data([xp[-1], maxx], [yp[-1], yp[-1]])
+                else:
+                    tail.set_data([], [])
 
-                if (self.myParent.specialEnabled[globals.mainApplicationWindow.SPEC_MM]):
-                    subplot.fill_between(
-                                         xp, minyp, maxyp
-                                         , color='blue', edgecolor='none'
-                                         , antialiased=False
-                                         , alpha=0.7
-                                         )                
-
-                # Min/Max container
-                if (self.myParent.specialEnabled[globals.mainApplicationWindow.SPEC_CON]):
-                    t = []
-                    a1 = []
-                    a2 = []
-                    
-                    for i in range(0, len(xp)-1):
-                        t.append(xp[i])
-                        a1.append(minyp[i])
-                        a2.append(maxyp[i])
-    
-                        t.append(xp[i+1])
-                        a1.append(minyp[i])
-                        a2.append(maxyp[i])
-    
-                    subplot.fill_between(
-                                         t, a1, a2
-                                         , color=varConfig.floatColor, edgecolor='none'
-                                         , antialiased=False
-                                         #, alpha=1.0
-                                         )                
-                '''
                 dataCount += len(xp)
 
-                '''
-                # We pull the last value of a plot to the right edge of the graph
-                ax = [xp[-1], maxx]
-                ay = [yp[-1], yp[-1]]
-                subplot.plot(ax, 
-                             ay, 
-                             self.defaultPlotColors[varIdx]#, label=names[varIdx]
-                             )
-                '''
-                
             for subplot in self.subplots:
                 bounds = self.lastBounds[subplot]
 
@@ -398,32 +514,20 @@ class MyDynamicMplCanvas(MyMplCanvas):
                 if not np.isnan(bounds[2]) and not np.isnan(bounds[3]):
                     subplot.set_ybound(lower=bounds[2], upper=bounds[3])
                 
-                if (self.zoomDraw  and  subplot == self.zoomedSubplot):
-                    subplot.add_patch(self.zoomRectangle)
-                    
-                subplot.legend(loc='upper left', fontsize='small', frameon=False)
+            # The zoom rectangle is animated, it is only added to the zoomed chart
+            if (self.zoomDraw  and  self.zoomRectangle.axes != self.zoomedSubplot):
+                if (self.zoomRectangle.axes != None):
+                    self.zoomRectangle.remove()
+                self.zoomedSubplot.add_patch(self.zoomRectangle)
+            elif (not self.zoomDraw  and  self.zoomRectangle.axes != None):
+                self.zoomRectangle.remove()
             
             # Draw
-            self.fig.tight_layout()
-            self.draw()
+            self.drawFrame()
             
-        '''
-        # Show frame rate of plot drawing
-        self.averageTimeStatistic.add(int((time.time() - startPlotTime)*1000))
-        print ('draw time [', 
-            self.averageTimeStatistic.getAvg(), 'ms] (', 
-            self.averageTimeStatistic.getMin(), '-',
-            self.averageTimeStatistic.getMax(),')')
-        '''
-        
-        '''
-        # Show number of plotted data points
-        self.myParent.statusBar().showMessage(
-                    'Data units shown:' + str(dataCount) + 
-                    ' dt = ' + str(self.averageTimeStatistic.getAvg()) + 'ms', 0)
-        '''
-        
-        #print 'data points: ', dataCount
+        # Draw time and number of plotted data points
+        stats.add('chart.frame.time', time.time() - startPlotTime, 's')
+        stats.add('chart.frame.points', dataCount, 'points')
         
         
     #
@@ -28,7 +28,8 @@ except Exception as e:
 
 # The rest of the imports
 import sys
-import isystem.connect as ic
+import iconnect
+from iconnect import ic
 import random, math, time
 
 from PyQt5 import QtCore, QtGui, QtWidgets
@@ -41,8 +42,10 @@ from variable import *
 import user_data
 import variableConfiguration
 import exporters
-
-# import cProfile
+import captureFile
+import replay
+import pipelineStats
+import sampleProfiler
 
 class ApplicationWindow(QtWidgets.QMainWindow):
 
@@ -78,6 +81,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
     chartStopButton = None
     chartEstimateMissingValuesCb = None
     chartAdaptiveTimeUnitCb = None
+    chartTableWindowCombo = None
 
     variableStatusLabel = None
 
@@ -88,12 +92,35 @@ class ApplicationWindow(QtWidgets.QMainWindow):
     connectionMgr = None
     debugMgr = None
     daqManager = None
+
+    # Background data export
+    exportThread = None
+    exportProgressDialog = None
+
+    # Capture file the next or running acquisition is recorded to
+    captureFileName = None
+    lastCaptureFile = None
     lastWinIdeaAstatus = -1
     waitingForDownload = None
 
     dataTable = None
     dataModel = None
 
+    # Pipeline statistics in the status bar and the diagnostics dialog
+    statsLabel = None
+    statsTimer = None
+
+    # Applies the array dimensions looked up in the background
+    symbolTimer = None
+    diagnosticsDialog = None
+
+    # sampleProfiler.SamplingProfiler while profiling and the base name of
+    # the files it is saved to
+    profiler = None
+    profileFileBase = None
+    profileTimer = None
+    profileAction = None
+
     def setWinIdeaConfig(self, cMgr, dMgr):
         self.connectionMgr = cMgr
         self.debugMgr = dMgr
@@ -140,6 +167,8 @@ class ApplicationWindow(QtWidgets.QMainWindow):
 
             # If at start the app was not downloaded and now it happened
             if (self.waitingForDownload and not cpuStatus.isMustInit()):
+                if self.daqManager != None:
+                    self.daqManager.stopSymbolLoader()
                 self.daqManager = DaqManager(self.connectionMgr)
                 self.variableControllGroup.setEnabled(True)
                 self.chartControllGroup.setEnabled(True)
@@ -226,7 +255,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         table.setCellWidget(newRowIndex, globals.TABLE_COLUMN_INTERVAL, intervalCombo)
 
         variableCombo = VariableChooserCombo(self, varConfig)
-        variableCombo.setVariables(self.daqManager.getVariables())
+        variableCombo.setCatalog(self.daqManager.getSymbolCatalog())
         variableCombo.setEditable(True)
         variableCombo.setToolTip("Name of the variable for which to gather data.")
         table.setCellWidget(newRowIndex, globals.TABLE_COLUMN_NAME, variableCombo)
@@ -376,6 +405,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         itemDelegate = DaqItemDelegate(self, self.dataModel)
         self.dataTable.setModel(self.dataModel)
         self.dataTable.setItemDelegate(itemDelegate)
+        self.chartTableWindowChanged()
 
         # Setup GUI using new configuration file
         for varConf in self.daqIdeaConfig.variableConfigs:
@@ -424,6 +454,25 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.exportDataAction.setEnabled(False)
         file_menu.addAction(self.exportDataAction)
 
+        # Record capture
+        self.recordCaptureAction = QtWidgets.QAction(QtGui.QIcon('\\..\\resources\\icons\\Save.png'), 'Record capture...', self)
+        self.recordCaptureAction.setStatusTip('Record the acquired samples to a capture file')
+        self.recordCaptureAction.setCheckable(True)
+        self.recordCaptureAction.triggered.connect(self.recordCaptureActionTriggered)
+        file_menu.addAction(self.recordCaptureAction)
+
+        # Open capture
+        self.openCaptureAction = QtWidgets.QAction(QtGui.QIcon('\\..\\resources\\icons\\Save.png'), 'Open capture...', self)
+        self.openCaptureAction.setStatusTip('Show the samples of a capture file')
+        self.openCaptureAction.triggered.connect(self.showOpenCaptureDialog)
+        file_menu.addAction(self.openCaptureAction)
+
+        # Replay capture
+        self.replayCaptureAction = QtWidgets.QAction(QtGui.QIcon('\\..\\resources\\icons\\Save.png'), 'Replay capture...', self)
+        self.replayCaptureAction.setStatusTip('Feed the samples of a capture file through the acquisition like a DAQ controller')
+        self.replayCaptureAction.triggered.connect(self.showReplayCaptureDialog)
+        file_menu.addAction(self.replayCaptureAction)
+
         # Exit
         file_menu.addAction('&Exit', self.fileQuit,QtCore.Qt.CTRL + QtCore.Qt.Key_X)
 
@@ -437,10 +486,22 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.menuBar().addMenu(help_menu)
 
         help_menu.addAction('&User Guide', self.help, QtGui.QKeySequence(QtCore.Qt.Key_F1))
+        help_menu.addAction('&Diagnostics...', self.showDiagnosticsDialog)
+
+        # Profiling
+        self.profileAction = QtWidgets.QAction('&Profile...', self)
+        self.profileAction.setStatusTip('Sample the stacks of the GUI and DAQ reader threads to flame graph files')
+        self.profileAction.setCheckable(True)
+        self.profileAction.setChecked(self.profiler != None)
+        self.profileAction.triggered.connect(self.profileActionTriggered)
+        help_menu.addAction(self.profileAction)
         help_menu.addAction('&About', self.about)
 
 
     def showExportDataDialog(self):
+        if self.isExportRunning():
+            return
+
         startFile = None
 
         # If no export has been done yet then take the daqIDEA configuration directory
@@ -459,22 +520,218 @@ class ApplicationWindow(QtWidgets.QMainWindow):
             'Comma separated values file (*.csv);;' +
             'Text file (*.txt)')
 
-        data = self.daqManager.getRawData()
+        # The export works on snapshots of the data, sampling may go on
+        data = [store.snapshot() for store in self.daqManager.getRawData()]
         varNames = self.canvasGraph.myParent.daqManager.getSelectedVariableNames()
+        dataModelFull = self.dataTable.model().dataModelFull
 
         if (fileType.find('.xlsx') != -1):
             fileName = self.appendFileExtension(fileName, '.xlsx')
-            # exporters.exportToExcel(fileName, data[0], data[1], varNames)
-            exporters.exportToExcel(self, fileName, self.dataTable.model(), varNames)
+
+            # Ask how to handle data that may not fit into one sheet
+            bDecimate = False
+            if sum(len(store) for store in data) >= exporters.EXCEL_MAX_ROWS:
+                answer = QtWidgets.QMessageBox.question(
+                    self,
+                    'Export data',
+                    'The data may have more rows than an Excel sheet can hold.\n\n' +
+                    'Yes: decimate the rows to fit into one sheet\n' +
+                    'No: continue on additional sheets',
+                    QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No | QtWidgets.QMessageBox.Cancel,
+                    QtWidgets.QMessageBox.No)
+                if answer == QtWidgets.QMessageBox.Cancel:
+                    return
+                bDecimate = (answer == QtWidgets.QMessageBox.Yes)
+
+            export = lambda progress: exporters.exportToExcel(self, fileName, data, varNames, dataModelFull, progress, bDecimate)
+            self.startExport(fileName, export, 'samples')
         elif (fileType.find('.csv') != -1):
             fileName = self.appendFileExtension(fileName, '.csv')
-            exporters.exportToCharSeparatedValues(fileName, data[0], data[1], ',', varNames, self.dataTable.model().dataModelFull)
+            export = lambda progress: exporters.exportToCharSeparatedValues(fileName, data, ',', varNames, dataModelFull, progress)
+            self.startExport(fileName, export, 'samples')
         elif (fileType.find('.txt') != -1):
             fileName = self.appendFileExtension(fileName, '.txt')
-            exporters.exportToCharSeparatedValues(fileName, data[0], data[1], ' ', varNames, self.dataTable.model().dataModelFull)
+            export = lambda progress: exporters.exportToCharSeparatedValues(fileName, data, ' ', varNames, dataModelFull, progress)
+            self.startExport(fileName, export, 'samples')
         else:
             logging.error("Invalid file extension for filename '%s'"%fileName)
 
+    #
+    # Runs export(progress) in an ExportThread and shows its progress
+    #
+    def startExport(self, fileName, export, unit):
+        self.exportDataAction.setEnabled(False)
+
+        dialog = QtWidgets.QProgressDialog('Exporting data to ' + fileName, 'Cancel',
+                                           0, ExportThread.progressSteps, self)
+        dialog.setWindowTitle('Export data')
+        dialog.setWindowModality(QtCore.Qt.NonModal)
+        dialog.setMinimumDuration(500)
+        dialog.setValue(0)
+        self.exportProgressDialog = dialog
+
+        self.exportThread = ExportThread(fileName, export, unit)
+        self.exportThread.signal.progress.connect(dialog.setValue)
+        self.exportThread.signal.finished.connect(self.exportFinished)
+        dialog.canceled.connect(self.exportThread.cancel)
+        self.exportThread.start()
+
+    def exportFinished(self, completed, message):
+        self.exportProgressDialog.reset()
+        self.exportDataAction.setEnabled(True)
+
+        logging.info(message)
+        self.statusBar().showMessage(message)
+
+    def isExportRunning(self):
+        return self.exportThread != None  and  self.exportThread.isRunning()
+
+    def getCaptureFileName(self):
+        if self.lastCaptureFile != None:
+            return self.lastCaptureFile
+        return os.path.dirname(self.getConfigurationFileName())
+
+    #
+    # Selects the capture file to record to. Recording starts at once if
+    # the acquisition is running, otherwise when it is started.
+    #
+    def recordCaptureActionTriggered(self, checked):
+        if not checked:
+            self.captureFileName = None
+            if self.daqManager != None:
+                self.daqManager.stopCapture()
+            return
+
+        fileName, fileType = QtWidgets.QFileDialog.getSaveFileName(
+            self,
+            'Record capture',
+            self.getCaptureFileName(),
+            'daqIDEA capture file (*.daqcap)')
+
+        if (len(fileName.strip()) == 0):
+            self.recordCaptureAction.setChecked(False)
+            return
+
+        self.captureFileName = self.appendFileExtension(fileName, '.daqcap')
+        self.lastCaptureFile = self.captureFileName
+
+        if not self.canvasGraph.isAnimationStopped():
+            self.startCapture()
+
+    def startCapture(self):
+        try:
+            self.daqManager.startCapture(self.captureFileName, self.daqIdeaConfig)
+            self.statusBar().showMessage("Recording capture to '%s'" % self.captureFileName)
+        except IOError as ex:
+            QtWidgets.QMessageBox.critical(
+                self, "Error!",
+                "Failed to create capture file '" +
+                os.path.abspath(self.captureFileName) + "': " + str(ex))
+            self.captureFileName = None
+            self.recordCaptureAction.setChecked(False)
+
+    def showOpenCaptureDialog(self):
+        if not self.canvasGraph.isAnimationStopped():
+            self.statusBar().showMessage('Stop the data acquisition to open a capture file')
+            return
+
+        fileName, fileType = QtWidgets.QFileDialog.getOpenFileName(
+            self,
+            'Open capture',
+            self.getCaptureFileName(),
+            'daqIDEA capture file (*.daqcap)')
+
+        if (len(fileName.strip()) > 0):
+            self.openCapture(fileName)
+
+    #
+    # Shows the samples and configuration of a capture file in the chart 
+    # and the data table
+    #
+    def openCapture(self, fileName):
+        try:
+            capture = captureFile.CaptureFile(fileName)
+        except (IOError, ValueError) as ex:
+            QtWidgets.QMessageBox.critical(
+                self, "Error!",
+                "Failed to open capture file '" +
+                os.path.abspath(fileName) + "': " + str(ex))
+            return
+
+        self.lastCaptureFile = fileName
+
+        if self.daqManager == None:
+            self.daqManager = DaqManager(self.connectionMgr)
+
+        self.initVariableTableGui(capture.config)
+
+        dataModel = self.dataTable.model()
+        dataModel.beginResetModel()
+        self.daqManager.openCapture(capture)
+        dataModel.endResetModel()
+        dataModel.updateDataModel()
+
+        self.canvasGraph.showDataUntil(self.daqManager.getLastSampleTime())
+        self.exportDataAction.setEnabled(not self.isExportRunning())
+
+        self.statusBar().showMessage("Opened capture '%s' recorded %s" % (fileName, capture.created))
+
+    def showReplayCaptureDialog(self):
+        if not self.canvasGraph.isAnimationStopped():
+            self.statusBar().showMessage('Stop the data acquisition to replay a capture file')
+            return
+
+        fileName, fileType = QtWidgets.QFileDialog.getOpenFileName(
+            self,
+            'Replay capture',
+            self.getCaptureFileName(),
+            'daqIDEA capture file (*.daqcap)')
+
+        if (len(fileName.strip()) == 0):
+            return
+
+        speedName, ok = QtWidgets.QInputDialog.getItem(
+            self,
+            'Replay capture',
+            'Replay speed:',
+            replay.REPLAY_SPEED_NAMES,
+            0,
+            False)
+
+        if ok:
+            speed = replay.REPLAY_SPEED_VALUES[replay.REPLAY_SPEED_NAMES.index(speedName)]
+            self.replayCapture(fileName, speed)
+
+    #
+    # Starts the acquisition with the samples of a capture file instead of 
+    # the DAQ controller, at 'speed' times real time (None for maximum 
+    # speed). The replay ends when the acquisition is stopped.
+    #
+    def replayCapture(self, fileName, speed):
+        try:
+            capture = captureFile.CaptureFile(fileName)
+        except (IOError, ValueError) as ex:
+            QtWidgets.QMessageBox.critical(
+                self, "Error!",
+                "Failed to open capture file '" +
+                os.path.abspath(fileName) + "': " + str(ex))
+            return
+
+        self.lastCaptureFile = fileName
+
+        if self.daqManager == None:
+            self.daqManager = DaqManager(self.connectionMgr)
+
+        self.initVariableTableGui(capture.config)
+
+        self.daqManager.setReplay(replay.ReplayDaqController(capture, speed))
+        self.chartPlayButtonPressed()
+
+        if self.canvasGraph.isAnimationRunning():
+            self.statusBar().showMessage("Replaying capture '%s'" % fileName)
+        else:
+            self.daqManager.setReplay(None)
+
     def appendFileExtension(self, fileName, fileExtension):
         if not fileName.endswith(fileExtension):
             fileName += fileExtension
@@ -596,6 +853,8 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.raise_()
         self.activateWindow()
 
+        if self.daqManager != None:
+            self.daqManager.stopSymbolLoader()
         self.daqManager = DaqManager(self.connectionMgr)
 
     def applicationStartButtonPressed(self):
@@ -711,6 +970,13 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.chartEstimateMissingValuesCb.clicked.connect(self.chartShowEstimatedValuesButtonPressed)
         layout.addWidget(self.chartEstimateMissingValuesCb)
 
+        self.chartTableWindowCombo = QtWidgets.QComboBox()
+        self.chartTableWindowCombo.setToolTip('Rows shown in the data table during the acquisition. All rows are shown when it is paused or stopped.')
+        self.chartTableWindowCombo.addItems(globals.tableWindowNames)
+        self.chartTableWindowCombo.setCurrentIndex(globals.TABLE_WINDOW_CHART)
+        self.chartTableWindowCombo.currentIndexChanged.connect(self.chartTableWindowChanged)
+        layout.addWidget(self.chartTableWindowCombo)
+
         group.setEnabled(False)
         parentLayout.addWidget(group, stretch=stretch)
 
@@ -725,7 +991,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
             self.appDownloadButton.setEnabled(False)
 
             self.variableTableEnableEditing(False)
-            self.exportDataAction.setEnabled(False)
+            self.exportDataAction.setEnabled(not self.isExportRunning())
 
     def chartPauseButtonPressed(self):
         self.chartPlayButton.setEnabled(True)
@@ -733,7 +999,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.chartStopButton.setEnabled(True)
 
         self.canvasGraph.pauseAnimation()
-        self.exportDataAction.setEnabled(True)
+        self.exportDataAction.setEnabled(not self.isExportRunning())
 
     def chartStopButtonPressed(self):
         self.chartPlayButton.setEnabled(True)
@@ -743,7 +1009,13 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.canvasGraph.stopAnimation()
         self.appDownloadButton.setEnabled(True)
         self.variableTableEnableEditing(True)
-        self.exportDataAction.setEnabled(True)
+        self.exportDataAction.setEnabled(not self.isExportRunning())
+
+        # The capture was closed with the acquisition
+        if self.captureFileName != None:
+            self.statusBar().showMessage("Capture written to '%s'" % self.captureFileName)
+            self.captureFileName = None
+            self.recordCaptureAction.setChecked(False)
 
     def chartAdaptiveTimeUnitButtonPressed(self):
         bAdapt = self.chartAdaptiveTimeUnitCb.isChecked()
@@ -761,6 +1033,13 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         self.dataTable.model().setDataModelEstimation(full)
         self.dataTable.model().updateDataModel()
 
+    def chartTableWindowChanged(self):
+        if self.chartTableWindowCombo == None or self.dataTable.model() == None:
+            return
+
+        self.dataTable.model().setWindowMode(self.chartTableWindowCombo.currentIndex(),
+                                             globals.getTableWindowRows())
+
     def variableTableEnableEditing(self, enable):
         configs = self.daqIdeaConfig.variableConfigs
 
@@ -805,7 +1084,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         group = self.mainTableGroup
         layout = QtWidgets.QVBoxLayout()
 
-        self.dataTable = QtWidgets.QTableView()
+        self.dataTable = DaqTableView()
 
         self.dataTable.setSortingEnabled(False)
         self.dataTable.setMinimumSize(QtCore.QSize(200, 100))
@@ -923,6 +1202,16 @@ class ApplicationWindow(QtWidgets.QMainWindow):
         # Status bar
         self.statusBar().showMessage("", 0)
 
+        self.statsLabel = QtWidgets.QLabel()
+        self.statusBar().addPermanentWidget(self.statsLabel)
+        self.statsTimer = QtCore.QTimer(self)
+        self.statsTimer.timeout.connect(self.updatePipelineStats)
+        self.statsTimer.start(globals.STATS_REFRESH_INTERVAL_MS)
+
+        self.symbolTimer = QtCore.QTimer(self)
+        self.symbolTimer.timeout.connect(self.updateSymbols)
+        self.symbolTimer.start(globals.SYMBOL_UPDATE_INTERVAL_MS)
+
         # Other global details of the window frame
         self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
         self.setGeometry(100, 100, 1400, 800)
@@ -959,6 +1248,7 @@ class ApplicationWindow(QtWidgets.QMainWindow):
     def closeEvent(self, event):
         if self.daqManager != None:
             self.daqManager.stopSampling()
+            self.daqManager.stopSymbolLoader()
 
         if len(self.daqIdeaConfig.variableConfigs) > 0:
 
@@ -976,6 +1266,127 @@ class ApplicationWindow(QtWidgets.QMainWindow):
                 elif reply == QtWidgets.QMessageBox.Cancel:
                     event.ignore()
 
+        if event.isAccepted() and self.daqManager != None:
+            self.daqManager.closeSpills()
+
+        if event.isAccepted():
+            self.stopProfiling()
+
+    #
+    # Symbol timer: applies the array dimensions resolved in the background
+    #
+    def updateSymbols(self):
+        if self.daqManager != None:
+            self.daqManager.applyResolvedSymbols()
+
+    #
+    # Stats timer: updates the rates and gauges of the pipeline statistics
+    # and their summary in the status bar
+    #
+    def updatePipelineStats(self):
+        stats = pipelineStats.stats
+        stats.updateRates()
+        if self.daqManager != None:
+            self.daqManager.updateMemoryStats()
+        self.canvasGraph.updateSchedulerStats()
+
+        if not self.canvasGraph.isAnimationRunning():
+            return
+
+        samples = stats.getCounter('samples', 'samples')
+        queueDepth = stats.getHistogram('queue.depth', 'samples').last
+        tablePaint = stats.getHistogram('table.paint.time', 's').last
+        memory = (stats.getGauge('memory.samples') or 0) + (stats.getGauge('memory.lod') or 0)
+
+        text = '%.0f samples/s  queue %s  frame %s  %.0f fps  table %s  overflows %d  memory %s' % (
+                    samples.rate,
+                    formatStatValue(queueDepth or 0, ''),
+                    formatStatValue(self.canvasGraph.renderScheduler.getDrawTime(), 's'),
+                    self.canvasGraph.renderScheduler.getFrameRate(),
+                    formatStatValue(tablePaint or 0, 's'),
+                    stats.getCounter('daq.overflows').total,
+                    formatStatValue(memory, 'B'))
+        self.statsLabel.setText(text)
+
+    def showDiagnosticsDialog(self):
+        if self.diagnosticsDialog == None:
+            self.diagnosticsDialog = DiagnosticsDialog(self)
+        self.diagnosticsDialog.refreshTimer.start(globals.STATS_REFRESH_INTERVAL_MS)
+        self.diagnosticsDialog.refresh()
+        self.diagnosticsDialog.show()
+        self.diagnosticsDialog.raise_()
+
+    def profileActionTriggered(self, checked):
+        if not checked:
+            self.stopProfiling()
+            return
+
+        self.profileAction.setChecked(False)
+
+        duration, ok = QtWidgets.QInputDialog.getInt(
+            self, 'Profile', 'Profiling time [s] (0 = until stopped):', 30, 0, 3600)
+        if not ok:
+            return
+
+        fileName, fileType = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Save profile', 'daqIDEA-profile', 'Speedscope files (*.speedscope.json)')
+        if not fileName:
+            return
+
+        if fileName.endswith('.speedscope.json'):
+            fileName = fileName[:-len('.speedscope.json')]
+
+        self.startProfiling(fileName, duration or None)
+
+    #
+    # Starts the sampling profiler, which is saved to fileBase.collapsed
+    # and fileBase.speedscope.json after 'duration' seconds or when stopped
+    #
+    def startProfiling(self, fileBase, duration=None):
+        if self.profiler != None:
+            return
+
+        self.profileFileBase = fileBase
+        self.profiler = sampleProfiler.SamplingProfiler()
+        self.profiler.start()
+
+        if duration != None:
+            self.profileTimer = QtCore.QTimer(self)
+            self.profileTimer.setSingleShot(True)
+            self.profileTimer.timeout.connect(self.stopProfiling)
+            self.profileTimer.start(int(duration * 1000))
+
+        if self.profileAction != None:
+            self.profileAction.setChecked(True)
+        logging.info("Profiling to '%s'"%(fileBase))
+
+    def stopProfiling(self):
+        if self.profiler == None:
+            return
+
+        if self.profileTimer != None:
+            self.profileTimer.stop()
+            self.profileTimer = None
+
+        profiler = self.profiler
+        self.profiler = None
+        profiler.stopRunning()
+        profiler.join()
+
+        if self.profileAction != None:
+            self.profileAction.setChecked(False)
+
+        try:
+            collapsedFile, speedscopeFile = profiler.save(self.profileFileBase)
+        except (IOError, OSError) as ex:
+            logging.exception(ex)
+            self.statusBar().showMessage("Failed to save the profile: %s" % str(ex))
+            return
+
+        message = "Profile of %d samples saved to '%s'" % (profiler.sampleCount, speedscopeFile)
+        logging.info(message)
+        self.statusBar().showMessage(message)
+
     def fileQuit(self):
         self.canvasGraph.stopAnimation()
         self.close()
@@ -999,6 +1410,9 @@ iSYSTEM daqIDEA
 
         if (wasConfigured):
             self.setVariableValidityStatus('black', '')
+
+            if self.captureFileName != None:
+                self.startCapture()
         else:
             if None != self.daqManager.lastErrorMsg:
                 self.setVariableValidityStatus('red', self.daqManager.lastErrorMsg)
@@ -1012,7 +1426,7 @@ iSYSTEM daqIDEA
 
 
 class DownloadSignal(QtCore.QObject):
-    downloaded = QtCore.Signal(str)
+    downloaded = QtCore.pyqtSignal(str)
 
 
 
@@ -1038,6 +1452,68 @@ class DownloadThread(QtCore.QThread):
                 return
             self.signal.downloaded.emit('Downloaded')
 
+class ExportSignal(QtCore.QObject):
+    # Progress in 1/ExportThread.progressSteps of the export
+    progress = QtCore.pyqtSignal(int)
+    # Completed (not cancelled or failed) and a message with the throughput
+    finished = QtCore.pyqtSignal(bool, str)
+
+
+
+class ExportThread(QtCore.QThread):
+
+    progressSteps = 1000
+
+    fileName = None
+    export = None
+    unit = None
+    signal = None
+
+    cancelled = False
+    lastProgress = -1
+    total = 0
+
+    def __init__(self, fileName, export, unit, parent=None):
+        QtCore.QThread.__init__(self, parent)
+        self.fileName = fileName
+        self.export = export
+        self.unit = unit
+        self.signal = ExportSignal()
+
+    def cancel(self):
+        self.cancelled = True
+
+    # Progress callback of the exporters
+    def reportProgress(self, done, total):
+        self.total = total
+
+        progress = int(self.progressSteps * done / max(total, 1))
+        if progress != self.lastProgress:
+            self.lastProgress = progress
+            self.signal.progress.emit(progress)
+
+        return not self.cancelled
+
+    def run(self):
+        start = time.time()
+        try:
+            completed = self.export(self.reportProgress)
+        except Exception as e:
+            logging.exception(e)
+            self.signal.finished.emit(False, 'Export to %s failed: %s' % (self.fileName, str(e)))
+            return
+
+        dt = max(time.time() - start, 1e-6)
+        if completed:
+            size = os.path.getsize(self.fileName)
+            message = 'Exported %d %s to %s in %.1f s (%.0f %s/s, %.1f MB/s)' % (
+                        self.total, self.unit, self.fileName, dt,
+                        self.total / dt, self.unit, size / 1e6 / dt)
+        else:
+            message = 'Export to %s cancelled' % self.fileName
+
+        self.signal.finished.emit(completed, message)
+
 def displayArguments(args):
     logging.info("Program argument count: %d" % len(args))
     for i in range(len(args)):
@@ -1048,6 +1524,9 @@ def main():
 
     displayArguments(sys.argv)
 
+    if iconnect.isFakeFallback():
+        globals.showModuleLoadFailedDialog('isystem.connect')
+
     try:
         #
         # Start Application
@@ -1060,6 +1539,11 @@ def main():
         globals.mainApplicationWindow = ApplicationWindow()
         logging.info('Done.')
 
+        # Profiling from the start: --profile FILE [--profile-time SECONDS]
+        profileArguments = sampleProfiler.getProfileArguments(sys.argv)
+        if profileArguments != None:
+            globals.mainApplicationWindow.startProfiling(*profileArguments)
+
         logging.info('Starting iConnect...')
         cmgr = ic.ConnectionMgr()
         logging.info('Connecting to winIDEA...')
@@ -1090,6 +1574,5 @@ def main():
 
 
 if __name__ == '__main__':
-    # cProfile.run('main()')
     main()
 
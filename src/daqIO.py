@@ -4,7 +4,7 @@
 
 from __future__ import print_function
 
-import isystem.connect as ic
+from iconnect import ic
 
 HIL_DIN = 0
 HIL_DOUT = 1
@@ -1,63 +1,118 @@
 
 from __future__ import print_function
 
-import sys, csv, time, random, bisect
+import sys, os, csv, time, random, tempfile, collections, itertools
 import logging
 
+import numpy as np
+
 from math import *
-from PyQt5 import QtCore
-import isystem.connect as ic
-import daqIO, variable
+from iconnect import ic
+import daqIO, variable, sampleStore, sampleSpill, sampleRing, lodPyramid, captureFile, exporters, timeIndex, symbolCatalog, symbolCache
+from pipelineStats import stats
 
 import threading
 
+# Value kinds of the samples of a DAQ index, see decodeSamples()
+SAMPLE_NONE = 0
+SAMPLE_FLOAT = 1
+SAMPLE_INT = 2
+SAMPLE_UINT64 = 3
+
 try:
     import pylab as plab
     isPyLabInstalled = True
 except ImportError as ex:
     isPyLabInstalled = False
 
-# In Python 3 the module Queue was renamed to queue
-try:
-    from Queue import Queue
-except ImportError:
-    from queue import Queue
-
 class DaqManager():
     
     allVariables = []
     qNameVariableMap = []
     variableMap = dict()
+    
+    # symbolCatalog.SymbolCatalog of the full names of allVariables
+    symbolCatalog = None
+    
+    # Array variables whose dimensions are not known yet by full name, and
+    # the SymbolLoaderThread looking them up with its own data controller
+    unresolvedArrays = None
+    symbolLoader = None
+    symbolDataCtrl = None
+    
+    # symbolCache.PartitionSymbols of every download file by partition name
+    # (None for the default partition), stored in the symbol cache
+    symbolPartitions = None
 
     selectedNames = []
     
-    sampleQueue = Queue()
+    # sampleRing.SampleRing between the reader thread and the GUI
+    sampleQueue = None
     sampleReaderThread = None
     
-    datax = None
-    datay = None
-    allTimePoints = None
+    # One sampleStore.SampleStore per DAQ configuration index and the
+    # timeIndex.TimeIndex of their sample times, the rows of the data table
+    sampleData = None
+    timeIndex = None
+    
+    # lodPyramid.LodPyramid of every sample store
+    sampleLod = None
+    
+    # captureFile.CaptureWriter recording the samples, if any
+    captureWriter = None
+    
+    # Samples older than memoryWindow seconds are spilled to files in 
+    # spillDirectory (None if disabled). Samples older than retentionTime 
+    # seconds or beyond retentionSize bytes are dropped, if not 0.
+    spillDirectory = None
+    memoryWindow = 0
+    retentionTime = 0
+    retentionSize = 0
+
+    # replay.ReplayDaqController or fakeDaq.FakeDaqController used instead
+    # of the DAQ controller on the next start, and the DAQ controller it 
+    # replaces
+    replayCtrl = None
+    liveDaqCtrl = None
 
     daqCtrl = None
     dataCtrl = None
     hilCtrl = None
     memCtrl = None
+    ideCtrl = None
+    cfgCtrl = None
     wasConfigured = False
     
     daqTimeStart = None
     daqTimeFactor = 0
     
-    lastTimeFound = None
-    lastIndexFound = None
-    lastRowFound = None
-
     lastMinIndex = None
     lastMaxIndex = None
 
     lastErrorMsg = None
     
+    # Value kind (SAMPLE_*) of every DAQ index, resolved from its first 
+    # sample
+    sampleKinds = None
     
+    
+    #
+    # Without a connection manager (None) there are no controllers and no
+    # variables. Captures can be opened and replayed, and synthetic samples
+    # acquired with fakeDaq.
+    #
     def __init__(self, cmgr):
+        if cmgr == None:
+            self.sampleQueue = sampleRing.SampleRing()
+            self.resetPlotData([])
+            self.allVariables = []
+            self.variableMap = dict()
+            self.qNameVariableMap = dict()
+            self.symbolCatalog = symbolCatalog.SymbolCatalog([])
+            self.unresolvedArrays = dict()
+            self.symbolPartitions = dict()
+            return
+        
         try:
             self.daqCtrl = ic.CDAQController(cmgr)
             self.dataCtrl = ic.CDataController2(cmgr)
@@ -65,12 +120,14 @@ class DaqManager():
             self.ideCtrl = ic.CIDEController(cmgr)
             self.memCtrl = ic.CAddressController(cmgr)
             self.cfgCtrl = ic.CConfigurationController(cmgr)
+            self.symbolDataCtrl = ic.CDataController2(cmgr)
 
         except  Exception as e:
             logging.error("Failed to initialize iConnect data controller!")
             logging.exception(e)
 
-        self.resetPlotData(0)
+        self.sampleQueue = sampleRing.SampleRing()
+        self.resetPlotData([])
 
         self.initVariableNamesList()
      
@@ -82,7 +139,16 @@ class DaqManager():
         
         
         
+    #
+    # Lists the variables of all partitions. Only names and type names are
+    # read, which needs one call per partition. The dimensions of arrays
+    # take one winIDEA round-trip per dimension, they are looked up by the
+    # SymbolLoaderThread or on demand and applied with 
+    # applyResolvedSymbols(). Partitions whose download file did not change
+    # are loaded from the symbol cache with the dimensions found before.
+    #
     def initVariableNamesList(self):
+        import globals
         logging.info("Loading variable names:")
         
         defaultPartition = self.ideCtrl.getOptionInt('/IDE/Debug.DownloadFiles.DefaultFile')
@@ -94,6 +160,9 @@ class DaqManager():
         self.allVariables = []
         self.variableMap = dict()
         self.qNameVariableMap = dict()
+        self.unresolvedArrays = dict()
+        self.symbolPartitions = dict()
+        cache = symbolCache.SymbolCache(globals.getSymbolCacheDirectory())
         
         #
         # Add all variables from all partitions
@@ -108,27 +177,30 @@ class DaqManager():
             logging.info("File %s"%(dlFileName))
             dlFilePath = paths[partitionIdx]
             
-            vars = ic.VariableVector()
-            self.dataCtrl.getVariables(partitionIdx, vars)
-            logging.info("Variable count: %d"%(vars.size()))
-            for var in vars:
-                try:
-                    name = var.getName()
-                    type = var.getType()
-                    logging.info("\tloading var '%s %s'"%(type, name))
-                    if partitionIdx == defaultPartition:
-                        newVar = variable.DaqVariable.fromVariable(name, None, type, self.dataCtrl)
-                    else:
-                        newVar = variable.DaqVariable.fromVariable(name, dlFileName, type, self.dataCtrl)
-                    self.allVariables.append(newVar)
-                    
-                    if partitionIdx == defaultPartition:
-                        #print ("Adding to map '%s'"%(newVar.name))
-                        self.variableMap[newVar.name] = newVar
-                    #print ("Adding to qMap '%s'"%(newVar.fullName))
-                    self.qNameVariableMap[newVar.fullName] = newVar
-                except:
-                    logging.warn("Failed to load variable '%s' details"%(name))
+            partitionName = dlFileName
+            if partitionIdx == defaultPartition:
+                partitionName = None
+            
+            symbols = symbolCache.PartitionSymbols(dlFilePath, cache.getKey(dlFilePath), partitionName)
+            entries = cache.load(symbols.key)
+            if entries != None:
+                symbols.setEntries(entries)
+                logging.info("Variable count: %d (symbol cache)"%(len(symbols.variables)))
+            else:
+                self.listPartitionVariables(partitionIdx, symbols)
+            self.symbolPartitions[partitionName] = symbols
+            
+            for newVar in symbols.variables:
+                self.allVariables.append(newVar)
+                
+                if not newVar.indicesResolved:
+                    self.unresolvedArrays[newVar.fullName] = newVar
+                
+                if partitionIdx == defaultPartition:
+                    #print ("Adding to map '%s'"%(newVar.name))
+                    self.variableMap[newVar.name] = newVar
+                #print ("Adding to qMap '%s'"%(newVar.fullName))
+                self.qNameVariableMap[newVar.fullName] = newVar
         
         #
         # Add I/O hil channels
@@ -154,6 +226,160 @@ class DaqManager():
         newVar = variable.DaqVariable.fromMemAddress(0x00000000)
         self.allVariables.append(newVar)
         self.variableMap[newVar.name] = newVar
+        
+        self.symbolCatalog = symbolCatalog.SymbolCatalog([var.fullName for var in self.allVariables])
+        logging.info("Symbol catalog: %d names, %d arrays to resolve"%(len(self.symbolCatalog), 
+                                                                      len(self.unresolvedArrays)))
+        
+        self.startSymbolLoader()
+        if self.symbolLoader == None:
+            self.saveSymbolCache()
+    
+    
+    #
+    # Lists the variables of a partition from winIDEA
+    #
+    def listPartitionVariables(self, partitionIdx, symbols):
+        vars = ic.VariableVector()
+        self.dataCtrl.getVariables(partitionIdx, vars)
+        logging.info("Variable count: %d"%(vars.size()))
+        for var in vars:
+            try:
+                name = var.getName()
+                type = var.getType()
+                logging.debug("\tloading var '%s %s'"%(type, name))
+                newVar = variable.DaqVariable.fromVariable(name, symbols.partitionName, type, None)
+                symbols.variables.append(newVar)
+            except:
+                logging.warn("Failed to load variable '%s' details"%(name))
+        symbols.dirty = True
+    
+    
+    #
+    # Stores the partitions whose variables changed in the symbol cache
+    #
+    def saveSymbolCache(self):
+        import globals
+        cache = symbolCache.SymbolCache(globals.getSymbolCacheDirectory())
+        for symbols in self.symbolPartitions.values():
+            if symbols.dirty:
+                cache.store(symbols.key, symbols.getEntries())
+                symbols.dirty = False
+    
+    
+    def startSymbolLoader(self):
+        self.stopSymbolLoader()
+        
+        if len(self.unresolvedArrays) == 0  or  self.symbolDataCtrl == None:
+            return
+        
+        arrays = [(fullName, var.name, var.fullType) 
+                  for fullName, var in self.unresolvedArrays.items()]
+        self.symbolLoader = SymbolLoaderThread(self.symbolDataCtrl, arrays)
+        self.symbolLoader.start()
+    
+    
+    #
+    # Stops looking up array dimensions. The ones found so far are applied
+    # and stored in the symbol cache.
+    #
+    def stopSymbolLoader(self):
+        if self.symbolLoader != None:
+            self.symbolLoader.stopRunning()
+            self.symbolLoader.join()
+            self.applyResolvedSymbols()
+    
+    
+    #
+    # Number of arrays whose dimensions are not known yet
+    #
+    def getUnresolvedSymbolCount(self):
+        return len(self.unresolvedArrays)
+    
+    
+    def isResolvingSymbols(self):
+        return self.symbolLoader != None
+    
+    
+    #
+    # Applies the array dimensions found by the SymbolLoaderThread since the
+    # last call. Returns the number of renamed variables.
+    #
+    def applyResolvedSymbols(self):
+        if self.symbolLoader == None:
+            return 0
+        
+        count = 0
+        for fullName, indices in self.symbolLoader.popResults():
+            var = self.unresolvedArrays.get(fullName)
+            if var != None:
+                self.setArrayIndices(var, indices)
+                count += 1
+        
+        if not self.symbolLoader.is_alive()  and  not self.symbolLoader.hasResults():
+            self.symbolLoader.join()
+            self.symbolLoader = None
+            logging.info("Array dimensions resolved, %d arrays unresolved"%(len(self.unresolvedArrays)))
+            self.saveSymbolCache()
+        
+        return count
+    
+    
+    #
+    # Sets the dimensions returned by DaqVariable.extractIndices() of an 
+    # unresolved array, or None if they could not be found. The array keeps
+    # its name then.
+    #
+    def setArrayIndices(self, var, indices):
+        oldName = var.fullName
+        del self.unresolvedArrays[oldName]
+        
+        symbols = self.symbolPartitions.get(var.partitionName)
+        if symbols != None:
+            symbols.dirty = True
+        
+        if indices == None:
+            var.indicesResolved = True
+            return
+        
+        var.setIndices(*indices)
+        
+        if self.qNameVariableMap.get(oldName) is var:
+            del self.qNameVariableMap[oldName]
+            self.qNameVariableMap[var.fullName] = var
+        self.symbolCatalog.rename(oldName, var.fullName)
+    
+    
+    #
+    # Looks up the dimensions of the unresolved array a name refers to,
+    # e.g. myTable[4] or myTable[4],,other.elf, right away. Returns the 
+    # variable if the name is its full name.
+    #
+    def resolveArray(self, name):
+        partIdx = name.find(',,')
+        partition = ''
+        if partIdx >= 0:
+            partition = name[partIdx:]
+            name = name[:partIdx]
+        
+        baseName = name
+        if '[' in name:
+            baseName = name[:name.index('[')]
+        
+        var = self.unresolvedArrays.get(baseName + partition)
+        if var == None:
+            return None
+        
+        try:
+            indices = variable.DaqVariable.extractIndices(var.fullType, var.name, self.dataCtrl)
+        except Exception as ex:
+            logging.debug("Failed to resolve array '%s': %s"%(var.name, str(ex)))
+            indices = None
+        self.setArrayIndices(var, indices)
+        
+        if var.fullName == name + partition:
+            return var
+        return None
 
 
     def isDaqConfigured(self):
@@ -164,12 +390,19 @@ class DaqManager():
         return self.allVariables
     
     
+    def getSymbolCatalog(self):
+        return self.symbolCatalog
+    
+    
     def getSelectedVariableNames(self):
         return self.selectedNames
                 
 
     # Gets new variable from data controller
     def loadNewVariable(self, name):
+        if self.dataCtrl == None:
+            return None
+        
         print ("Looking for new variable '%s'"%name)
         
         partitionName = None
@@ -219,21 +452,70 @@ class DaqManager():
             if name in self.qNameVariableMap:
                 return self.qNameVariableMap[name]
             else:
+                # Arrays are named with their dimensions
+                var = self.resolveArray(name)
+                if var != None:
+                    return var
+                
                 # We get a new variable (used in case of 
                 # structures or unions...)
                 return self.loadNewVariable(name)
 
-    def resetPlotData(self, variableCount):
-        self.datax = []
-        self.datay = []
-        self.allTimePoints = []
-        self.lastTimeFound = [0]*variableCount
-        self.lastIndexFound = [0]*variableCount
-        self.lastRows = [-10]*variableCount
+    #
+    # Value types of the sample stores are taken from the variables, unless
+    # given by DAQ index
+    #
+    def resetPlotData(self, config, valueTypes=None):
+        import globals
         
-        for i in range(0, variableCount):
-            self.datax.append([])
-            self.datay.append([])
+        variableCount = len(config)
+        
+        self.closeSpills()
+        self.memoryWindow, self.retentionTime, self.retentionSize, directory = \
+            globals.getSampleStorageSettings()
+        
+        # Value type of every DAQ index is taken from its variable
+        if valueTypes == None:
+            valueTypes = [sampleStore.getValueType(None)]*variableCount
+            for varConfig in config:
+                if varConfig.daqConfigIndex >= 0:
+                    valueTypes[varConfig.daqConfigIndex] = sampleStore.getValueType(varConfig.variable)
+
+        spills = [None]*len(valueTypes)
+        if self.memoryWindow > 0 and len(valueTypes) > 0:
+            try:
+                self.spillDirectory = tempfile.mkdtemp(prefix='daqIDEA-', dir=directory)
+                spills = [sampleSpill.SampleSpill(self.spillDirectory, 'daq%d'%(daqIdx), 
+                                                  sampleStore.CHUNK_SIZE, t)
+                          for daqIdx, t in enumerate(valueTypes)]
+            except (IOError, OSError) as ex:
+                logging.error("Can't create spill directory in '%s', all samples are kept in memory"%(directory))
+                logging.exception(ex)
+        
+        self.sampleData = [sampleStore.SampleStore(t, spill=spill) for t, spill in zip(valueTypes, spills)]
+        self.sampleLod = [lodPyramid.LodPyramid() for t in valueTypes]
+        self.timeIndex = timeIndex.TimeIndex(self.sampleData)
+
+    #
+    # Removes the spill files of the sample stores and the files of a
+    # timeIndex.MappedTimeIndex
+    #
+    def closeSpills(self):
+        if self.timeIndex != None:
+            self.timeIndex.close()
+        
+        if self.sampleData != None:
+            for store in self.sampleData:
+                if store.spill != None:
+                    store.spill.close()
+                    store.spill = None
+        
+        if self.spillDirectory != None:
+            try:
+                os.rmdir(self.spillDirectory)
+            except OSError:
+                logging.warning("Can't remove spill directory '%s'"%(self.spillDirectory))
+            self.spillDirectory = None
 
     def checkDAQControllerAvailability(self):
         import globals
@@ -244,12 +526,14 @@ class DaqManager():
         except:
             bIsAvailable = False
 
-        if daqInfo.getMaxItems() == 0:
+        if bIsAvailable and daqInfo.getMaxItems() == 0:
             bIsAvailable = False
 
         if not bIsAvailable:
             strTitle = "Data Acquisition (DAQ)"
-            strIsDemo = self.ideCtrl.getOptionStr('/IDE/Asyst.Demo')
+            strIsDemo = None
+            if self.ideCtrl != None:
+                strIsDemo = self.ideCtrl.getOptionStr('/IDE/Asyst.Demo')
             if 'true' == strIsDemo:
                 strMsg = "Data Acquisition (DAQ) system is not available while winIDEA is in Demo Mode."
             else:
@@ -267,7 +551,12 @@ class DaqManager():
         self.lastSampleTimes = []
         self.firstSampleRed = False
         self.firstSampleTime = 0
+        self.sampleKinds = dict()
+        stats.reset()
 
+        if self.replayCtrl != None:
+            return self.startReplay(config)
+        
         if not self.checkDAQControllerAvailability():
             return
         
@@ -283,6 +572,7 @@ class DaqManager():
 
         nCfgIdx = 0
         vecDAQConfig = ic.DAQConfigVector();
+        valueTypes = [sampleStore.getValueType(None)]*len(config)
         for varConfig in config:
             varConfig.daqConfigIndex = -1
             if (varConfig.enabled):
@@ -298,6 +588,7 @@ class DaqManager():
                 try:
                     varInfo = self.memCtrl.getSymbolInfo(ic.IConnectDebug.fMonitor | ic.IConnectDebug.gafExpression, varConfig.name)
                     varType = varInfo.getMType()
+                    valueType = sampleStore.getSymbolValueType(varType)
                     if not varType.m_byType in [ic.SType.tUnsigned, ic.SType.tSigned, ic.SType.tFloat]: 
                         self.lastErrorMsg = "Only simple types allowed for sampling: '{}'".format(varConfig.name)
                         return False
@@ -321,6 +612,7 @@ class DaqManager():
                         logging.exception(err)
                         return False
                     daqConfigItem = ic.CDAQConfigItem(4, 0, addr, t)
+                    valueType = sampleStore.getValueType(var)
                 # ADIO disabled for DAQController so this code was not ported
                 #elif daqIO.HIL_ENABLED and var.simpleType == variable.TYPE_IO:
                 #    if var.portType == daqIO.HIL_DIN:
@@ -342,6 +634,7 @@ class DaqManager():
 
                 vecDAQConfig.append(daqConfigItem)
                 varConfig.daqConfigIndex = nCfgIdx
+                valueTypes[nCfgIdx] = valueType
                 nCfgIdx += 1
 
         try:
@@ -351,7 +644,7 @@ class DaqManager():
           logging.info("Exception caught: ", ex)
           return False;
 
-        self.resetPlotData(len(config))
+        self.resetPlotData(config, valueTypes)
         self.resetDownsampleMetadata(len(config))
         
         if not self.checkDAQControllerAvailability():
@@ -364,19 +657,19 @@ class DaqManager():
         self.daqTimeStart = daqStatus.getTime() * self.daqTimeFactor
     
         # Get initial values at chart draw time point ZERO
-        for i, varConfig in enumerate(config):
-            if (varConfig.enabled):
-                var = varConfig.variable
+        for varConfig in config:
+            if (varConfig.enabled  and  varConfig.daqConfigIndex >= 0):
+                store = self.sampleData[varConfig.daqConfigIndex]
                 
-                if (len(self.datax[i]) == 0):
+                if (len(store) == 0):
                     time = 0;
                     value = self.getInitialValue(varConfig)
 
-                    self.datax[i].append(time)
-                    self.datay[i].append(value)
+                    store.append(time, value)
+                    self.sampleLod[varConfig.daqConfigIndex].extend([time], [value])
         
         # Manually set the time point 0 for the initial values
-        self.allTimePoints.append(0)
+        self.timeIndex.merge(np.zeros(1))
         
         #
         # Create the thread for reading sample data out of the DAQ queue
@@ -392,6 +685,57 @@ class DaqManager():
         
         return True
     
+    #
+    # Selects a replay.ReplayDaqController to replay a capture instead of 
+    # acquiring samples, None for the DAQ controller. The replay is used 
+    # until sampling is stopped.
+    #
+    def setReplay(self, replayCtrl):
+        if self.replayCtrl == None:
+            self.liveDaqCtrl = self.daqCtrl
+        
+        self.replayCtrl = replayCtrl
+        if replayCtrl != None:
+            self.daqCtrl = replayCtrl
+        else:
+            self.daqCtrl = self.liveDaqCtrl
+            self.liveDaqCtrl = None
+    
+    def isReplaying(self):
+        return self.replayCtrl != None
+    
+    #
+    # Starts sampling from the replay controller. The configuration must be
+    # the one of the replayed capture, it keeps the DAQ indices.
+    #
+    def startReplay(self, config):
+        self.daqTimeFactor = self.daqCtrl.info().getTick_ns() / 1000000000.0
+        self.lastErrorMsg = None
+        
+        self.selectedNames = []
+        for varConfig in config:
+            if varConfig.enabled and varConfig.daqConfigIndex >= 0:
+                self.selectedNames.append(varConfig.name)
+        
+        self.resetPlotData(config, self.replayCtrl.getValueTypes())
+        self.resetDownsampleMetadata(len(config))
+        
+        self.replayCtrl.rewind()
+        self.daqCtrl.enableGlobal(True)
+        self.daqTimeStart = self.daqCtrl.status().getTime() * self.daqTimeFactor
+        
+        # The initial values at time 0 are replayed with the samples
+        self.timeIndex.merge(np.zeros(1))
+        
+        self.sampleReaderThread = DaqWorkerThread(self)
+        self.sampleReaderThread.start()
+        
+        self.wasConfigured = True
+        
+        logging.info("Replay of %s started"%(self.replayCtrl.getName()))
+        
+        return True
+    
     '''
     def prependFakeData(self, x, y, count, time):
         
@@ -453,124 +797,398 @@ class DaqManager():
         return val
         
         
+    #
+    # Moves the samples available in the DAQ controller to the sample queue.
+    # Returns the number of samples that were available and the overflow 
+    # flag so the reader thread can adjust its polling interval.
+    #
     def queueSamplingData(self):
         daqStatus = self.daqCtrl.status()
+        
+        numAvailable = daqStatus.getNumSamplesAvailable()
+        overflow = False
 
         # if any sample is available, display the status and print the samples  
-        if daqStatus.getNumSamplesAvailable() > 0:
-            if daqStatus.getOverflow():
+        if numAvailable > 0:
+            overflow = daqStatus.getOverflow()
+            if overflow:
                 logging.warning('SAMPLING OVERFLOW!')  
+                stats.count('daq.overflows')
 
+            start = time.time()
+            
             # read available samples into daqSamples
-            daqSamples = ic.DAQSampleVector()
+            daqSamples = self.newSampleVector()
             self.daqCtrl.read(daqSamples)
             
-            for daqSample in daqSamples:
-                varIndex = daqSample.getIndex()
-                sampleTime = daqSample.getTime()
-                t = self.daqCtrl.getDataValue(daqSample)
-                
-                bIsValid = True
-                sampleValue = 0
-                if t.isTypeSigned() or t.isTypeUnsigned():
-                    sampleValue = t.getLong()
-                elif t.isTypeFloat():
-                    dVal = t.getDouble()
-                    if (float('inf') == dVal):
-                        sampleValue = 0
-                        bIsValid = False
-                    else:
-                        sampleValue = dVal
-                    
-                if bIsValid:
-                    row = [varIndex, sampleTime, sampleValue]
-                    self.sampleQueue.put(row)
+            batch = self.decodeSamples(daqSamples)
+            if batch != None:
+                self.sampleQueue.pushMany(*batch)
+            
+            stats.add('daq.read.batch', len(daqSamples), 'samples')
+            stats.add('daq.read.time', time.time() - start, 's')
+        
+        return numAvailable, overflow
+    
+    #
+    # Returns an empty vector for daqCtrl.read(), a list for a replay
+    #
+    def newSampleVector(self):
+        if self.replayCtrl != None:
+            return []
+        return ic.DAQSampleVector()
+    
+    #
+    # Returns the polling scheduler of the running reader thread or None
+    #
+    def getPollScheduler(self):
+        if self.sampleReaderThread == None:
+            return None
+        return self.sampleReaderThread.scheduler
+    
+    #
+    # Decodes the whole sample vector into [index, tick time, value, integer
+    # value] arrays. Integer samples are kept exact in the int64 integer
+    # values, uint64 ones with their bit pattern, and converted to float64 
+    # in the values. Float samples only set the values, invalid (infinite)
+    # ones are dropped.
+    #
+    # The value getter is selected once per value kind, not per sample.
+    #
+    def decodeSamples(self, daqSamples):
+        n = len(daqSamples)
+        if n == 0:
+            return None
+        
+        getDataValue = self.daqCtrl.getDataValue
+        indices = np.array([s.getIndex() for s in daqSamples], dtype=np.int32)
+        times = np.array([s.getTime() for s in daqSamples], dtype=np.int64)
+        dataValues = [getDataValue(s) for s in daqSamples]
+        
+        kinds = self.sampleKinds
+        varIndices = np.unique(indices).tolist()
+        for varIndex in varIndices:
+            if varIndex not in kinds:
+                i = int(np.argmax(indices == varIndex))
+                self.resolveSampleKind(varIndex, dataValues[i])
+        
+        if len(set(kinds[varIndex] for varIndex in varIndices)) == 1:
+            kindMasks = [(kinds[varIndices[0]], None)]
+        else:
+            kindOf = np.zeros(max(varIndices) + 1, dtype=np.int8)
+            for varIndex in varIndices:
+                kindOf[varIndex] = kinds[varIndex]
+            sampleKinds = kindOf[indices]
+            kindMasks = [(kind, sampleKinds == kind) for kind in np.unique(sampleKinds).tolist()]
+        
+        values = np.zeros(n, dtype=np.float64)
+        intValues = np.zeros(n, dtype=np.int64)
+        for kind, mask in kindMasks:
+            if mask is None:
+                selected = dataValues
+                m = slice(None)
+            else:
+                selected = list(itertools.compress(dataValues, mask.tolist()))
+                m = mask
+            
+            if kind == SAMPLE_FLOAT:
+                values[m] = [v.getDouble() for v in selected]
+            elif kind == SAMPLE_INT:
+                intValues[m] = [v.getLong() for v in selected]
+                values[m] = intValues[m]
+            elif kind == SAMPLE_UINT64:
+                longs = [v.getLong() for v in selected]
+                try:
+                    unsigned = np.array(longs, dtype=np.uint64)
+                except OverflowError:
+                    # The getter returned the signed bit pattern
+                    unsigned = np.array(longs, dtype=np.int64).view(np.uint64)
+                intValues[m] = unsigned.view(np.int64)
+                values[m] = unsigned
+        
+        valid = values != float('inf')
+        if not valid.all():
+            indices = indices[valid]
+            times = times[valid]
+            values = values[valid]
+            intValues = intValues[valid]
+        
+        return [indices, times, values, intValues]
+    
+    #
+    # Selects the value kind of a DAQ index by the type of its sample and 
+    # the value type of its sample store
+    #
+    def resolveSampleKind(self, varIndex, dataValue):
+        if dataValue.isTypeSigned() or dataValue.isTypeUnsigned():
+            kind = SAMPLE_INT
+            if varIndex < len(self.sampleData) and self.sampleData[varIndex].valueType == np.uint64:
+                kind = SAMPLE_UINT64
+        elif dataValue.isTypeFloat():
+            kind = SAMPLE_FLOAT
+        else:
+            kind = SAMPLE_NONE
+        
+        self.sampleKinds[varIndex] = kind
+        return kind
 
     #
-    # Updates the datax and datay data arrays with the newest sampling data
-    # available
+    # Updates the sample stores with the newest sampling data available
     #
     def deQueueSamplingData(self, tableDataModel):
-        allNewTimePoints = [self.allTimePoints[-1]]
+        start = time.time()
+        stats.add('queue.depth', len(self.sampleQueue), 'samples')
         
-        # First get all the newest data
-        while (not self.sampleQueue.empty()):
-            row = self.sampleQueue.get()
-            varIdx = row[0]
-            sampleTime = row[1] * self.daqTimeFactor - self.daqTimeStart
-            sampleValue = row[2]
-            
-            self.datax[varIdx].append(sampleTime)
-            self.datay[varIdx].append(sampleValue)
-            
-            #if (sampleTime > self.allTimePoints[-1]):
-            #    self.allTimePoints.append(sampleTime)
-            
-            if (sampleTime > allNewTimePoints[-1]):
-                allNewTimePoints.append(sampleTime)
-
-        if len(allNewTimePoints) > 1:
-            # First and last edited line
-            i1 = len(self.allTimePoints) - 1
-            i2 = i1 + len(allNewTimePoints) - 1
-
-            # WE will have to change the last existing row if data was added 
-            # to it            
-            tableDataModel.beginRemoveRows(QtCore.QModelIndex(), i1, i1)
-            tableDataModel.endRemoveRows()
+        newTimes = [[] for store in self.sampleData]
+        newValues = [[] for store in self.sampleData]
+        
+        # Integer stores take the exact integer values
+        intTypes = [store.valueType.kind in 'iu' for store in self.sampleData]
+        
+        def consume(indices, ticks, values, intValues):
+            sampleTimes = ticks * self.daqTimeFactor - self.daqTimeStart
             
-            # We add new data rows to the table data model
-            tableDataModel.beginInsertRows(QtCore.QModelIndex(), i1, i2);
-            self.allTimePoints.extend(allNewTimePoints[1:])
-            tableDataModel.endInsertRows()
+            for varIdx in np.unique(indices):
+                m = indices == varIdx
+                newTimes[varIdx].append(sampleTimes[m])
+                if intTypes[varIdx]:
+                    newValues[varIdx].append(intValues[m].view(self.sampleData[varIdx].valueType))
+                else:
+                    newValues[varIdx].append(values[m])
+        
+        # First get all the newest data
+        self.sampleQueue.drainInto(consume)
+        
+        allNewTimes = []
+        for varIdx, store in enumerate(self.sampleData):
+            if len(newTimes[varIdx]) > 0:
+                times = np.concatenate(newTimes[varIdx])
+                values = np.concatenate(newValues[varIdx])
+                store.extend(times, values)
+                self.sampleLod[varIdx].extend(times, values)
+                self.countSamples(varIdx, len(times))
+                allNewTimes.append(times)
+                
+                if self.captureWriter != None:
+                    self.captureWriter.write(varIdx, times, values)
+        
+        if self.captureWriter != None:
+            self.captureWriter.flushIfDue()
+        
+        self.limitSampleMemory()
 
+        if len(allNewTimes) > 0:
+            # The rows from the first new sample time on are replaced, 
+            # usually the last existing row and the new ones. The table 
+            # views are told once per frame, see DaqTableModel.publishRows().
+            r0 = self.timeIndex.merge(np.concatenate(allNewTimes))
+            tableDataModel.invalidateRows(r0)
+        
+        self.dropTableRows(tableDataModel)
+        
+        stats.add('ingest.time', time.time() - start, 's')
 
+    #
+    # Counts the samples of a DAQ index in the statistics
+    #
+    def countSamples(self, varIdx, n):
+        stats.count('samples', n, 'samples')
+        if varIdx < len(self.selectedNames):
+            stats.count('samples.' + self.selectedNames[varIdx], n, 'samples')
+        else:
+            stats.count('samples.daq%d'%(varIdx), n, 'samples')
+    
+    #
+    # Sets the memory and queue gauges of the statistics
+    #
+    def updateMemoryStats(self):
+        if self.sampleData == None:
+            return
+        
+        stats.setGauge('memory.samples', sum(store.getMemorySize() for store in self.sampleData), 'B')
+        stats.setGauge('memory.spilled', sum(store.getSpilledSize() for store in self.sampleData), 'B')
+        stats.setGauge('memory.lod', sum(lod.getMemorySize() for lod in self.sampleLod), 'B')
+        stats.setGauge('memory.rows', len(self.timeIndex), 'rows')
+        stats.setGauge('memory.timeIndex', self.timeIndex.getMemorySize(), 'B')
+        stats.setGauge('queue.highWaterMark', self.sampleQueue.getHighWaterMark(), 'samples')
+        stats.setGauge('queue.dropped', self.sampleQueue.getDroppedCount(), 'samples')
+        
+        scheduler = self.getPollScheduler()
+        if scheduler != None:
+            stats.setGauge('daq.poll.interval', scheduler.getPollInterval(), 's')
+
+    #
+    # Spills the samples outside of the memory window to disk and drops the
+    # ones outside of the retention limits, oldest chunks first. The last 
+    # chunk of every store is always kept.
+    #
+    def limitSampleMemory(self):
+        lastTime = self.getLastSampleTime()
+        
+        if self.memoryWindow > 0:
+            for store in self.sampleData:
+                store.spillBefore(lastTime - self.memoryWindow)
+        
+        if self.retentionTime > 0:
+            for store in self.sampleData:
+                store.dropBefore(lastTime - self.retentionTime)
+        
+        if self.retentionSize > 0:
+            size = sum(store.getRetainedSize() for store in self.sampleData)
+            while size > self.retentionSize:
+                stores = [store for store in self.sampleData if store.canDropChunk()]
+                if len(stores) == 0:
+                    break
+                
+                oldest = min(stores, key=lambda store: store.firstTime())
+                size -= oldest.dropChunk()
+        
+        for store, lod in zip(self.sampleData, self.sampleLod):
+            if store.getFirstIndex() > 0:
+                lod.dropBefore(store.firstTime())
+    
+    #
+    # Removes the table rows before the first retained sample of the stores
+    # that dropped samples, so the rows are limited like the samples even
+    # if a slow variable keeps older ones. The last row is always kept.
+    #
+    def dropTableRows(self, tableDataModel):
+        firstTimes = [store.firstTime() for store in self.sampleData 
+                      if store.getFirstIndex() > 0]
+        if len(firstTimes) == 0:
+            return
+        
+        k = self.timeIndex.searchTime(max(firstTimes), 'left')
+        k = min(k, len(self.timeIndex) - 1)
+        if k <= 0:
+            return
+        
+        tableDataModel.beginDropFirstRows(k)
+        self.timeIndex.dropFirstRows(k)
+        tableDataModel.endDropFirstRows(k)
+
+
+    #
+    # Starts writing the samples to a capture file, beginning with the ones
+    # acquired so far. 'config' is the ApplicationConfiguration of the
+    # running acquisition.
+    #
+    def startCapture(self, fileName, config):
+        self.stopCapture()
+        
+        valueTypes = [store.valueType for store in self.sampleData]
+        self.captureWriter = captureFile.CaptureWriter(fileName, config, valueTypes)
+        
+        for varIdx, store in enumerate(self.sampleData):
+            for start, times, values in store.iterChunks():
+                self.captureWriter.write(varIdx, times, values)
+        
+        logging.info("Capture to '%s' started"%(fileName))
+    
+    def stopCapture(self):
+        if self.captureWriter != None:
+            self.captureWriter.close()
+            logging.info("Capture to '%s' finished, %d samples"%(self.captureWriter.fileName, 
+                                                                self.captureWriter.getSampleCount()))
+            self.captureWriter = None
+    
+    def isCapturing(self):
+        return self.captureWriter != None
+    
+    #
+    # Shows the samples of a captureFile.CaptureFile instead of acquired 
+    # ones. The configuration of the capture must be the active one.
+    #
+    def openCapture(self, capture):
+        import globals
+        
+        self.stopCapture()
+        
+        config = capture.config.variableConfigs
+        self.resetPlotData(config)
+        self.resetDownsampleMetadata(len(config))
+        
+        # The sample stores map the file, only the summaries are computed.
+        # Nothing is spilled or dropped.
+        self.closeSpills()
+        self.sampleData = capture.stores
+        self.sampleLod = []
+        for store in self.sampleData:
+            lod = lodPyramid.LodPyramid()
+            for start, times, values in store.iterChunks():
+                lod.extend(times, values)
+            self.sampleLod.append(lod)
+        
+        # Rows of all samples, merged block by block in time order into 
+        # memory mapped files. They are kept in memory if that fails.
+        cursors = [0] * len(self.sampleData)
+        rowTimeBlocks = (rowTimes for rowTimes, times, values 
+                         in exporters.iterMergedBlocks(self.sampleData, cursors))
+        directory = globals.getSampleStorageSettings()[3]
+        try:
+            self.timeIndex = timeIndex.MappedTimeIndex(self.sampleData, rowTimeBlocks, directory)
+        except (IOError, OSError) as ex:
+            logging.error("Can't create the time index in '%s', the rows are kept in memory"%(directory))
+            logging.exception(ex)
+            
+            self.timeIndex = timeIndex.TimeIndex(self.sampleData)
+            cursors = [0] * len(self.sampleData)
+            for rowTimes, times, values in exporters.iterMergedBlocks(self.sampleData, cursors):
+                self.timeIndex.merge(rowTimes)
+        
+        self.selectedNames = [''] * len(self.sampleData)
+        for varConfig in config:
+            if varConfig.daqConfigIndex >= 0:
+                self.selectedNames[varConfig.daqConfigIndex] = varConfig.name
+        
+        self.wasConfigured = True
+        
+        logging.info("Opened capture '%s' (%d samples)"%(capture.fileName, capture.getSampleCount()))
+    
+    #
+    # Time of the last sample of all variables, 0 if there is none
+    #
+    def getLastSampleTime(self):
+        t = 0.0
+        for store in self.sampleData:
+            if len(store) > 0:
+                t = max(t, float(store.lastTime()))
+        return t
+    
     def resetDownsampleMetadata(self, varCount):
         self.lastMinIndex = [None]*varCount
         self.lastMaxIndex = [None]*varCount
 
 
     #
-    # Writes the data in the time interval to the x and y arrays
+    # Returns the samples in the time interval, including the last sample 
+    # before and the first sample after it. Intervals inside one chunk are 
+    # returned as views of the sample store.
+    #
+    # The bounds of the previous call are used as search hints, so small 
+    # shifts of the interval only look at a few samples.
     #        
     def getRawPlotData(self, varIndex, minTime, maxTime, scaleFactor):
         
-        x = self.datax[varIndex] 
-        y = self.datay[varIndex]
+        store = self.sampleData[varIndex]
 
-        # Take the last displayed time interval and update it according to 
-        # the new interval
-        
         left = self.lastMinIndex[varIndex]
-        if (left == None):
-            left = 0
-
-        right = self.lastMaxIndex[varIndex]
-        if (right == None):
-            right = len(x)-1
-
-        # Expand left and right bounds                   
-        while (left > 0) and (x[left] > minTime):
-            left -= 1
-        while (right < len(x)) and (x[right] < maxTime):
-            right += 1
-
-        # Shrink left and right bounds
-        while (left+1 < len(x)) and (x[left+1] < minTime):
+        if (left != None):
             left += 1
-        while (right-1 >= 0) and (x[right-1] > maxTime):
-            right -= 1
+        left = max(store.searchTime(minTime, 'left', left) - 1, store.getFirstIndex())
 
-        x = x[left:right+1]
-        y = y[left:right+1]
+        right = store.searchTime(maxTime, 'left', self.lastMaxIndex[varIndex])
+
+        xp = store.getTimes(left, right+1)
+        yp = store.getValues(left, right+1)
         
         if (scaleFactor != 1):
-            y = [e * scaleFactor for e in y] 
+            yp = yp * scaleFactor
         
         self.lastMinIndex[varIndex] = left
         self.lastMaxIndex[varIndex] = right
         
-        return x, y
+        return xp, yp
 
 
     def getAdjustedTimeSlices(self, reqTimeStart, reqTimeEnd, reqSliceCount, debug = False):
@@ -637,372 +1255,144 @@ class DaqManager():
         
         return timeStart2n, maxSliceWidth2n, int(sliceCount2n)
 
+    #
+    # Returns the sample count, sum, minimum and maximum of the raw samples
+    # in each of the c time slots [t0 + i*s, t0 + (i+1)*s). Slots at least
+    # as wide as the LOD base buckets are taken from the pyramid, finer ones
+    # are computed per chunk with reduceat, so the samples are never copied.
+    #
+    def getSlotStatistics(self, varIndex, t0, s, c):
+        slots = self.sampleLod[varIndex].getSlots(t0, s, c)
+        if slots != None:
+            return slots
+        
+        store = self.sampleData[varIndex]
+        
+        edges = t0 + s * np.arange(c + 1, dtype=np.float64)
+        bounds = store.searchTimes(edges, 'left')
+        
+        counts = np.diff(bounds)
+        sums = np.zeros(c, dtype=np.float64)
+        mins = np.full(c, sys.float_info.max)
+        maxs = np.full(c, -sys.float_info.max)
+        
+        for start, _, values in store.iterChunks(bounds[0], bounds[-1]):
+            # Slot boundaries local to this chunk
+            local = np.clip(bounds - start, 0, len(values))
+            slots = np.nonzero(local[1:] > local[:-1])[0]
+            if len(slots) == 0:
+                continue
+            
+            starts = local[slots]
+            sums[slots] += np.add.reduceat(values, starts)
+            mins[slots] = np.minimum(mins[slots], np.minimum.reduceat(values, starts))
+            maxs[slots] = np.maximum(maxs[slots], np.maximum.reduceat(values, starts))
+            
+        return counts, sums, mins, maxs
+        
     #
     # Writes the data in the time interval to the x and y arrays
     #        
     def getDownsampledPlotData(self, varIndex, reqTimeStart, reqTimeEnd, scaleFactor, reqSampleCount):
-        debug = False
-        
-        if debug:
-            print
-            print        
-            print('downsample(', varIndex, reqTimeStart, reqTimeEnd, reqSampleCount, ')')
         
-        rawx = self.datax[varIndex] 
-        rawy = self.datay[varIndex]
-
-        '''
-        doDownsampling = None
-        
-        rawIdxStart = self.getLessOrEqualIndex(rawx, reqTimeStart)
-        rawIdxEnd = self.getLessOrEqualIndex(rawx, reqTimeEnd)
+        t0, s, c = self.getAdjustedTimeSlices(reqTimeStart, reqTimeEnd, reqSampleCount)
         
-        if debug:
-            print 'raw interval [', rawIdxStart, ',', rawIdxEnd, '] = (', rawx[rawIdxStart], ',', rawx[rawIdxEnd], ')'
+        counts, sums, mins, maxs = self.getSlotStatistics(varIndex, t0, s, c)
         
-        #self.dsStatIntervalRawSampleCount = rawIdxEnd - rawIdxStart
-
-        # Do we down-sample
-        if (rawIdxEnd - rawIdxStart <= 1):
-            # If not enough raw samples then skip down-sampling
-            doDownsampling = False
-            if debug:
-                print 'RAW not enough samples: ', (rawIdxEnd - rawIdxStart), '<= 1'
-        else:
-            requestedResolution = float(reqSampleCount) / (reqTimeEnd - reqTimeStart)
-            rawResolution = float(rawIdxEnd - rawIdxStart) / (rawx[rawIdxEnd] - rawx[rawIdxStart])
-            
-            # We down-sample if we have more samples per time unit then was 
-            # requested by time interval length and reqSampleCount
-            doDownsampling = (rawResolution > requestedResolution)
-            
-            if debug:
-                print 'RAW doDownsampling = (', rawResolution, '>', requestedResolution, ')' 
-                
-        # If there aren't enough samples to down-sample
-        if not doDownsampling:
-            if debug:
-                print 'returning raw data'
-            
+        # Not enough samples to down-sample
+        if (counts.sum() < 3):
             x, y = self.getRawPlotData(varIndex, reqTimeStart, reqTimeEnd, scaleFactor)
             
             return x, y, None, None
         
-        else:
-        '''
-        if True:
-            if debug:
-                print('requested(', reqTimeStart, reqTimeEnd, reqSampleCount, ')')
-                
-            t0, s, c = self.getAdjustedTimeSlices(reqTimeStart, reqTimeEnd, reqSampleCount)
-            
-            adjTimeStart = t0
-            adjTimeEnd = t0 + s*c
-            adjSampleCount = c
-            adjTimeSlice = s
-            
-            #rawIdxStart = self.getLessOrEqualIndex(rawx, adjTimeStart)
-            #rawIdxEnd = self.getLessOrEqualIndex(rawx, adjTimeEnd)
-            rawIdxStart = bisect.bisect_left(rawx, adjTimeStart)
-            if rawIdxStart <= 0: rawIdxStart = 0
-            rawIdxEnd = bisect.bisect_right(rawx, adjTimeEnd)
-            if rawIdxEnd >= len(rawx): rawIdxEnd = len(rawx)-1
-
-            if debug:
-                print('adjusted ', adjTimeStart, adjTimeEnd, adjSampleCount, 'ts = ', adjTimeSlice)
-                print('fount limits: [', rawx[rawIdxStart], ' - ', rawx[rawIdxEnd], ']')
-                #print 'raw list[', rawIdxStart, ',', rawIdxEnd, '] of ', len(rawx)
+        used = np.nonzero(counts > 0)[0]
+        
+        # Return only used slots
+        i1 = used[0]
+        i2 = used[-1] + 1
+        if i1 + 1 >= i2:
+            return [], [], [], []
+        
+        res_time = t0 + np.arange(i1, i2) * s
+        res_avgy = np.empty(i2 - i1)
+        res_miny = np.empty(i2 - i1)
+        res_maxy = np.empty(i2 - i1)
+        
+        used = used - i1
+        res_avgy[used] = sums[used + i1] / counts[used + i1] * scaleFactor
+        res_miny[used] = mins[used + i1] * scaleFactor
+        res_maxy[used] = maxs[used + i1] * scaleFactor
+        
+        #
+        # Fill in the blanks by linear interpolation between the closest 
+        # used slots on the left and on the right
+        #
+        empty = np.nonzero(counts[i1:i2] == 0)[0]
+        if len(empty) > 0:
+            pos = np.searchsorted(used, empty)
+            li = used[pos - 1]
+            ri = used[pos]
             
+            v = res_avgy[li] + ((empty - li) / (ri - li).astype(np.float64) * (res_avgy[ri] - res_avgy[li]))
+            res_avgy[empty] = v
+            res_miny[empty] = v
+            res_maxy[empty] = v
+        
+        return res_time, res_avgy, res_miny, res_maxy
     
-            # Return arrays
-            res_time = [None] * adjSampleCount
-            res_miny = [sys.float_info.max] * adjSampleCount
-            res_maxy = [-sys.float_info.max] * adjSampleCount
-            res_avgy = [0] * adjSampleCount
-            res_dps = [0] * adjSampleCount
-            
-            #print 'time = ', adjTimeStart
-            for i in range(0, adjSampleCount):
-                res_time[i] = adjTimeStart + i*adjTimeSlice
-            
-            # First data index to be taken into down-sampling
-            # Before or at adjTimeStart
-            while (rawx[rawIdxStart] < adjTimeStart):
-                rawIdxStart += 1
-            while (rawx[rawIdxEnd] >= adjTimeEnd):
-                rawIdxEnd -= 1
-            
-            # First and last added slot index
-            firstUsedSlotIndex = None 
-            lastUsedSlotIndex = None
-            
-            # Start time of the first slot
-            slotStartTime = adjTimeStart
-            slotEndTime = adjTimeStart + adjTimeSlice
-
-            #
-            # Convert raw data to slots
-            #
-            slotIdx = 0
-            rawIdx = rawIdxStart
-
-            #print '\nnew time slot[', slotIdx, '] (', slotStartTime, ', ', slotEndTime, '): ',
-                
-            # Use all data samples and put them into slots 
-            while (rawIdx <= rawIdxEnd):
-                
-                t = rawx[rawIdx]
-                
-                # Move to the appropriate slot
-                while (t >= slotEndTime):
-
-                    slotStartTime += adjTimeSlice
-                    slotEndTime += adjTimeSlice
-                    
-                    slotIdx += 1
-                    
-                    #res_time[slotIdx] = slotStartTime
-                    
-                    # If we are past the last slot then exit loop
-                    if (slotIdx >= adjSampleCount):
-                        break
-                    
-                    #print '\nnew time slot[', slotIdx, '] (', slotStartTime, ', ', slotEndTime, '): ',
-                    
-                #print t, ', ',
-                    
-                res_miny[slotIdx] = min(res_miny[slotIdx], rawy[rawIdx])
-                res_maxy[slotIdx] = max(res_maxy[slotIdx], rawy[rawIdx])
-                res_avgy[slotIdx] += rawy[rawIdx]
-                res_dps[slotIdx] += 1
-            
-                rawIdx +=1
-                
-                lastUsedSlotIndex = slotIdx
-
-            #print '\ndone with time slots'
-
-            #
-            # Take care of start and end of chart to prevent anomalies
-            #
-            '''
-            # First slot
-            if (res_dps[0] == 0):
-                # If we have data to the left of the chart then use the last sample
-                if (rawIdxStart > 0):
-                    i = rawIdxStart - 1
-                    
-                    res_time[0] = rawx[i]
-                    res_miny[0] = rawy[i]
-                    res_maxy[0] = rawy[i]
-                    res_avgy[0] = rawy[i]
-                    res_dps[0] = 1
-
-                    firstUsedSlotIndex = 0
-            
-            # Last slot
-            if (res_dps[-1] == 0):
-                # If we have data to the right of the chart then use the first sample
-                if (rawIdxEnd < len(rawx) - 1):
-                    i = rawIdxEnd + 1
-                    
-                    res_time[-1] = rawx[i]
-                    res_miny[-1] = rawy[i]
-                    res_maxy[-1] = rawy[i]
-                    res_avgy[-1] = rawy[i]
-                    res_dps[-1] = 1
-            
-                    lastUsedSlotIndex = len(res_dps) - 1
-            '''
-                
-            #
-            # Finalize data down-sampling per slot and scale as required
-            #
-            avgDps = 0
-            dps0count = 0
-            
-            for i in range(adjSampleCount):
-                if (res_dps[i] > 0):
-                    res_avgy[i] /= res_dps[i]
-
-                    if firstUsedSlotIndex == None:                     
-                        firstUsedSlotIndex = i
-                    
-                    res_miny[i] *= scaleFactor
-                    res_maxy[i] *= scaleFactor
-                    res_avgy[i] *= scaleFactor
-                    
-                    avgDps += res_dps[i]
-                else:
-                    dps0count += 1
-                
-            if (avgDps < 3):
-                x, y = self.getRawPlotData(varIndex, reqTimeStart, reqTimeEnd, scaleFactor)
-                
-                return x, y, None, None
-                
-            #
-            # Fill in the blanks by interpolation
-            #
-            lastFoundIdx = None
-                
-            #for i in range(firstUsedSlotIndex, lastUsedSlotIndex+1):
-            i = 0
-            while i < adjSampleCount:
-                if (res_dps[i] == 0):
-                    
-                    # Last left non-null element
-                    li = lastFoundIdx
-                    
-                    # Get first right non-null element
-                    ri = None
-                    
-                    while (i < adjSampleCount  and 
-                           res_dps[i] == 0):
-                        i += 1
-                        
-                    if (i < adjSampleCount):
-                        ri = i
-                    
-                    self.interpolate(res_avgy, res_miny, res_maxy, li, ri)
-                        
-                else:
-                    lastFoundIdx = i
-                    i += 1
-                        
-
-
-            #
-            # Return only used slots
-            #
-            if firstUsedSlotIndex < lastUsedSlotIndex:
-                i1 = firstUsedSlotIndex
-                i2 = lastUsedSlotIndex + 1
-
-                return res_time[i1:i2], res_avgy[i1:i2], res_miny[i1:i2], res_maxy[i1:i2]
-            else:
-                return [], [], [], []
-    '''     
-    def interpolate(self, a, i1, i2):
-        for i in range(i1+1, i2):
-            a[i] = a[i1] + ((i-i1) / float(i2-i1) * (a[i2]-a[i1]))
-    '''
-    def interpolate(self, a, min, max, i1, i2):
-        #print 'interpolating ', i1, i2
-        if i1 == None:
-            for i in range(i2):
-                v = a[i2]
-                a[i] = v
-                min[i] = v
-                max[i] = v
-        elif i2 == None:
-            for i in range(i1+1, len(a)):
-                v = a[i1]
-                a[i] = v
-                min[i] = v
-                max[i] = v
-        else:
-            for i in range(i1+1, i2):
-                v = a[i1] + ((i-i1) / float(i2-i1) * (a[i2]-a[i1]))
-                a[i] = v 
-                min[i] = v
-                max[i] = v
+    #
+    # Returns the x and y data of a chart line 'pixelCount' pixels wide and
+    # True if it is an envelope. If the time interval holds more samples 
+    # than pixels, the line goes from the minimum to the maximum of every 
+    # down-sampled slot at its start time, otherwise it has the raw samples.
+    #
+    def getChartPlotData(self, varIndex, minTime, maxTime, scaleFactor, pixelCount):
+        store = self.sampleData[varIndex]
+        
+        count = store.searchTime(maxTime, 'left') - store.searchTime(minTime, 'left')
+        if count > pixelCount > 0  and  maxTime > minTime:
+            xp, yp, minyp, maxyp = self.getDownsampledPlotData(varIndex, minTime, maxTime, 
+                                                               scaleFactor, pixelCount)
+            if minyp is not None:
+                x = np.repeat(xp, 2)
+                y = np.empty(len(x))
+                y[0::2] = minyp
+                y[1::2] = maxyp
+                return x, y, True
+        
+        xp, yp = self.getRawPlotData(varIndex, minTime, maxTime, scaleFactor)
+        return xp, yp, False
            
     #
-    # Gets the estimated value of a selected variable for a particular moment 
-    # in time. The value is taken at that time or the last sample before that.
+    # Gets the estimated value of a selected variable for a particular row 
+    # of the data table. The value is taken at the row time or the last 
+    # sample before that, None if there is none.
     # Used for rich (without empty cells) table population.
     #
     def getEstimatedValue(self, row, varIdx):
+        index = self.timeIndex.getSampleIndex(row, varIdx)
+        if index < 0:
+            return None
         
-        time = self.allTimePoints[row]
-        
-        #
-        # Optimization
-        #
-        
-        lastIdx = self.lastIndexFound[varIdx]
-        lastRow = self.lastRows[varIdx]
-        
-        x = self.datax[varIdx]
-        y = self.datay[varIdx]
-        
-        # If we just went to next row and if any more data left for this variable
-        if (lastRow + 1 == row):
-            
-            # If the last used timestep was the last in the data then use it again
-            if (len(x) <= lastIdx + 1):
-                self.lastRows[varIdx] = row
-                #return '***' + str(y[lastIdx])
-                return y[lastIdx]
-            
-            # If next data point has greater value than the current row then 
-            # use the data value of previous row
-            if (x[lastIdx+1] > time):
-                
-                self.lastRows[varIdx] = row
-                #return '*' + str(y[lastIdx])
-                return y[lastIdx]
-            
-            elif (x[lastIdx+1] == time):
-                
-                self.lastIndexFound[varIdx] = lastIdx+1
-                self.lastRows[varIdx] = row
-
-                #return '**' + str(y[lastIdx+1])
-                return y[lastIdx+1]
-
-        # Brute force find by bisection
-        index = self.getLessOrEqualIndex(x, time)
-
-        self.lastIndexFound[varIdx] = index
-        self.lastRows[varIdx] = row
-        
-        return y[index]
+        return self.sampleData[varIdx].getValue(index)
         
     #
     # Returns true if we have a data sample for the 
     # specified variable in the specified row
     #
     def isRealValue(self, row, varIdx):
-        
-        exactTime = self.allTimePoints[row]
-        x = self.datax[varIdx]
-
-        index = self.getLessOrEqualIndex(x, exactTime)
-        
-        return None != index and x[index] == exactTime
+        return self.timeIndex.isRealValue(row, varIdx)
         
         
     #
     # Use bisection to find index exact value or greatest value 
     # that is smaller than that
     #
-    def getLessOrEqualIndex(self, array, val):
-        left = 0
-        right = len(array)-1
-        
-        if (len(array) <= 0):
+    def getLessOrEqualIndex(self, store, val):
+        if (len(store) <= store.getFirstIndex()):
             return None
-        elif (val > array[-1]):
-            return len(array)-1
-        elif (val < array[0]):
-            return 0
         
-        while (left + 1 < right):
-            center = (left + right) // 2
-    
-            if (array[center] == val):
-                return center
-            elif (array[center] > val):
-                right = center
-            else:
-                left = center
-    
-        if (array[right] <= val):
-            return right
-        else:
-            return left
+        return max(store.searchTime(val, 'right') - 1, store.getFirstIndex())
         
         
         
@@ -1010,7 +1400,7 @@ class DaqManager():
     # Returns the unprocessed sample data
     #
     def getRawData(self):
-        return [self.datax, self.datay]
+        return self.sampleData
     
     
     
@@ -1030,24 +1420,164 @@ class DaqManager():
                 self.sampleReaderThread.join()
                 
                 # Remove unused data from thread queue
-                while (not self.sampleQueue.empty()):
-                    row = self.sampleQueue.get()
+                self.sampleQueue.clear()
+        
+        self.stopCapture()
+        
+        if self.replayCtrl != None:
+            self.setReplay(None)
 
 
    
+#
+# Decides how long the DAQ reader waits between two reads. The interval is 
+# shortened as the DAQ buffer fills up and backs off while no samples 
+# arrive. Time is passed in explicitly so it can be driven by a simulated
+# controller.
+#
+class AdaptivePollScheduler():
+    
+    # Interval limits in seconds
+    minInterval = 0.002
+    maxInterval = 0.2
+    
+    # Assumed number of samples the DAQ controller buffers. It is lowered to
+    # the observed fill level when an overflow is reported.
+    bufferSize = 4096
+    
+    # Fraction of the buffer we allow to fill between two reads
+    targetFill = 0.25
+    
+    # Smoothing factor of the sample rate estimate
+    rateSmoothing = 0.3
+    
+    pollInterval = None
+    sampleRate = 0.0
+    overflowCount = 0
+    pollCount = 0
+    lastPollTime = None
+    
+    def __init__(self, bufferSize=None, minInterval=None, maxInterval=None):
+        if bufferSize != None:
+            self.bufferSize = bufferSize
+        if minInterval != None:
+            self.minInterval = minInterval
+        if maxInterval != None:
+            self.maxInterval = maxInterval
+        
+        self.pollInterval = 1.0 / 20
+        self.sampleRate = 0.0
+        self.overflowCount = 0
+        self.pollCount = 0
+        self.lastPollTime = None
+    
+    #
+    # Registers the result of a poll and returns the time to wait until
+    # the next one
+    #
+    def update(self, now, numAvailable, overflow):
+        self.pollCount += 1
+        
+        if self.lastPollTime != None and now > self.lastPollTime:
+            rate = numAvailable / (now - self.lastPollTime)
+            self.sampleRate += self.rateSmoothing * (rate - self.sampleRate)
+        self.lastPollTime = now
+        
+        if overflow:
+            self.overflowCount += 1
+            if numAvailable > 0:
+                self.bufferSize = min(self.bufferSize, numAvailable)
+            interval = self.minInterval
+        elif numAvailable == 0:
+            interval = self.pollInterval * 2
+        else:
+            interval = self.targetFill * self.bufferSize / max(self.sampleRate, 1e-9)
+            
+            # React at once if the buffer filled more than we wanted
+            if numAvailable > self.targetFill * self.bufferSize:
+                interval = min(interval, self.pollInterval / 2)
+        
+        self.pollInterval = min(max(interval, self.minInterval), self.maxInterval)
+        return self.pollInterval
+    
+    def getPollInterval(self):
+        return self.pollInterval
+    
+    def getSampleRate(self):
+        return self.sampleRate
+    
+    def getOverflowCount(self):
+        return self.overflowCount
+
+
+#
+# Looks up the dimensions of array variables in the background, so the 
+# variable list is usable right after it was listed. It has its own data
+# controller. Results are taken by the GUI thread with popResults().
+#
+class SymbolLoaderThread(threading.Thread):
+    
+    dataCtrl = None
+    
+    # (full name, variable name, type name) of the arrays
+    arrays = None
+    
+    # (full name, DaqVariable.extractIndices() result or None)
+    results = None
+    stopEvent = None
+    
+    def __init__(self, dataCtrl, arrays):
+        threading.Thread.__init__(self, name='SymbolLoaderThread')
+        self.daemon = True
+        
+        self.dataCtrl = dataCtrl
+        self.arrays = arrays
+        self.results = collections.deque()
+        self.stopEvent = threading.Event()
+    
+    def run(self):
+        start = time.time()
+        for fullName, name, type in self.arrays:
+            if self.stopEvent.is_set():
+                break
+            
+            try:
+                indices = variable.DaqVariable.extractIndices(type, name, self.dataCtrl)
+            except Exception as ex:
+                logging.debug("Failed to resolve array '%s': %s"%(name, str(ex)))
+                indices = None
+            self.results.append((fullName, indices))
+        
+        logging.info("Looked up the dimensions of %d arrays in %.1f s"%(len(self.results), time.time() - start))
+    
+    def stopRunning(self):
+        self.stopEvent.set()
+    
+    def hasResults(self):
+        return len(self.results) > 0
+    
+    def popResults(self):
+        results = []
+        while len(self.results) > 0:
+            results.append(self.results.popleft())
+        return results
+
+
 class DaqWorkerThread(threading.Thread):
     
     running = None
     daqManager = None
-    
-    # 20 fps
-    sleepPeriod = 1.0 / 20 
+    scheduler = None
+    stopEvent = None
     
     def __init__(self, daqMgr):
-        threading.Thread.__init__(self)
+        # Named for the thread statistics of sampleProfiler
+        threading.Thread.__init__(self, name='DaqWorkerThread')
         
         self.running = True
         self.daqManager = daqMgr
+        self.scheduler = AdaptivePollScheduler()
+        self.stopEvent = threading.Event()
     
     #
     # This method just reads the data from the DAQ queue to prevent the sampling 
@@ -1057,12 +1587,13 @@ class DaqWorkerThread(threading.Thread):
     def run(self):
         logging.info("Starting DAQ reading")
         while(self.running):
-            self.daqManager.queueSamplingData()
-            time.sleep (self.sleepPeriod);
-        logging.info("DAQ reading stopped")
+            numAvailable, overflow = self.daqManager.queueSamplingData()
+            interval = self.scheduler.update(time.time(), numAvailable, overflow)
+            self.stopEvent.wait(interval)
+        logging.info("DAQ reading stopped (%d overflows)"%(self.scheduler.getOverflowCount()))
 
             
     def stopRunning(self):
         self.running = False
+        self.stopEvent.set()
 
-        
@@ -1,84 +1,270 @@
 
 from __future__ import print_function
 
+import os
+import numpy as np
 import openpyxl
 from openpyxl.styles.colors import Color
 
 lastDataExportFile = None
 
-def exportToExcel(app, fileName, dataModel, varNames):
+# Maximum number of samples per variable merged at once when exporting.
+# Small blocks keep the GUI thread responsive during background exports.
+EXPORT_BLOCK_SIZE = 1 << 12
+
+# Rows of an Excel sheet, including the header row
+EXCEL_MAX_ROWS = 1048576
+
+
+#
+# The exporters call progress(done, total) while writing, if given. When it
+# returns False the export is cancelled, the partial file is removed and 
+# the exporter returns False. The partial file is also removed when an 
+# export fails with an exception (disk full, encoding error).
+#
+def removePartialFile(fileName):
+    if os.path.exists(fileName):
+        os.remove(fileName)
+
+
+#
+# Merges the samples of all stores in time order. Yields blocks of 
+# (rowTimes, times, values) where rowTimes are the distinct sample times of
+# the block and times/values hold the first sample of every time per store.
+#
+# A block ends with the EXPORT_BLOCK_SIZE-th next sample of the store that
+# reaches it first, including all samples at that time, so the memory use 
+# does not depend on the amount of data. cursors[i] is the index of the 
+# next sample of store i to merge, see getFirstIndices().
+#
+def iterMergedBlocks(sampleData, cursors):
+    while True:
+        endTime = None
+        for di, store in enumerate(sampleData):
+            i = min(cursors[di] + EXPORT_BLOCK_SIZE, len(store)) - 1
+            if i >= cursors[di]:
+                t = store.getTime(i)
+                if endTime == None or t < endTime:
+                    endTime = t
+        
+        if endTime == None:
+            return
+        
+        blockTimes = []
+        blockValues = []
+        for di, store in enumerate(sampleData):
+            end = store.searchTime(endTime, 'right', cursors[di])
+            times = store.getTimes(cursors[di], end)
+            values = store.getValues(cursors[di], end)
+            cursors[di] = end
+            
+            # Only the first sample of a time is used
+            first = np.ones(len(times), dtype=bool)
+            first[1:] = times[1:] != times[:-1]
+            
+            blockTimes.append(times[first])
+            blockValues.append(values[first])
+        
+        yield np.unique(np.concatenate(blockTimes)), blockTimes, blockValues
+
+
+#
+# Returns the index of the first retained sample of every store, the start
+# of a merge
+#
+def getFirstIndices(sampleData):
+    return [store.getFirstIndex() for store in sampleData]
+
+
+#
+# Returns the index of the sample of a store in every row of a merged 
+# block. Rows without a sample get -1 or, with bFillInMissingValues, the 
+# index of the last sample before them (-1 if it is in an earlier block).
+#
+def getRowSampleIndices(rowTimes, times, bFillInMissingValues):
+    sampleIdx = np.full(len(rowTimes), -1, dtype=np.int64)
+    sampleIdx[np.searchsorted(rowTimes, times)] = np.arange(len(times))
+    
+    if bFillInMissingValues:
+        sampleIdx = np.maximum.accumulate(sampleIdx)
+    
+    return sampleIdx
+
+
+#
+# Writes the samples of all variables to an Excel sheet as numeric rows of 
+# 'time, value1, value2, ...' for every distinct sample time, like 
+# exportToCharSeparatedValues.
+#
+# Rows that do not fit into a sheet are continued on further sheets. With 
+# bDecimate every n-th row is written instead, so that all rows fit into 
+# one sheet.
+#
+def exportToExcel(app, fileName, sampleData, varNames, bFillInMissingValues, progress=None, bDecimate=False):
     global lastDataExportFile
 
     book = openpyxl.Workbook(write_only = True)
-    sheet = book.create_sheet()
-    sheet.title = 'Variables'
+    
+    bCompleted = False
+    try:
+        bCompleted = writeExcel(book, fileName, sampleData, varNames, bFillInMissingValues, 
+                                progress, bDecimate)
+    finally:
+        if not bCompleted:
+            # Closes the temporary files of the unsaved sheets
+            for sheet in book.worksheets:
+                if not sheet.closed:
+                    sheet.close()
+            removePartialFile(fileName)
+    
+    if bCompleted:
+        lastDataExportFile = fileName
+    return bCompleted
 
-    rowCount = dataModel.getRowCount()
-    columnCount = dataModel.getColumnCount()
+
+#
+# Writes the write-only workbook of exportToExcel to the file, returns False
+# when cancelled
+#
+def writeExcel(book, fileName, sampleData, varNames, bFillInMissingValues, progress, bDecimate):
+    header = ['Time [s]'] + list(varNames)
+    sheetRows = EXCEL_MAX_ROWS - 1
+    
+    # Row step for decimation
+    step = 1
+    if bDecimate:
+        rowCount = 0
+        for rowTimes, times, values in iterMergedBlocks(sampleData, getFirstIndices(sampleData)):
+            rowCount += len(rowTimes)
+        step = max((rowCount + sheetRows - 1) // sheetRows, 1)
     
-    varNames = []
-    for c in range(columnCount):
-        varNames.append(dataModel.getHorizontalHeaderName(c))
-    sheet.append(varNames)
+    sheet = None
+    sheetRowCount = sheetRows
+    rowIdx = 0
     
-    for r in range(rowCount):
-        values = []
-        for c in range(columnCount):
-            value = dataModel.getData(r, c)
-            values.append(value)
-        sheet.append(values)
+    # Merge cursor and last written value of every variable
+    cursors = getFirstIndices(sampleData)
+    firstCount = sum(cursors)
+    sampleCount = sum(len(store) for store in sampleData) - firstCount
+    lastValues = [None] * len(sampleData)
+    for di, store in enumerate(sampleData):
+        if len(store) > cursors[di]:
+            lastValues[di] = store.getValue(cursors[di]).item()
     
-    book.save(fileName)
+    for rowTimes, blockTimes, blockValues in iterMergedBlocks(sampleData, cursors):
+        columns = [rowTimes.tolist()]
+        
+        for di in range(len(sampleData)):
+            # Values followed by the one used for rows without a sample
+            if bFillInMissingValues:
+                missing = lastValues[di]
+            else:
+                missing = None
+            values = blockValues[di].tolist() + [missing]
+            
+            sampleIdx = getRowSampleIndices(rowTimes, blockTimes[di], bFillInMissingValues)
+            if bFillInMissingValues and len(values) > 1:
+                lastValues[di] = values[-2]
+            
+            columns.append([values[i] for i in sampleIdx.tolist()])
+        
+        for row in zip(*columns):
+            if rowIdx % step == 0:
+                if sheetRowCount >= sheetRows:
+                    sheet = book.create_sheet()
+                    if len(book.worksheets) == 1:
+                        sheet.title = 'Variables'
+                    else:
+                        sheet.title = 'Variables %d' % len(book.worksheets)
+                    sheet.append(header)
+                    sheetRowCount = 0
+                
+                sheet.append(row)
+                sheetRowCount += 1
+            rowIdx += 1
+        
+        if progress != None:
+            if not progress(sum(cursors) - firstCount, sampleCount):
+                return False
     
-    lastDataExportFile = fileName
+    # Saved through an own handle, so the file is closed if saving fails
+    with open(fileName, 'wb') as f:
+        book.save(f)
+    return True
 
 
-def exportToCharSeparatedValues(fileName, datax, datay, separator, varNames, bFillInMissingValues):
+#
+# Writes the samples of all variables as rows of 'time, value1, value2, ...'
+# for every distinct sample time. Variables without a sample at a time get 
+# an empty cell or, with bFillInMissingValues, their last value (the first 
+# sample value before they have one).
+#
+# Every merged block is written with a single write.
+#
+def exportToCharSeparatedValues(fileName, sampleData, separator, varNames, bFillInMissingValues, progress=None):
     global lastDataExportFile
 
     # Open file
     f = open(fileName, 'w')
 
+    bCompleted = False
+    try:
+        bCompleted = writeCharSeparatedValues(f, sampleData, separator, varNames, 
+                                              bFillInMissingValues, progress)
+    finally:
+        f.close()
+        if not bCompleted:
+            removePartialFile(fileName)
+    
+    if bCompleted:
+        lastDataExportFile = fileName
+    return bCompleted
+
+
+#
+# Writes the rows of exportToCharSeparatedValues to the open file f, 
+# returns False when cancelled
+#
+def writeCharSeparatedValues(f, sampleData, separator, varNames, bFillInMissingValues, progress):
     # Add header
     f.write('Time [s]')
     for n in varNames:
         f.write(separator + n)
-    #f.write('\n')
     
-    # Organize data for writing
+    # Merge cursor and last written value of every variable
+    cursors = getFirstIndices(sampleData)
+    firstCount = sum(cursors)
+    sampleCount = sum(len(store) for store in sampleData) - firstCount
     lastValues = []
-    allTimes = []
-    for i in range(0, len(datax)):
-        allTimes.extend(datax[i])
-        lastValues.append(datay[i][0])
+    for di, store in enumerate(sampleData):
+        if len(store) > cursors[di]:
+            lastValues.append(str(store.getValue(cursors[di]).item()))
+        else:
+            lastValues.append('')
     
-    allTimes = sorted(list(set(allTimes)))
-            
-    # For every timestamp X write a row
-    for t in allTimes:
-        f.write('\n')
-
-        f.write(str(t))
-        val = None
+    for rowTimes, blockTimes, blockValues in iterMergedBlocks(sampleData, cursors):
+        columns = [list(map(str, rowTimes.tolist()))]
         
-        # Find the time in every variables Y data list
-        for di in range(0, len(datax)):
-            strVal = ""
-            if t in datax[di]:
-                idx = datax[di].index(t)
-                
-                val = datay[di][idx]
-                lastValues[di] = val
-                strVal = str(val)
+        for di in range(len(sampleData)):
+            # Value strings of the variable followed by the one used for
+            # rows without a sample (index -1)
+            if bFillInMissingValues:
+                missing = lastValues[di]
             else:
-                if bFillInMissingValues:
-                    val = lastValues[di]
-                    strVal = str(val)
-
-            f.write(separator + strVal)
-    f.close()
-    
-    lastDataExportFile = fileName
-
-    
-    
\ No newline at end of file
+                missing = ''
+            strValues = list(map(str, blockValues[di].tolist())) + [missing]
+            strValues = np.array(strValues, dtype=object)
+            
+            sampleIdx = getRowSampleIndices(rowTimes, blockTimes[di], bFillInMissingValues)
+            if bFillInMissingValues and len(strValues) > 1:
+                lastValues[di] = strValues[-2]
+            
+            columns.append(strValues[sampleIdx].tolist())
+        
+        f.write('\n' + '\n'.join(map(separator.join, zip(*columns))))
+        
+        if progress != None:
+            if not progress(sum(cursors) - firstCount, sampleCount):
+                return False
+        
+    return True
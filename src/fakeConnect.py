@@ -0,0 +1,293 @@
+
+from __future__ import print_function
+
+#
+# Pure Python stand-in for the parts of the isystem.connect module daqIDEA
+# uses. The controllers work on the fakeDaq.FakeTarget of the connection
+# manager instead of winIDEA: the data controller lists its variables, the
+# address controller knows their types and the DAQ controller samples its
+# signals. See iconnect for when it is used.
+#
+
+import re
+
+import fakeDaq, replay
+
+
+class Vector(list):
+
+    def size(self):
+        return len(self)
+
+StrVector = Vector
+VariableVector = Vector
+DAQConfigVector = Vector
+DAQSampleVector = Vector
+HILChannelVector = Vector
+
+
+class IConnectDebug():
+
+    fMonitor = 1 << 0
+    fRealTime = 1 << 1
+    gafExpression = 1 << 2
+
+
+#
+# Type of a symbol: kind (tSigned, tUnsigned, tFloat or tCompound) and size
+#
+class SType():
+
+    tSigned = 1
+    tUnsigned = 2
+    tFloat = 3
+    tCompound = 4
+
+    m_byType = 0
+    m_byBitSize = 0
+
+    def __init__(self, byType=0, byBitSize=0):
+        self.m_byType = byType
+        self.m_byBitSize = byBitSize
+
+    #
+    # Returns the type of a C type name
+    #
+    @classmethod
+    def fromTypeName(cls, typeName):
+        words = typeName.split()
+        if '[' in typeName  or  'struct' in words  or  'union' in words:
+            return cls(cls.tCompound, 0)
+        if 'float' in words:
+            return cls(cls.tFloat, 32)
+        if 'double' in words:
+            return cls(cls.tFloat, 64)
+
+        bitSize = 32
+        if 'char' in words:
+            bitSize = 8
+        elif 'short' in words:
+            bitSize = 16
+        elif words.count('long') == 2:
+            bitSize = 64
+        elif not ('int' in words or 'long' in words):
+            return cls(cls.tCompound, 0)
+
+        if 'unsigned' in words:
+            return cls(cls.tUnsigned, bitSize)
+        return cls(cls.tSigned, bitSize)
+
+
+#
+# Connection to the FakeTarget 'target', a default one with one sine
+# signal if not given
+#
+class ConnectionMgr():
+
+    target = None
+
+    def __init__(self, target=None):
+        self.target = target
+        if target == None:
+            self.target = fakeDaq.FakeTarget(fakeDaq.createSignals(1, 1000.0))
+
+    def connectMRU(self, workspace):
+        pass
+
+    def isAttached(self):
+        return True
+
+
+class CDAQConfigItem():
+
+    name = None
+    address = None
+    samplingInterval = None
+
+    #
+    # CDAQConfigItem(name, interval) or CDAQConfigItem(size, memArea,
+    # address, interval)
+    #
+    def __init__(self, *args):
+        if len(args) == 2:
+            self.name, self.samplingInterval = args
+        else:
+            self.address = args[2]
+            self.samplingInterval = args[3]
+            self.name = '0x%x' % self.address
+
+    def getName(self):
+        return self.name
+
+
+class CDAQController(fakeDaq.FakeDaqController):
+
+    daqSampleMax = 0
+    daqSample1ms = 1
+    daqSample10ms = 2
+    daqSample100ms = 3
+    daqSample1s = 4
+
+    def __init__(self, cmgr):
+        target = cmgr.target
+        fakeDaq.FakeDaqController.__init__(self, [], target.speed, target.bufferSize, target=target)
+
+
+class FakeVariable():
+
+    name = None
+    type = None
+
+    def __init__(self, name, type):
+        self.name = name
+        self.type = type
+
+    def getName(self):
+        return self.name
+
+    def getType(self):
+        return self.type
+
+
+#
+# Result of CDataController2.getExpressionType(): the first array dimension
+# left in the expression, 0 if none
+#
+class FakeExpression():
+
+    name = None
+    dimensions = None
+
+    def __init__(self, name, dimensions):
+        self.name = name
+        self.dimensions = dimensions
+
+    def Name(self):
+        return self.name
+
+    def ArrayDimension(self):
+        if len(self.dimensions) == 0:
+            return 0
+        return self.dimensions[0]
+
+    def ArrayFirstElement(self):
+        return 0
+
+    def Expression(self):
+        return self
+
+
+class CDataController2():
+
+    target = None
+
+    def __init__(self, cmgr):
+        self.target = cmgr.target
+
+    def getPartitions(self, paths, fileNames):
+        self.target.wait('getPartitions')
+        for path, fileName, variables in self.target.downloadFiles:
+            paths.append(path)
+            fileNames.append(fileName)
+
+    def getVariables(self, partitionIdx, variables):
+        self.target.wait('getVariables')
+        for name, typeName in self.target.getVariables(partitionIdx):
+            variables.append(FakeVariable(name, typeName))
+
+    def getExpressionType(self, context, expression):
+        self.target.wait('getExpressionType')
+
+        name = expression.split('[')[0]
+        typeName = self.target.getTypeName(name)
+        if typeName == None:
+            raise RuntimeError("Symbol '%s' not found" % expression)
+
+        dimensions = [int(d) for d in re.findall(r'\[(\d+)\]', typeName)]
+        used = len(re.findall(r'\[', expression))
+        return FakeExpression(expression, dimensions[used:])
+
+    def release(self, expressionType):
+        pass
+
+    #
+    # Value of a variable at DAQ time 0
+    #
+    def evaluate(self, flags, expression):
+        self.target.wait('evaluate')
+
+        signal = self.target.getSignal(expression)
+        if signal == None:
+            raise RuntimeError("Can't evaluate '%s'" % expression)
+
+        times, values = signal.getSamples(0, 1)
+        return replay.ReplaySample(0, 0, values.tolist()[0], signal.isFloat)
+
+    def readValue(self, flags, memArea, address, varType):
+        self.target.wait('readValue')
+        return replay.ReplaySample(0, 0, 0, False)
+
+
+class FakeSymbolInfo():
+
+    type = None
+
+    def __init__(self, type):
+        self.type = type
+
+    def getMType(self):
+        return self.type
+
+
+class CAddressController():
+
+    target = None
+
+    def __init__(self, cmgr):
+        self.target = cmgr.target
+
+    def getSymbolInfo(self, flags, expression):
+        self.target.wait('getSymbolInfo')
+
+        typeName = self.target.getTypeName(expression)
+        if typeName == None:
+            raise RuntimeError("Symbol '%s' not found" % expression)
+        return FakeSymbolInfo(SType.fromTypeName(typeName))
+
+    def getExpressionAddress(self, expression):
+        self.target.wait('getExpressionAddress')
+
+        if self.target.getTypeName(expression) == None:
+            raise RuntimeError("Symbol '%s' not found" % expression)
+        return 0
+
+
+class CIDEController():
+
+    target = None
+
+    def __init__(self, cmgr):
+        self.target = cmgr.target
+
+    def getOptionInt(self, option):
+        if option == '/IDE/Debug.DownloadFiles.DefaultFile':
+            return self.target.defaultFile
+        return 0
+
+    def getOptionStr(self, option):
+        return ''
+
+
+class CHILController():
+
+    def __init__(self, cmgr):
+        pass
+
+    def getChannels(self, channels):
+        pass
+
+
+class CConfigurationController():
+
+    def __init__(self, cmgr):
+        pass
@@ -0,0 +1,398 @@
+
+from __future__ import print_function
+
+import time, threading, collections
+import numpy as np
+
+import replay, sampleStore
+
+# Signal shapes of FakeSignal
+FAKE_SHAPES = ['sine', 'square', 'ramp', 'noise', 'counter']
+
+
+#
+# Synthetic DAQ variable: 'rate' samples per second of the given shape
+# with the given amplitude and period [s]. Integer signals are rounded.
+# 'typeName' is the C type of the variable, 'double' or 'int' if not given.
+#
+class FakeSignal():
+
+    name = None
+    shape = 'sine'
+    rate = 1000.0
+    amplitude = 100.0
+    period = 1.0
+    isFloat = True
+    typeName = None
+
+    random = None
+
+    def __init__(self, name, shape='sine', rate=1000.0, amplitude=100.0, period=1.0, isFloat=True, seed=0,
+                 typeName=None):
+        if shape not in FAKE_SHAPES:
+            raise ValueError("Unknown signal shape '%s'" % shape)
+
+        self.name = name
+        self.shape = shape
+        self.rate = float(rate)
+        self.amplitude = amplitude
+        self.period = period
+        self.isFloat = isFloat
+        self.random = np.random.RandomState(seed)
+
+        self.typeName = typeName
+        if typeName == None:
+            self.typeName = 'double' if isFloat else 'int'
+
+    def getValueType(self):
+        if self.isFloat:
+            return np.float64
+        return np.int64
+
+    #
+    # Number of samples with time <= t. Sample k is taken at k / rate.
+    #
+    def getCount(self, t):
+        if t < 0:
+            return 0
+        return int(np.floor(t * self.rate)) + 1
+
+    #
+    # Times and values of the samples [k1, k2)
+    #
+    def getSamples(self, k1, k2):
+        k = np.arange(k1, k2, dtype=np.int64)
+        t = k / self.rate
+
+        if self.shape == 'sine':
+            v = self.amplitude * np.sin(2 * np.pi * t / self.period)
+        elif self.shape == 'square':
+            v = self.amplitude * np.where((t / self.period) % 1.0 < 0.5, 1.0, -1.0)
+        elif self.shape == 'ramp':
+            v = self.amplitude * ((t / self.period) % 1.0)
+        elif self.shape == 'noise':
+            v = self.amplitude * self.random.standard_normal(len(k))
+        else:
+            v = k.astype(np.float64)
+
+        if self.isFloat:
+            return t, v
+        return t, np.round(v).astype(np.int64)
+
+
+#
+# Returns 'count' signals cycling through the shapes, every other one an
+# integer signal, with 'rate' samples per second each
+#
+def createSignals(count, rate):
+    signals = []
+    for i in range(count):
+        shape = FAKE_SHAPES[i % len(FAKE_SHAPES)]
+        signals.append(FakeSignal('fake%d' % i, shape, rate, 100.0 * (i + 1), 0.5 * (i + 1),
+                                  i % 2 == 0, seed=i))
+    return signals
+
+
+#
+# Returns an ApplicationConfiguration with one enabled variable per signal,
+# DAQ index = signal index, two variables per chart
+#
+def createConfiguration(signals):
+    import globals, variableConfiguration
+
+    config = variableConfiguration.ApplicationConfiguration()
+    for i, signal in enumerate(signals):
+        varConfig = variableConfiguration.VariableConfiguration(i)
+        varConfig.name = signal.name
+        varConfig.chartIndex = i // 2 + 1
+        varConfig.daqConfigIndex = i
+        if signal.isFloat:
+            varConfig.format = globals.formatFloat[0]
+        else:
+            varConfig.format = globals.formatInteger[0]
+        config.variableConfigs.append(varConfig)
+    return config
+
+
+#
+# Returns sample stores with the samples of the signals in [0, duration]
+#
+def createStores(signals, duration):
+    stores = []
+    for signal in signals:
+        store = sampleStore.SampleStore(signal.getValueType())
+        n = signal.getCount(duration)
+        for k in range(0, n, sampleStore.CHUNK_SIZE):
+            times, values = signal.getSamples(k, min(k + sampleStore.CHUNK_SIZE, n))
+            store.extend(times, values)
+        stores.append(store)
+    return stores
+
+
+#
+# Synthetic target of the fakeConnect controllers: the variables of its
+# download files and the FakeSignals, which are variables of the default
+# download file that can be sampled.
+#
+# Download files are (path, file name, [(variable name, type name)]). The
+# paths are only used as keys of the symbol cache, they need not exist.
+# Every data controller call takes 'latency' seconds, like a round-trip to
+# winIDEA, and is counted in 'calls' by method name. 'speed' and 
+# 'bufferSize' are the ones of the FakeDaqController.
+#
+class FakeTarget():
+
+    signals = None
+    downloadFiles = None
+    defaultFile = 0
+    latency = 0.0
+    calls = None
+
+    speed = None
+    bufferSize = None
+
+    def __init__(self, signals, speed=1.0, bufferSize=None, downloadFiles=None, latency=0.0):
+        self.signals = signals
+        self.speed = speed
+        self.bufferSize = bufferSize
+        self.latency = latency
+        self.calls = collections.Counter()
+
+        self.downloadFiles = downloadFiles
+        if downloadFiles == None:
+            self.downloadFiles = [('fake.elf', 'fake.elf', [])]
+
+    #
+    # Returns the signal of a variable name, None if it is not sampled
+    #
+    def getSignal(self, name):
+        for signal in self.signals:
+            if signal.name == name:
+                return signal
+        return None
+
+    #
+    # Returns the (name, type name) of the variables of a download file
+    #
+    def getVariables(self, fileIdx):
+        variables = list(self.downloadFiles[fileIdx][2])
+        if fileIdx == self.defaultFile:
+            variables = [(signal.name, signal.typeName) for signal in self.signals] + variables
+        return variables
+
+    #
+    # Returns the type name of a variable of any download file, None if
+    # there is none
+    #
+    def getTypeName(self, name):
+        for signal in self.signals:
+            if signal.name == name:
+                return signal.typeName
+
+        for path, fileName, variables in self.downloadFiles:
+            for varName, typeName in variables:
+                if varName == name:
+                    return typeName
+        return None
+
+    #
+    # Counts a controller call and waits for its round-trip
+    #
+    def wait(self, call):
+        self.calls[call] += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+
+#
+# Pure Python stand-in for the isystem.connect CDAQController, generating
+# the samples of FakeSignals. It is used like a replay.ReplayDaqController
+# with DaqManager.setReplay(), or, with a FakeTarget, configured by 
+# DaqManager.startSampling() like the DAQ controller, see fakeConnect.
+#
+# The DAQ clock runs at 'speed' times real time, or with speed None as fast
+# as the samples are read. Like the DAQ hardware it buffers bufferSize
+# samples (unlimited if None): older unread ones are lost and reported as
+# an overflow.
+#
+class FakeDaqController():
+
+    signals = None
+    speed = None
+    clock = None
+    bufferSize = None
+
+    # FakeTarget the configured signals are taken from, if any
+    target = None
+
+    startClock = None
+    startTime = 0.0
+
+    # All samples up to this time were read or lost
+    readTime = -1.0
+    overflow = False
+    overflowCount = 0
+
+    globalEnable = False
+    lock = None
+
+    def __init__(self, signals, speed=1.0, bufferSize=None, clock=time.time, target=None):
+        self.signals = signals
+        self.speed = speed
+        self.bufferSize = bufferSize
+        self.clock = clock
+        self.target = target
+        self.lock = threading.Lock()
+        self.rewind()
+
+    def getName(self):
+        return 'synthetic signals'
+
+    def rewind(self):
+        self.startClock = None
+        self.startTime = 0.0
+        self.readTime = -1.0
+        self.overflow = False
+        self.overflowCount = 0
+
+    def getValueTypes(self):
+        return [signal.getValueType() for signal in self.signals]
+
+    #
+    # Number of samples per second of all signals
+    #
+    def getRate(self):
+        return sum(signal.rate for signal in self.signals)
+
+    def getDaqTime(self):
+        if self.speed == None:
+            return max(self.readTime, 0.0)
+        if self.startClock == None:
+            return self.startTime
+        return self.startTime + (self.clock() - self.startClock) * self.speed
+
+    #
+    # Time up to which samples are available, limited to maxCount samples
+    #
+    def getAvailableTime(self, maxCount):
+        t = max(self.readTime, 0.0) + maxCount / self.getRate()
+        if self.speed == None:
+            return t
+        return min(t, self.getDaqTime())
+
+    def getAvailableCount(self, t):
+        return sum(s.getCount(t) - s.getCount(self.readTime) for s in self.signals)
+
+    #
+    # Drops the samples that do not fit into the buffer
+    #
+    def checkOverflow(self):
+        if self.bufferSize == None or self.speed == None:
+            return
+
+        t = self.getDaqTime()
+        if self.getAvailableCount(t) > self.bufferSize:
+            self.readTime = t - self.bufferSize / self.getRate()
+            self.overflow = True
+            self.overflowCount += 1
+
+    def info(self):
+        return replay.ReplayInfo()
+
+    def status(self):
+        with self.lock:
+            self.checkOverflow()
+
+            if self.speed == None:
+                n = replay.REPLAY_READ_SIZE
+            else:
+                n = self.getAvailableCount(self.getDaqTime())
+
+            status = FakeStatus(self.toTicks(self.getDaqTime()), n, self.overflow, self.globalEnable)
+            self.overflow = False
+            return status
+
+    def toTicks(self, t):
+        return int(round(t * 1e9 / replay.REPLAY_TICK_NS))
+
+    #
+    # Appends the available samples, up to REPLAY_READ_SIZE, to the list
+    # daqSamples in time order
+    #
+    def read(self, daqSamples):
+        with self.lock:
+            if len(self.signals) == 0:
+                return
+
+            self.checkOverflow()
+
+            t = self.getAvailableTime(replay.REPLAY_READ_SIZE)
+            if t <= self.readTime:
+                return
+
+            times = []
+            indices = []
+            values = []
+            for index, signal in enumerate(self.signals):
+                k1 = signal.getCount(self.readTime)
+                k2 = signal.getCount(t)
+                signalTimes, signalValues = signal.getSamples(k1, k2)
+                times.append(signalTimes)
+                indices.append(np.full(k2 - k1, index, dtype=np.int32))
+                values.extend(signalValues.tolist())
+            self.readTime = t
+
+            times = np.concatenate(times)
+            order = np.argsort(times, kind='stable')
+            ticks = np.round(times[order] * (1e9 / replay.REPLAY_TICK_NS)).astype(np.int64)
+            indices = np.concatenate(indices)[order]
+
+            for index, tick, i in zip(indices.tolist(), ticks.tolist(), order.tolist()):
+                daqSamples.append(replay.ReplaySample(index, tick, values[i], self.signals[index].isFloat))
+
+    def getDataValue(self, daqSample):
+        return daqSample
+
+    def enableGlobal(self, enable):
+        with self.lock:
+            if enable and not self.globalEnable:
+                self.startClock = self.clock()
+            elif not enable and self.globalEnable:
+                self.startTime = self.getDaqTime()
+                self.startClock = None
+            self.globalEnable = enable
+
+    def configReset(self):
+        if self.target != None:
+            self.signals = []
+
+    #
+    # Samples the signals of the target named by the configuration items,
+    # DAQ index = item index
+    #
+    def configure(self, config):
+        if self.target == None:
+            return
+
+        signals = []
+        for item in config:
+            signal = self.target.getSignal(item.getName())
+            if signal == None:
+                raise RuntimeError("Can't sample '%s'" % item.getName())
+            signals.append(signal)
+
+        with self.lock:
+            self.signals = signals
+            self.rewind()
+
+
+class FakeStatus(replay.ReplayStatus):
+
+    overflow = False
+
+    def __init__(self, time, numSamplesAvailable, overflow, globalEnable):
+        replay.ReplayStatus.__init__(self, time, numSamplesAvailable, globalEnable)
+        self.overflow = overflow
+
+    def getOverflow(self):
+        return self.overflow
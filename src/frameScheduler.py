@@ -0,0 +1,130 @@
+
+from __future__ import print_function
+
+
+#
+# Decides when the charts are redrawn. Sample ingest runs on its own timer,
+# the scheduler only paces drawing and keeps the statistics of both.
+#
+# The redraw interval follows the measured draw time, so drawing takes at
+# most drawBudget of the GUI thread time. Frame timer ticks that come
+# before the interval has passed are skipped, but a frame is always drawn
+# after maxFrameInterval (the minimum refresh rate).
+#
+# All times are in seconds and passed in by the caller, so the scheduler
+# does not depend on Qt or on the clock.
+#
+class FrameScheduler():
+
+    # Desired time between two frames and the longest allowed one
+    targetFrameInterval = 0.02
+    maxFrameInterval = 0.5
+
+    # Fraction of the GUI thread time drawing may take
+    drawBudget = 0.5
+
+    # Smoothing factor of the averaged statistics
+    smoothing = 0.2
+
+    frameInterval = None
+    lastFrameTime = None
+
+    # Frame statistics
+    frameCount = 0
+    droppedFrames = 0
+    drawTime = 0.0
+    frameRate = 0.0
+
+    # Ingest statistics
+    lastIngestTime = None
+    ingestTime = 0.0
+    ingestLatency = 0.0
+    maxIngestLatency = 0.0
+
+    def __init__(self, targetFrameInterval=None, maxFrameInterval=None, drawBudget=None):
+        if targetFrameInterval != None:
+            self.targetFrameInterval = targetFrameInterval
+        if maxFrameInterval != None:
+            self.maxFrameInterval = maxFrameInterval
+        if drawBudget != None:
+            self.drawBudget = drawBudget
+
+        self.frameInterval = self.targetFrameInterval
+        self.lastFrameTime = None
+        self.frameCount = 0
+        self.droppedFrames = 0
+        self.drawTime = 0.0
+        self.frameRate = 0.0
+
+        self.lastIngestTime = None
+        self.ingestTime = 0.0
+        self.ingestLatency = 0.0
+        self.maxIngestLatency = 0.0
+
+    #
+    # Returns True if a frame should be drawn at time 'now'. The frame timer
+    # ticks every targetFrameInterval, so a tick that comes up to half an
+    # interval early is accepted instead of waiting for the next one.
+    #
+    def isFrameDue(self, now):
+        if self.lastFrameTime == None:
+            return True
+        return now - self.lastFrameTime >= self.frameInterval - self.targetFrameInterval / 2
+
+    #
+    # Registers a frame drawn between 'start' and 'end' and returns the
+    # interval until the next one
+    #
+    def frameDone(self, start, end):
+        duration = end - start
+        if self.frameCount == 0:
+            self.drawTime = duration
+        else:
+            self.drawTime += self.smoothing * (duration - self.drawTime)
+
+        if self.lastFrameTime != None and start > self.lastFrameTime:
+            interval = start - self.lastFrameTime
+            self.frameRate += self.smoothing * (1.0 / interval - self.frameRate)
+
+            # Frames we missed compared to the target frame rate
+            self.droppedFrames += max(int(round(interval / self.targetFrameInterval)) - 1, 0)
+
+        self.lastFrameTime = start
+        self.frameCount += 1
+
+        interval = max(self.targetFrameInterval, self.drawTime / self.drawBudget)
+        self.frameInterval = min(interval, self.maxFrameInterval)
+        return self.frameInterval
+
+    #
+    # Registers a sample ingest between 'start' and 'end'. The latency is
+    # the longest time a sample could have waited for it.
+    #
+    def ingestDone(self, start, end):
+        duration = end - start
+        self.ingestTime += self.smoothing * (duration - self.ingestTime)
+
+        if self.lastIngestTime != None:
+            latency = end - self.lastIngestTime
+            self.ingestLatency += self.smoothing * (latency - self.ingestLatency)
+            self.maxIngestLatency = max(self.maxIngestLatency, latency)
+
+        self.lastIngestTime = start
+
+    def getFrameInterval(self):
+        return self.frameInterval
+
+    def getFrameRate(self):
+        return self.frameRate
+
+    def getDroppedFrames(self):
+        return self.droppedFrames
+
+    def getDrawTime(self):
+        return self.drawTime
+
+    def getIngestLatency(self):
+        return self.ingestLatency
+
+    def getMaxIngestLatency(self):
+        return self.maxIngestLatency
@@ -3,7 +3,7 @@ from __future__ import print_function
 
 import time, random
 import imp, sys
-import os, properties
+import os, properties, tempfile
 
 import logging
 
@@ -18,6 +18,39 @@ TIME_INTERVAL_MIN = 1
 
 MAX_DOTS_PER_PLOT = 1000.0
 CHART_PLOT_UPDATE_INTERVAL_MS = 20
+CHART_MIN_REFRESH_INTERVAL_MS = 500
+CHART_INGEST_INTERVAL_MS = 10
+
+# Refresh interval of the pipeline statistics in the status bar and the
+# diagnostics dialog
+STATS_REFRESH_INTERVAL_MS = 1000
+
+# Interval of applying the array dimensions looked up in the background to
+# the variable list
+SYMBOL_UPDATE_INTERVAL_MS = 200
+
+# Samples older than this (relative to the newest sample) are moved from 
+# memory to spill files, 0 (the default) keeps all samples in memory. 
+# Samples older than the retention time or beyond the retention size 
+# (memory and spill files) are dropped, 0 keeps all of them. They can be 
+# changed in the user properties, see getSampleStorageSettings().
+#
+# Samples are spilled and dropped in whole chunks of sampleStore.CHUNK_SIZE
+# (65536) samples per variable, so a slow variable is kept longer: at 10 Hz
+# one chunk holds about 1.8 hours.
+SAMPLE_MEMORY_WINDOW_S = 0
+SAMPLE_RETENTION_S = 0
+SAMPLE_RETENTION_MB = 0
+
+# Rows of the data table while the acquisition is running: all of them, the
+# ones in the chart time interval or the last ones. All rows are shown 
+# when it is paused or stopped. The number of last rows can be changed in
+# the user properties, see getTableWindowRows().
+TABLE_WINDOW_ALL = 0
+TABLE_WINDOW_CHART = 1
+TABLE_WINDOW_LAST_ROWS = 2
+tableWindowNames = ['All rows', 'Chart interval', 'Last rows']
+TABLE_WINDOW_ROW_COUNT = 10000
 
 TABLE_COLUMN_ENABLED = 0
 TABLE_COLUMN_INTERVAL = 1
@@ -54,9 +87,10 @@ formatterStrings[formatFloat[0]] = '{0:f}'
 formatterStrings[formatFloat[1]] = '{0:e}'
     
 userProperties = None
-appDataISystem = os.getenv("APPDATA") + "\\ASYST\\winIDEA\\"
+appDataISystem = os.path.join(os.getenv("APPDATA", os.path.expanduser("~")), "ASYST", "winIDEA", "")
 daqIdeaPropertiesFile = appDataISystem + "daqIDEA.properties"
 daqIdeaLogFile = appDataISystem + "daqIDEA.log"
+symbolCacheDirectory = appDataISystem + "daqIDEA.symbols"
 
 class AverageInt():
     
@@ -190,6 +224,55 @@ def storeUserProperties(props):
     file = open(daqIdeaPropertiesFile, 'w+')
     props.store(file)
 
+#
+# Returns a float user property, or the default if it is not set or invalid
+#
+def getUserPropertyFloat(key, default):
+    if userProperties == None:
+        return default
+    
+    strValue = userProperties.getProperty(key, None)
+    if strValue == None:
+        return default
+    
+    try:
+        return float(strValue)
+    except ValueError:
+        logging.warning("Invalid value '%s' of property '%s'"%(strValue, key))
+        return default
+
+#
+# Returns the memory window [s], retention time [s], retention size [bytes] 
+# and spill directory of the sample stores
+#
+def getSampleStorageSettings():
+    window = getUserPropertyFloat('samples.memory.window.seconds', SAMPLE_MEMORY_WINDOW_S)
+    retentionTime = getUserPropertyFloat('samples.retention.seconds', SAMPLE_RETENTION_S)
+    retentionSize = getUserPropertyFloat('samples.retention.megabytes', SAMPLE_RETENTION_MB) * 1024 * 1024
+    
+    directory = None
+    if userProperties != None:
+        directory = userProperties.getProperty('samples.spill.directory', None)
+    if not directory:
+        directory = tempfile.gettempdir()
+    
+    return window, retentionTime, int(retentionSize), directory
+
+#
+# Returns the number of rows of the data table in TABLE_WINDOW_LAST_ROWS mode
+#
+def getTableWindowRows():
+    return max(int(getUserPropertyFloat('table.window.rows', TABLE_WINDOW_ROW_COUNT)), 1)
+
+#
+# Returns the directory of the symbol cache, see symbolCache.SymbolCache. 
+# An empty value of the user property disables the cache.
+#
+def getSymbolCacheDirectory():
+    if userProperties == None:
+        return symbolCacheDirectory
+    return userProperties.getProperty('symbols.cache.directory', symbolCacheDirectory)
+
 def checkPythonInstallationAndModules():
     global userProperties
     
@@ -0,0 +1,30 @@
+
+from __future__ import print_function
+
+import os
+
+#
+# The isystem.connect module all modules use as 'ic'. It is replaced by
+# fakeConnect, which runs on synthetic signals instead of winIDEA, if the
+# environment variable DAQIDEA_FAKE_CONNECT is set or isystem.connect is
+# not installed, e.g. for the tests and benchmarks in CI.
+#
+FAKE_CONNECT_VARIABLE = 'DAQIDEA_FAKE_CONNECT'
+
+fakeRequested = bool(os.environ.get(FAKE_CONNECT_VARIABLE))
+
+if fakeRequested:
+    import fakeConnect as ic
+else:
+    try:
+        import isystem.connect as ic
+    except ImportError:
+        import fakeConnect as ic
+
+
+#
+# True if fakeConnect is used although it was not requested, because
+# isystem.connect is not installed
+#
+def isFakeFallback():
+    return ic.__name__ == 'fakeConnect' and not fakeRequested
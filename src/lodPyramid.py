@@ -0,0 +1,228 @@
+
+from __future__ import print_function
+
+import numpy as np
+
+# Bucket width of the finest level is 2**LOD_BASE_EXPONENT seconds. Finer
+# time slices are computed from the raw samples.
+LOD_BASE_EXPONENT = -7
+
+# Bucket width of the coarsest level is 2**LOD_TOP_EXPONENT seconds
+LOD_TOP_EXPONENT = 16
+
+MIN_LEVEL_ALLOCATION = 1 << 8
+
+
+#
+# One level of the pyramid. Only non-empty buckets are stored, sorted by
+# their bucket key floor(t / width), as growable NumPy columns.
+#
+class LodLevel():
+
+    keys = None
+    counts = None
+    sums = None
+    mins = None
+    maxs = None
+
+    size = 0
+
+    def __init__(self):
+        self.keys = np.empty(MIN_LEVEL_ALLOCATION, dtype=np.int64)
+        self.counts = np.empty(MIN_LEVEL_ALLOCATION, dtype=np.int64)
+        self.sums = np.empty(MIN_LEVEL_ALLOCATION, dtype=np.float64)
+        self.mins = np.empty(MIN_LEVEL_ALLOCATION, dtype=np.float64)
+        self.maxs = np.empty(MIN_LEVEL_ALLOCATION, dtype=np.float64)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def reserve(self, required):
+        capacity = len(self.keys)
+        if capacity >= required:
+            return
+
+        while capacity < required:
+            capacity *= 2
+
+        for name in ('keys', 'counts', 'sums', 'mins', 'maxs'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    #
+    # Replaces the buckets from index 'start' on with the given ones
+    #
+    def replaceTail(self, start, keys, counts, sums, mins, maxs):
+        n = start + len(keys)
+        self.reserve(n)
+
+        self.keys[start:n] = keys
+        self.counts[start:n] = counts
+        self.sums[start:n] = sums
+        self.mins[start:n] = mins
+        self.maxs[start:n] = maxs
+
+        self.size = n
+
+    #
+    # Removes the buckets with keys before 'key'
+    #
+    def dropBefore(self, key):
+        i = int(np.searchsorted(self.keys[:self.size], key, 'left'))
+        if i == 0:
+            return
+
+        n = self.size - i
+        for name in ('keys', 'counts', 'sums', 'mins', 'maxs'):
+            column = getattr(self, name)
+            column[:n] = column[i:self.size]
+        self.size = n
+
+
+#
+# Returns the start indices of runs of equal keys in a sorted array
+#
+def getGroupStarts(keys):
+    return np.concatenate(([0], np.nonzero(keys[1:] != keys[:-1])[0] + 1))
+
+
+#
+# Multi-resolution (min, max, sum, count) summary of the samples of one DAQ
+# variable. Level L holds buckets of 2**(LOD_BASE_EXPONENT + L) seconds, so
+# the levels line up with the power-of-two slices of
+# DaqManager.getAdjustedTimeSlices().
+#
+# Samples must be added in time order. Only the buckets touched by new
+# samples and their parents are recomputed.
+#
+class LodPyramid():
+
+    baseExponent = None
+    levels = None
+
+    def __init__(self, baseExponent=LOD_BASE_EXPONENT, topExponent=LOD_TOP_EXPONENT):
+        self.baseExponent = baseExponent
+        self.levels = [LodLevel() for i in range(topExponent - baseExponent + 1)]
+
+    def extend(self, times, values):
+        if len(times) == 0:
+            return
+
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+
+        # Merge the new samples into the base level
+        base = self.levels[0]
+        keys = np.floor(times * 2.0**-self.baseExponent).astype(np.int64)
+        starts = getGroupStarts(keys)
+
+        counts = np.diff(np.append(starts, len(keys)))
+        sums = np.add.reduceat(values, starts)
+        mins = np.minimum.reduceat(values, starts)
+        maxs = np.maximum.reduceat(values, starts)
+        keys = keys[starts]
+
+        first = base.size
+        if first > 0 and base.keys[first-1] == keys[0]:
+            first -= 1
+            counts[0] += base.counts[first]
+            sums[0] += base.sums[first]
+            mins[0] = min(mins[0], base.mins[first])
+            maxs[0] = max(maxs[0], base.maxs[first])
+
+        base.replaceTail(first, keys, counts, sums, mins, maxs)
+
+        # Recompute the parents of all changed buckets
+        for child, parent in zip(self.levels[:-1], self.levels[1:]):
+            first = self.updateParent(child, parent, first)
+
+    #
+    # Recomputes the buckets of 'parent' from the buckets of 'child' from
+    # index 'first' on. Returns the first changed index of the parent.
+    #
+    def updateParent(self, child, parent, first):
+        # Include the sibling of the first changed child
+        parentKey = child.keys[first] >> 1
+        while first > 0 and (child.keys[first-1] >> 1) == parentKey:
+            first -= 1
+
+        n = child.size
+        keys = child.keys[first:n] >> 1
+        starts = getGroupStarts(keys)
+
+        counts = np.add.reduceat(child.counts[first:n], starts)
+        sums = np.add.reduceat(child.sums[first:n], starts)
+        mins = np.minimum.reduceat(child.mins[first:n], starts)
+        maxs = np.maximum.reduceat(child.maxs[first:n], starts)
+
+        start = int(np.searchsorted(parent.keys[:parent.size], parentKey, 'left'))
+        parent.replaceTail(start, keys[starts], counts, sums, mins, maxs)
+
+        return start
+
+    #
+    # Removes the buckets that end before time t. The bucket containing t
+    # keeps the statistics of the dropped samples in it.
+    #
+    def dropBefore(self, t):
+        for idx, level in enumerate(self.levels):
+            level.dropBefore(int(np.floor(t * 2.0**-(self.baseExponent + idx))))
+
+    #
+    # Returns the level for time slices of width s, or None if s is not one
+    # of the bucket widths.
+    #
+    def getLevel(self, s):
+        mantissa, exponent = np.frexp(s)
+        if mantissa != 0.5:
+            return None
+
+        idx = int(exponent) - 1 - self.baseExponent
+        if idx < 0 or idx >= len(self.levels):
+            return None
+        return self.levels[idx]
+
+    #
+    # Returns the sample count, sum, minimum and maximum in each of the c
+    # time slots [t0 + i*s, t0 + (i+1)*s), or None if the slots do not line
+    # up with a level. The cost is O(c), independent of the sample count.
+    #
+    def getSlots(self, t0, s, c):
+        level = self.getLevel(s)
+        if level == None:
+            return None
+
+        k0 = t0 / s
+        if k0 != np.floor(k0):
+            return None
+        k0 = int(k0)
+
+        keys = level.keys[:level.size]
+        i1 = int(np.searchsorted(keys, k0, 'left'))
+        i2 = int(np.searchsorted(keys, k0 + c, 'left'))
+        slots = keys[i1:i2] - k0
+
+        counts = np.zeros(c, dtype=np.int64)
+        sums = np.zeros(c, dtype=np.float64)
+        mins = np.full(c, np.finfo(np.float64).max)
+        maxs = np.full(c, -np.finfo(np.float64).max)
+
+        counts[slots] = level.counts[i1:i2]
+        sums[slots] = level.sums[i1:i2]
+        mins[slots] = level.mins[i1:i2]
+        maxs[slots] = level.maxs[i1:i2]
+
+        return counts, sums, mins, maxs
+
+    #
+    # Bytes allocated for the buckets
+    #
+    def getMemorySize(self):
+        size = 0
+        for level in self.levels:
+            size += level.keys.nbytes + level.counts.nbytes + level.sums.nbytes
+            size += level.mins.nbytes + level.maxs.nbytes
+        return size
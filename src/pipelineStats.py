@@ -0,0 +1,216 @@
+
+from __future__ import print_function
+
+import time, math, json, threading
+
+# Histogram buckets are powers of two: bucket e holds values in
+# [2**(e-1), 2**e). Values outside are counted in the first or last bucket.
+HISTOGRAM_MIN_EXPONENT = -20
+HISTOGRAM_MAX_EXPONENT = 40
+
+
+#
+# Distribution of a measured value (time, batch size...) in power-of-two
+# buckets. Adding a value is O(1) and allocates nothing, so it can be done
+# for every read and frame.
+#
+class Histogram():
+
+    name = None
+    unit = None
+
+    count = 0
+    total = 0.0
+    min = None
+    max = None
+    last = None
+    buckets = None
+
+    def __init__(self, name, unit):
+        self.name = name
+        self.unit = unit
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+        self.buckets = [0] * (HISTOGRAM_MAX_EXPONENT - HISTOGRAM_MIN_EXPONENT + 1)
+
+    def add(self, value):
+        if value > 0:
+            e = math.frexp(value)[1]
+            e = min(max(e, HISTOGRAM_MIN_EXPONENT), HISTOGRAM_MAX_EXPONENT)
+        else:
+            e = HISTOGRAM_MIN_EXPONENT
+        self.buckets[e - HISTOGRAM_MIN_EXPONENT] += 1
+
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if self.count == 0 or value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+        self.last = value
+
+    def getMean(self):
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    #
+    # Returns the upper bound of the bucket with the p-th percentile
+    # (0 < p <= 100), limited to the maximum
+    #
+    def getPercentile(self, p):
+        if self.count == 0:
+            return None
+
+        n = p / 100.0 * self.count
+        counted = 0
+        for idx, bucketCount in enumerate(self.buckets):
+            counted += bucketCount
+            if counted >= n and bucketCount > 0:
+                return min(2.0**(idx + HISTOGRAM_MIN_EXPONENT), self.max)
+        return self.max
+
+    def toDict(self):
+        buckets = dict()
+        for idx, bucketCount in enumerate(self.buckets):
+            if bucketCount > 0:
+                buckets[repr(2.0**(idx + HISTOGRAM_MIN_EXPONENT))] = bucketCount
+
+        return {'unit': self.unit, 'count': self.count, 'mean': self.getMean(),
+                'min': self.min, 'max': self.max, 'last': self.last,
+                'p50': self.getPercentile(50), 'p95': self.getPercentile(95),
+                'p99': self.getPercentile(99), 'buckets': buckets}
+
+
+#
+# Ever growing total (samples, overflows...). The rate per second is
+# computed from the totals of two updateRate() calls.
+#
+class Counter():
+
+    name = None
+    unit = None
+
+    total = 0
+    rate = 0.0
+    lastTotal = 0
+    lastTime = None
+
+    def __init__(self, name, unit):
+        self.name = name
+        self.unit = unit
+        self.reset()
+
+    def reset(self):
+        self.total = 0
+        self.rate = 0.0
+        self.lastTotal = 0
+        self.lastTime = None
+
+    def add(self, n=1):
+        self.total += n
+
+    def updateRate(self, now):
+        total = self.total
+        if self.lastTime != None and now > self.lastTime:
+            self.rate = (total - self.lastTotal) / (now - self.lastTime)
+        self.lastTotal = total
+        self.lastTime = now
+
+    def toDict(self):
+        return {'unit': self.unit, 'total': self.total, 'rate': self.rate}
+
+
+#
+# Counters, histograms and gauges (last set value) of the acquisition
+# pipeline, by name. They are always on: the DAQ reader thread and the GUI
+# update them as they go and the diagnostics panel shows them.
+#
+# Every metric is updated by one thread only, so only creating them is
+# locked. Readers may see a histogram in the middle of an update, which
+# is good enough for statistics.
+#
+class PipelineStats():
+
+    counters = None
+    histograms = None
+    gauges = None
+    lock = None
+
+    # Time of the last reset()
+    startTime = None
+
+    def __init__(self):
+        self.counters = dict()
+        self.histograms = dict()
+        self.gauges = dict()
+        self.lock = threading.Lock()
+        self.startTime = time.time()
+
+    def getCounter(self, name, unit=''):
+        counter = self.counters.get(name)
+        if counter == None:
+            with self.lock:
+                counter = self.counters.setdefault(name, Counter(name, unit))
+        return counter
+
+    def getHistogram(self, name, unit=''):
+        histogram = self.histograms.get(name)
+        if histogram == None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram(name, unit))
+        return histogram
+
+    def count(self, name, n=1, unit=''):
+        self.getCounter(name, unit).add(n)
+
+    def add(self, name, value, unit=''):
+        self.getHistogram(name, unit).add(value)
+
+    def setGauge(self, name, value, unit=''):
+        self.gauges[name] = (value, unit)
+
+    def getGauge(self, name):
+        return self.gauges.get(name, (None, None))[0]
+
+    #
+    # Updates the rates of all counters, call it periodically
+    #
+    def updateRates(self, now=None):
+        if now == None:
+            now = time.time()
+        for counter in list(self.counters.values()):
+            counter.updateRate(now)
+
+    #
+    # Removes all metrics, e.g. when a new acquisition starts
+    #
+    def reset(self):
+        with self.lock:
+            self.counters = dict()
+            self.histograms = dict()
+            self.gauges = dict()
+            self.startTime = time.time()
+
+    def toDict(self):
+        counters = dict((name, c.toDict()) for name, c in list(self.counters.items()))
+        histograms = dict((name, h.toDict()) for name, h in list(self.histograms.items()))
+        gauges = dict((name, {'value': value, 'unit': unit})
+                      for name, (value, unit) in list(self.gauges.items()))
+
+        return {'time': time.time(), 'startTime': self.startTime,
+                'counters': counters, 'histograms': histograms, 'gauges': gauges}
+
+    def saveJson(self, fileName):
+        with open(fileName, 'w') as f:
+            json.dump(self.toDict(), f, indent=2, sort_keys=True)
+
+
+# Statistics of the running application
+stats = PipelineStats()
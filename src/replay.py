@@ -0,0 +1,296 @@
+
+from __future__ import print_function
+
+import time, threading
+import numpy as np
+
+# DAQ clock tick of the replay
+REPLAY_TICK_NS = 1
+
+# Maximum number of samples returned by one read()
+REPLAY_READ_SIZE = 1 << 16
+
+# Number of samples of every store merged at once
+REPLAY_MERGE_SIZE = 1 << 14
+
+# Replay speed names and factors, None replays as fast as the samples are
+# read
+REPLAY_SPEED_NAMES = ['1x', '2x', '10x', '100x', 'Maximum']
+REPLAY_SPEED_VALUES = [1.0, 2.0, 10.0, 100.0, None]
+
+
+#
+# Sample returned by ReplayDaqController.read(). It is also its own data
+# value for ReplayDaqController.getDataValue().
+#
+class ReplaySample():
+
+    index = 0
+    time = 0
+    value = 0
+    isFloat = False
+
+    def __init__(self, index, time, value, isFloat):
+        self.index = index
+        self.time = time
+        self.value = value
+        self.isFloat = isFloat
+
+    def getIndex(self):
+        return self.index
+
+    def getTime(self):
+        return self.time
+
+    def isTypeSigned(self):
+        return not self.isFloat
+
+    def isTypeUnsigned(self):
+        return False
+
+    def isTypeFloat(self):
+        return self.isFloat
+
+    def isTypeCompound(self):
+        return False
+
+    def isTypeAddress(self):
+        return False
+
+    def getLong(self):
+        return self.value
+
+    def getDouble(self):
+        return self.value
+
+
+class ReplayStatus():
+
+    time = 0
+    numSamplesAvailable = 0
+    globalEnable = False
+
+    def __init__(self, time, numSamplesAvailable, globalEnable):
+        self.time = time
+        self.numSamplesAvailable = numSamplesAvailable
+        self.globalEnable = globalEnable
+
+    def getTime(self):
+        return self.time
+
+    def getNumSamplesAvailable(self):
+        return self.numSamplesAvailable
+
+    def getOverflow(self):
+        return False
+
+    def getGlobalEnable(self):
+        return self.globalEnable
+
+
+class ReplayInfo():
+
+    def getTick_ns(self):
+        return REPLAY_TICK_NS
+
+    def getMaxItems(self):
+        return REPLAY_READ_SIZE
+
+
+#
+# Stand-in for the isystem.connect CDAQController that DaqManager reads
+# the samples of a captureFile.CaptureFile from. The samples of all stores
+# are merged in time order and become available as the replay clock
+# passes their time: at 'speed' times real time, or, with speed None, as
+# fast as they are read.
+#
+# The DAQ time starts at 0 when sampling is enabled and stops at the last
+# sample, so the charts stay on the data when the capture ends.
+#
+class ReplayDaqController():
+
+    capture = None
+    speed = None
+    clock = None
+
+    # Wall clock time and replay time when the replay was enabled
+    startClock = None
+    startTime = 0.0
+
+    # Merge position in every store and the merged samples not read yet:
+    # times [s], DAQ indices and values
+    cursors = None
+    times = None
+    indices = None
+    values = None
+    position = 0
+
+    # Time of the last sample read, the replay time at maximum speed
+    lastReadTime = 0.0
+
+    # Float value flag of every DAQ index
+    isFloat = None
+
+    endTime = 0.0
+    globalEnable = False
+    lock = None
+
+    def __init__(self, capture, speed=1.0, clock=time.time):
+        self.capture = capture
+        self.speed = speed
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.isFloat = [store.valueType.kind == 'f' for store in capture.stores]
+        self.endTime = 0.0
+        for store in capture.stores:
+            if len(store) > 0:
+                self.endTime = max(self.endTime, float(store.lastTime()))
+
+        self.rewind()
+
+    def getName(self):
+        return self.capture.fileName
+
+    #
+    # Starts the replay at the beginning of the capture
+    #
+    def rewind(self):
+        self.cursors = [0] * len(self.capture.stores)
+        self.times = np.empty(0, dtype=np.float64)
+        self.indices = np.empty(0, dtype=np.int32)
+        self.values = []
+        self.position = 0
+        self.lastReadTime = 0.0
+        self.startClock = None
+        self.startTime = 0.0
+
+    #
+    # Value types of the sample stores of the replayed capture
+    #
+    def getValueTypes(self):
+        return [store.valueType for store in self.capture.stores]
+
+    def getReplayTime(self):
+        if self.speed == None:
+            return self.lastReadTime
+        if self.startClock == None:
+            return self.startTime
+
+        t = self.startTime + (self.clock() - self.startClock) * self.speed
+        return min(t, self.endTime)
+
+    #
+    # Merges the next block of samples of all stores. Returns False at the
+    # end of the capture.
+    #
+    def mergeNextBlock(self):
+        stores = self.capture.stores
+
+        # Merge up to the earliest block end, so no later block can have
+        # samples before it
+        endTime = None
+        for di, store in enumerate(stores):
+            i = min(self.cursors[di] + REPLAY_MERGE_SIZE, len(store)) - 1
+            if i >= self.cursors[di]:
+                t = store.getTime(i)
+                if endTime == None or t < endTime:
+                    endTime = t
+
+        if endTime == None:
+            return False
+
+        times = [self.times[self.position:]]
+        indices = [self.indices[self.position:]]
+        values = self.values[self.position:]
+        for di, store in enumerate(stores):
+            end = store.searchTime(endTime, 'right', self.cursors[di])
+            times.append(store.getTimes(self.cursors[di], end))
+            indices.append(np.full(end - self.cursors[di], di, dtype=np.int32))
+            values.extend(store.getValues(self.cursors[di], end).tolist())
+            self.cursors[di] = end
+
+        times = np.concatenate(times)
+        order = np.argsort(times, kind='stable')
+
+        self.times = times[order]
+        self.indices = np.concatenate(indices)[order]
+        self.values = [values[i] for i in order.tolist()]
+        self.position = 0
+        return True
+
+    #
+    # Number of merged samples up to time t, merging more if needed. Not
+    # more than REPLAY_READ_SIZE samples are merged ahead.
+    #
+    def getAvailableCount(self, t):
+        while True:
+            n = len(self.times) - self.position
+            if n >= REPLAY_READ_SIZE or (n > 0 and self.times[-1] > t):
+                break
+            if not self.mergeNextBlock():
+                break
+
+        return int(np.searchsorted(self.times[self.position:], t, 'right'))
+
+    def getAvailableTime(self):
+        if self.speed == None:
+            return float('inf')
+        return self.getReplayTime()
+
+    def info(self):
+        return ReplayInfo()
+
+    def status(self):
+        with self.lock:
+            t = self.getReplayTime()
+            n = self.getAvailableCount(self.getAvailableTime())
+            return ReplayStatus(self.toTicks(t), n, self.globalEnable)
+
+    def toTicks(self, t):
+        return int(round(t * 1e9 / REPLAY_TICK_NS))
+
+    #
+    # Appends the available samples to the list daqSamples
+    #
+    def read(self, daqSamples):
+        with self.lock:
+            n = min(self.getAvailableCount(self.getAvailableTime()), REPLAY_READ_SIZE)
+            if n == 0:
+                return
+
+            i1 = self.position
+            i2 = i1 + n
+            ticks = np.round(self.times[i1:i2] * (1e9 / REPLAY_TICK_NS)).astype(np.int64)
+
+            isFloat = self.isFloat
+            for index, tick, value in zip(self.indices[i1:i2].tolist(), ticks.tolist(), self.values[i1:i2]):
+                daqSamples.append(ReplaySample(index, tick, value, isFloat[index]))
+
+            self.lastReadTime = float(self.times[i2-1])
+            self.position = i2
+
+    def getDataValue(self, daqSample):
+        return daqSample
+
+    def enableGlobal(self, enable):
+        with self.lock:
+            if enable and not self.globalEnable:
+                self.startClock = self.clock()
+            elif not enable and self.globalEnable:
+                self.startTime = self.getReplayTime()
+                self.startClock = None
+            self.globalEnable = enable
+
+    #
+    # True when all samples were read
+    #
+    def isFinished(self):
+        with self.lock:
+            return self.getAvailableCount(float('inf')) == 0
+
+    def configReset(self):
+        pass
+
+    def configure(self, config):
+        pass
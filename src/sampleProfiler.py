@@ -0,0 +1,168 @@
+
+from __future__ import print_function
+
+import os, sys, time, json, threading
+
+# Time between two samples of the thread stacks
+PROFILER_INTERVAL_S = 0.005
+
+
+#
+# Returns the frame key of a code object: function, file and first line
+#
+def getFrameKey(code):
+    return (code.co_name, code.co_filename, code.co_firstlineno)
+
+
+def getFrameName(frameKey):
+    name, fileName, line = frameKey
+    return '%s (%s:%d)' % (name, os.path.basename(fileName), line)
+
+
+#
+# Statistical profiler for an event loop application, where cProfile of
+# main() tells nothing. Every 'interval' seconds it takes the Python stack
+# of all other threads with sys._current_frames() and counts the stacks
+# per thread name, so the GUI thread (MainThread) and the DAQ reader
+# (DaqWorkerThread) are profiled separately. The profiled threads are not
+# interrupted, only the sampling itself takes GIL time.
+#
+# The result is written in collapsed stack format (flamegraph.pl,
+# inferno, speedscope) and as a speedscope JSON file.
+#
+class SamplingProfiler(threading.Thread):
+
+    interval = None
+    stopEvent = None
+
+    # Thread name -> {stack of frame keys, root first: sample count}
+    stacks = None
+    sampleCount = 0
+
+    startTime = None
+    stopTime = None
+
+    def __init__(self, interval=PROFILER_INTERVAL_S):
+        threading.Thread.__init__(self, name='SamplingProfiler')
+        self.daemon = True
+
+        self.interval = interval
+        self.stopEvent = threading.Event()
+        self.stacks = dict()
+        self.sampleCount = 0
+
+    def run(self):
+        self.startTime = time.time()
+        while not self.stopEvent.wait(self.interval):
+            self.sample()
+        self.stopTime = time.time()
+
+    def stopRunning(self):
+        self.stopEvent.set()
+
+    def sample(self):
+        threadNames = dict((t.ident, t.name) for t in threading.enumerate())
+
+        for ident, frame in list(sys._current_frames().items()):
+            if ident == self.ident:
+                continue
+
+            stack = []
+            while frame != None:
+                stack.append(getFrameKey(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+
+            name = threadNames.get(ident, 'Thread-%d' % ident)
+            threadStacks = self.stacks.setdefault(name, dict())
+            stack = tuple(stack)
+            threadStacks[stack] = threadStacks.get(stack, 0) + 1
+
+        self.sampleCount += 1
+
+    #
+    # Average time between two samples, longer than the interval when the
+    # profiler has to wait for the GIL
+    #
+    def getSampleTime(self):
+        if self.sampleCount == 0 or self.startTime == None:
+            return self.interval
+        stopTime = self.stopTime
+        if stopTime == None:
+            stopTime = time.time()
+        return (stopTime - self.startTime) / self.sampleCount
+
+    #
+    # Writes one line per stack: thread;caller;...;function count
+    #
+    def writeCollapsed(self, fileName):
+        with open(fileName, 'w') as f:
+            for threadName in sorted(self.stacks):
+                for stack, count in sorted(self.stacks[threadName].items()):
+                    frames = [threadName] + [getFrameName(key) for key in stack]
+                    f.write('%s %d\n' % (';'.join(frame.replace(';', ':') for frame in frames), count))
+
+    #
+    # Writes a speedscope file with one sampled profile per thread
+    #
+    def writeSpeedscope(self, fileName):
+        frames = []
+        frameIndices = dict()
+        profiles = []
+        sampleTime = self.getSampleTime()
+
+        for threadName in sorted(self.stacks):
+            samples = []
+            weights = []
+            for stack, count in sorted(self.stacks[threadName].items()):
+                sample = []
+                for key in stack:
+                    if key not in frameIndices:
+                        frameIndices[key] = len(frames)
+                        frames.append({'name': key[0], 'file': key[1], 'line': key[2]})
+                    sample.append(frameIndices[key])
+                samples.append(sample)
+                weights.append(count * sampleTime)
+
+            profiles.append({'type': 'sampled', 'name': threadName, 'unit': 'seconds',
+                             'startValue': 0, 'endValue': sum(weights),
+                             'samples': samples, 'weights': weights})
+
+        data = {'$schema': 'https://www.speedscope.app/file-format-schema.json',
+                'name': 'daqIDEA', 'exporter': 'daqIDEA sampleProfiler',
+                'activeProfileIndex': 0,
+                'shared': {'frames': frames}, 'profiles': profiles}
+
+        with open(fileName, 'w') as f:
+            json.dump(data, f)
+
+    #
+    # Writes fileBase.collapsed and fileBase.speedscope.json and returns
+    # their names
+    #
+    def save(self, fileBase):
+        collapsedFile = fileBase + '.collapsed'
+        speedscopeFile = fileBase + '.speedscope.json'
+        self.writeCollapsed(collapsedFile)
+        self.writeSpeedscope(speedscopeFile)
+        return collapsedFile, speedscopeFile
+
+
+#
+# Returns the file base name and the duration in seconds (None: until
+# stopped) from the command line options '--profile FILE' and
+# '--profile-time SECONDS', or None if profiling was not requested
+#
+def getProfileArguments(args):
+    fileBase = None
+    duration = None
+
+    for i, arg in enumerate(args[:-1]):
+        if arg == '--profile':
+            fileBase = args[i+1]
+        elif arg == '--profile-time':
+            duration = float(args[i+1])
+
+    if fileBase == None:
+        return None
+    return fileBase, duration
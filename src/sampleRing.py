@@ -0,0 +1,151 @@
+
+from __future__ import print_function
+
+import time
+import numpy as np
+
+# Default number of samples the ring can hold
+RING_CAPACITY = 1 << 20
+
+POLICY_DROP = 0
+POLICY_BLOCK = 1
+
+
+#
+# Preallocated single-producer/single-consumer ring of (DAQ index, tick
+# time, value, integer value) samples between the DAQ reader thread and the
+# GUI. Values are float64, integer values the exact int64 (or the bit 
+# pattern of uint64) values of integer samples.
+#
+# The producer only writes writeCount and the consumer only writes
+# readCount, both are ever growing sample counters. Data is copied into
+# the ring before writeCount is published, so no lock is required.
+#
+# When the ring is full the producer either drops the samples that do not
+# fit (POLICY_DROP) or waits for the consumer for up to blockTimeout
+# seconds before dropping them (POLICY_BLOCK).
+#
+class SampleRing():
+
+    capacity = None
+    policy = None
+    blockTimeout = 0.5
+
+    indices = None
+    times = None
+    values = None
+    intValues = None
+
+    writeCount = 0
+    readCount = 0
+
+    # Statistics
+    highWaterMark = 0
+    droppedCount = 0
+
+    def __init__(self, capacity=RING_CAPACITY, policy=POLICY_BLOCK, blockTimeout=None):
+        self.capacity = capacity
+        self.policy = policy
+        if blockTimeout != None:
+            self.blockTimeout = blockTimeout
+
+        self.indices = np.zeros(capacity, dtype=np.int32)
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.intValues = np.zeros(capacity, dtype=np.int64)
+
+        self.writeCount = 0
+        self.readCount = 0
+        self.highWaterMark = 0
+        self.droppedCount = 0
+
+    def __len__(self):
+        return self.writeCount - self.readCount
+
+    def empty(self):
+        return self.writeCount == self.readCount
+
+    #
+    # Producer: appends the sample arrays. Returns the number of samples
+    # that were stored.
+    #
+    def pushMany(self, indices, times, values, intValues):
+        n = len(indices)
+        free = self.capacity - (self.writeCount - self.readCount)
+
+        if n > free and self.policy == POLICY_BLOCK:
+            deadline = time.time() + self.blockTimeout
+            while n > free and time.time() < deadline:
+                time.sleep(0.001)
+                free = self.capacity - (self.writeCount - self.readCount)
+
+        if n > free:
+            self.droppedCount += n - free
+            n = free
+
+        if n <= 0:
+            return 0
+
+        start = self.writeCount % self.capacity
+        first = min(n, self.capacity - start)
+
+        self.indices[start:start+first] = indices[:first]
+        self.times[start:start+first] = times[:first]
+        self.values[start:start+first] = values[:first]
+        self.intValues[start:start+first] = intValues[:first]
+
+        if n > first:
+            self.indices[:n-first] = indices[first:n]
+            self.times[:n-first] = times[first:n]
+            self.values[:n-first] = values[first:n]
+            self.intValues[:n-first] = intValues[first:n]
+
+        # Publish the samples to the consumer
+        self.writeCount += n
+
+        fill = self.writeCount - self.readCount
+        if fill > self.highWaterMark:
+            self.highWaterMark = fill
+
+        return n
+
+    #
+    # Consumer: passes all available samples to consumer(indices, times,
+    # values, intValues) in at most two calls. The arrays are views of the ring and
+    # are only valid during the call. Returns the number of samples.
+    #
+    def drainInto(self, consumer):
+        w = self.writeCount
+        r = self.readCount
+        n = w - r
+        if n <= 0:
+            return 0
+
+        start = r % self.capacity
+        first = min(n, self.capacity - start)
+
+        consumer(self.indices[start:start+first],
+                 self.times[start:start+first],
+                 self.values[start:start+first],
+                 self.intValues[start:start+first])
+
+        if n > first:
+            consumer(self.indices[:n-first],
+                     self.times[:n-first],
+                     self.values[:n-first],
+                     self.intValues[:n-first])
+
+        self.readCount = w
+        return n
+
+    #
+    # Consumer: discards all available samples
+    #
+    def clear(self):
+        self.readCount = self.writeCount
+
+    def getHighWaterMark(self):
+        return self.highWaterMark
+
+    def getDroppedCount(self):
+        return self.droppedCount
@@ -0,0 +1,156 @@
+
+from __future__ import print_function
+
+import os
+import logging
+import numpy as np
+
+# Number of chunks in one spill file. Files are removed as a whole when
+# all their chunks were dropped by the retention.
+SPILL_SEGMENT_CHUNKS = 64
+
+
+#
+# One spill file of up to SPILL_SEGMENT_CHUNKS chunks, each one its time 
+# array followed by its value array. The file grows with the written 
+# chunks, so it takes no more disk space than the spilled samples. Every
+# chunk is read through its own read-only memory map.
+#
+class SpillSegment():
+
+    firstChunk = None
+    fileName = None
+    file = None
+
+    chunkSize = None
+    valueType = None
+    chunkCount = 0
+
+    def __init__(self, fileName, firstChunk, chunkSize, valueType):
+        self.fileName = fileName
+        self.firstChunk = firstChunk
+        self.chunkSize = chunkSize
+        self.valueType = np.dtype(valueType)
+        self.chunkCount = 0
+
+        # Unbuffered, so written chunks can be mapped at once
+        self.file = open(fileName, 'w+b', buffering=0)
+
+    #
+    # Bytes of one chunk in the file
+    #
+    def getChunkBytes(self):
+        return self.chunkSize * (8 + self.valueType.itemsize)
+
+    #
+    # Writes chunk k of the segment and returns read-only views of it.
+    # Chunks are written in order.
+    #
+    def write(self, k, times, values):
+        offset = k * self.getChunkBytes()
+        self.file.seek(offset)
+        self.file.write(np.ascontiguousarray(times, dtype=np.float64).tobytes())
+        self.file.write(np.ascontiguousarray(values, dtype=self.valueType).tobytes())
+        self.chunkCount = max(self.chunkCount, k + 1)
+
+        data = np.memmap(self.fileName, dtype=np.uint8, mode='r', 
+                         offset=offset, shape=(self.getChunkBytes(),))
+        times = np.frombuffer(data, dtype=np.float64, count=self.chunkSize)
+        values = np.frombuffer(data, dtype=self.valueType, offset=self.chunkSize * 8)
+        return times, values
+
+    #
+    # Bytes of the file
+    #
+    def getDiskSize(self):
+        return self.chunkCount * self.getChunkBytes()
+
+    #
+    # Closes and removes the file. Returns False if it is still in use,
+    # e.g. by a snapshot of an export on Windows.
+    #
+    def remove(self):
+        if self.file != None:
+            self.file.close()
+            self.file = None
+
+        try:
+            os.remove(self.fileName)
+        except OSError:
+            return False
+        return True
+
+
+#
+# Disk tier of a sampleStore.SampleStore. Full chunks that left the
+# in-memory window are written to spill files in 'directory'. The store
+# keeps read-only memory mapped views of them, so the operating system
+# pages the samples in when they are used and can drop them again.
+#
+class SampleSpill():
+
+    directory = None
+    name = None
+    chunkSize = None
+    valueType = None
+
+    segments = None
+
+    # Files of removed segments that could not be deleted yet
+    staleFiles = None
+
+    def __init__(self, directory, name, chunkSize, valueType):
+        self.directory = directory
+        self.name = name
+        self.chunkSize = chunkSize
+        self.valueType = np.dtype(valueType)
+        self.segments = []
+        self.staleFiles = []
+
+    #
+    # Writes chunk c to disk and returns its time and value views
+    #
+    def spillChunk(self, c, times, values):
+        firstChunk = c - c % SPILL_SEGMENT_CHUNKS
+        if len(self.segments) == 0 or self.segments[-1].firstChunk != firstChunk:
+            fileName = os.path.join(self.directory, '%s-%d.spill' % (self.name, firstChunk // SPILL_SEGMENT_CHUNKS))
+            self.segments.append(SpillSegment(fileName, firstChunk, self.chunkSize, self.valueType))
+
+        segment = self.segments[-1]
+        return segment.write(c - firstChunk, times, values)
+
+    #
+    # Removes the files that hold only chunks before chunk c
+    #
+    def release(self, c):
+        while len(self.segments) > 0 and self.segments[0].firstChunk + SPILL_SEGMENT_CHUNKS <= c:
+            segment = self.segments.pop(0)
+            if not segment.remove():
+                self.staleFiles.append(segment.fileName)
+
+        self.removeStaleFiles()
+
+    def removeStaleFiles(self):
+        files = self.staleFiles
+        self.staleFiles = []
+        for fileName in files:
+            try:
+                os.remove(fileName)
+            except OSError:
+                self.staleFiles.append(fileName)
+
+    #
+    # Bytes of spill files on disk
+    #
+    def getDiskSize(self):
+        return sum(segment.getDiskSize() for segment in self.segments)
+
+    def close(self):
+        for segment in self.segments:
+            if not segment.remove():
+                self.staleFiles.append(segment.fileName)
+        self.segments = []
+
+        self.removeStaleFiles()
+        if len(self.staleFiles) > 0:
+            logging.debug('Spill files still in use: %s' % ', '.join(self.staleFiles))
@@ -0,0 +1,470 @@
+
+from __future__ import print_function
+
+import bisect
+import numpy as np
+
+# Number of samples held in one chunk of a sample store. Filled chunks are
+# never reallocated or modified, so views of them stay valid forever.
+CHUNK_SIZE = 1 << 16
+
+# Allocation of a new chunk. The last chunk grows by doubling until it
+# reaches CHUNK_SIZE.
+MIN_CHUNK_ALLOCATION = 1 << 8
+
+# Number of galloping steps tried around a search hint before falling back
+# to a full search
+MAX_GALLOP_STEPS = 8
+
+
+#
+# Returns the numpy value type used to store the samples of a variable when
+# its symbol type is not known, float64 for unknown variables
+#
+def getValueType(var):
+    import variable, daqIO
+
+    if var == None:
+        return np.float64
+    if var.simpleType == variable.TYPE_MEM_ADDR:
+        return np.int64
+    if var.simpleType == variable.TYPE_IO and var.portType == daqIO.HIL_DIN:
+        return np.int64
+    return np.float64
+
+
+#
+# Returns the numpy value type used to store the samples of a symbol of the
+# isystem.connect SType 'varType'. Integers are kept exact: 64 bit unsigned
+# ones as uint64, all others as int64. Other types are stored as float64.
+#
+def getSymbolValueType(varType):
+    from iconnect import ic
+
+    if varType.m_byType == ic.SType.tSigned:
+        return np.int64
+    if varType.m_byType == ic.SType.tUnsigned:
+        if varType.m_byBitSize >= 64:
+            return np.uint64
+        return np.int64
+    return np.float64
+
+
+#
+# Growable, chunked column store of (time, value) samples of one DAQ
+# variable. Times are float64 seconds, values use the native type of the
+# variable (int64 or float64), so a sample takes 16 bytes.
+#
+# Samples are appended in time order. Global sample indices are used by all
+# accessors, chunks are an implementation detail for everything except
+# iterChunks().
+#
+# Old full chunks can be spilled to disk (spillBefore()), then the store
+# keeps memory mapped views of them, and dropped (dropBefore()). Dropped
+# chunks keep their slot, so sample indices never change, but the valid
+# indices start at getFirstIndex().
+#
+class SampleStore():
+
+    valueType = None
+    chunkSize = None
+
+    # Time and value arrays of all chunks. All but the last one are full.
+    timeChunks = None
+    valueChunks = None
+
+    # Time of the first sample in every chunk for time lookups
+    firstTimes = None
+
+    sampleCount = 0
+
+    # Number of leading chunks that were dropped and of those that are not
+    # in memory any more (dropped or spilled)
+    droppedChunks = 0
+    spilledChunks = 0
+
+    # sampleSpill.SampleSpill the chunks are spilled to, None if disabled
+    spill = None
+
+    def __init__(self, valueType=np.float64, chunkSize=CHUNK_SIZE, spill=None):
+        self.valueType = np.dtype(valueType)
+        self.chunkSize = chunkSize
+        self.timeChunks = []
+        self.valueChunks = []
+        self.firstTimes = []
+        self.sampleCount = 0
+        self.droppedChunks = 0
+        self.spilledChunks = 0
+        self.spill = spill
+
+    def __len__(self):
+        return self.sampleCount
+
+    #
+    # Index of the first sample that was not dropped
+    #
+    def getFirstIndex(self):
+        return min(self.droppedChunks * self.chunkSize, self.sampleCount)
+
+    #
+    # Number of samples in the last chunk
+    #
+    def lastChunkCount(self):
+        return self.sampleCount - (len(self.timeChunks) - 1) * self.chunkSize
+
+    def newChunk(self, required):
+        size = MIN_CHUNK_ALLOCATION
+        while size < required and size < self.chunkSize:
+            size *= 2
+        size = min(size, self.chunkSize)
+
+        self.timeChunks.append(np.empty(size, dtype=np.float64))
+        self.valueChunks.append(np.empty(size, dtype=self.valueType))
+        self.firstTimes.append(None)
+
+    #
+    # Makes room for at least 'required' samples in the last chunk, limited
+    # by the chunk size.
+    #
+    def growLastChunk(self, required):
+        tc = self.timeChunks[-1]
+        size = len(tc)
+        if size >= required or size >= self.chunkSize:
+            return
+
+        while size < required and size < self.chunkSize:
+            size *= 2
+        size = min(size, self.chunkSize)
+
+        count = self.lastChunkCount()
+
+        newTimes = np.empty(size, dtype=np.float64)
+        newTimes[:count] = tc[:count]
+        newValues = np.empty(size, dtype=self.valueType)
+        newValues[:count] = self.valueChunks[-1][:count]
+
+        self.timeChunks[-1] = newTimes
+        self.valueChunks[-1] = newValues
+
+    def append(self, t, v):
+        self.extend(np.array([t], dtype=np.float64), np.array([v], dtype=self.valueType))
+
+    #
+    # Appends arrays of sample times and values
+    #
+    def extend(self, times, values):
+        n = len(times)
+        done = 0
+
+        while done < n:
+            if len(self.timeChunks) == 0 or self.lastChunkCount() >= self.chunkSize:
+                self.newChunk(n - done)
+
+            count = self.lastChunkCount()
+            self.growLastChunk(count + n - done)
+
+            tc = self.timeChunks[-1]
+            vc = self.valueChunks[-1]
+            k = min(n - done, len(tc) - count)
+
+            tc[count:count+k] = times[done:done+k]
+            vc[count:count+k] = values[done:done+k]
+
+            if count == 0:
+                self.firstTimes[-1] = float(tc[0])
+
+            self.sampleCount += k
+            done += k
+
+    #
+    # Appends a full chunk of samples without copying, e.g. views of a
+    # memory mapped file. The arrays must not change afterwards.
+    #
+    def appendChunk(self, times, values):
+        if len(times) != self.chunkSize or len(values) != self.chunkSize:
+            raise ValueError('Chunk must have %d samples' % self.chunkSize)
+        if len(self.timeChunks) > 0 and self.lastChunkCount() < self.chunkSize:
+            raise ValueError('Last chunk is not full')
+
+        self.timeChunks.append(times)
+        self.valueChunks.append(values)
+        self.firstTimes.append(float(times[0]))
+        self.sampleCount += self.chunkSize
+
+    #
+    # Single sample accessors
+    #
+    def getTime(self, i):
+        return self.timeChunks[i // self.chunkSize][i % self.chunkSize]
+
+    def getValue(self, i):
+        return self.valueChunks[i // self.chunkSize][i % self.chunkSize]
+
+    #
+    # Time of the first sample that was not dropped, None if there is none
+    #
+    def firstTime(self):
+        if self.sampleCount == self.getFirstIndex():
+            return None
+        return self.getTime(self.getFirstIndex())
+
+    def lastTime(self):
+        return self.getTime(self.sampleCount - 1)
+
+    def lastValue(self):
+        return self.getValue(self.sampleCount - 1)
+
+    #
+    # Returns the index of the first sample with time >= t (side 'left') or
+    # with time > t (side 'right'), like bisect_left/bisect_right.
+    #
+    # If a hint (a previous result) is given, the result is first searched
+    # by galloping away from it, which is cheaper for small shifts.
+    #
+    def searchTime(self, t, side='left', hint=None):
+        first = self.getFirstIndex()
+        if self.sampleCount == first:
+            return first
+
+        if hint != None:
+            i = self.gallopTime(t, side, hint)
+            if i != None:
+                return i
+
+        if side == 'left':
+            c = bisect.bisect_left(self.firstTimes, t) - 1
+        else:
+            c = bisect.bisect_right(self.firstTimes, t) - 1
+        if c < self.droppedChunks:
+            return first
+
+        chunk = self.timeChunks[c][:self.getChunkCount(c)]
+        return c * self.chunkSize + int(np.searchsorted(chunk, t, side))
+
+    #
+    # Exponential search for searchTime() starting at index 'hint'. Returns
+    # None if the result is more than 2**MAX_GALLOP_STEPS samples away.
+    #
+    def gallopTime(self, t, side, hint):
+        n = self.sampleCount
+        first = self.getFirstIndex()
+        hint = min(max(hint, first), n)
+
+        # The result is the number of samples 'before' t
+        if side == 'left':
+            before = lambda x: x < t
+        else:
+            before = lambda x: x <= t
+
+        step = 1
+        if hint < n and before(self.getTime(hint)):
+            # Result is in (hint, n]
+            lo = hint + 1
+            hi = lo
+            while hi < n and before(self.getTime(hi)):
+                if step > 1 << MAX_GALLOP_STEPS:
+                    return None
+                lo = hi + 1
+                hi += step
+                step *= 2
+            hi = min(hi, n)
+        else:
+            # Result is in [first, hint]
+            hi = hint
+            lo = hi
+            while lo > first and not before(self.getTime(lo-1)):
+                if step > 1 << MAX_GALLOP_STEPS:
+                    return None
+                hi = lo - 1
+                lo -= step
+                step *= 2
+            lo = max(lo, first)
+
+        return lo + int(np.searchsorted(self.getTimes(lo, hi), t, side))
+
+    #
+    # Vectorized searchTime() for a sorted array of times
+    #
+    def searchTimes(self, times, side='left'):
+        times = np.asarray(times, dtype=np.float64)
+        res = np.full(len(times), self.getFirstIndex(), dtype=np.int64)
+        if self.sampleCount == self.getFirstIndex():
+            return res
+
+        chunkIdx = np.searchsorted(np.array(self.firstTimes), times, side) - 1
+
+        # Times are sorted so every chunk is a contiguous range of them.
+        # Times before the first retained chunk keep the first index.
+        bounds = np.searchsorted(chunkIdx, np.arange(len(self.timeChunks) + 1), 'left')
+        for c in range(self.droppedChunks, len(self.timeChunks)):
+            i1 = bounds[c]
+            i2 = bounds[c+1]
+            if i1 < i2:
+                chunk = self.timeChunks[c][:self.getChunkCount(c)]
+                res[i1:i2] = c * self.chunkSize + np.searchsorted(chunk, times[i1:i2], side)
+
+        return res
+
+    def getChunkCount(self, c):
+        if c == len(self.timeChunks) - 1:
+            return self.lastChunkCount()
+        return self.chunkSize
+
+    #
+    # Returns the times/values in the index interval [i1, i2). Intervals
+    # inside a single chunk are returned as views, others are concatenated.
+    #
+    def getTimes(self, i1, i2):
+        return self.getRange(self.timeChunks, i1, i2, np.float64)
+
+    def getValues(self, i1, i2):
+        return self.getRange(self.valueChunks, i1, i2, self.valueType)
+
+    def getRange(self, chunks, i1, i2, dtype):
+        i1 = max(i1, self.getFirstIndex())
+        i2 = min(i2, self.sampleCount)
+        if i1 >= i2:
+            return np.empty(0, dtype=dtype)
+
+        c1 = i1 // self.chunkSize
+        c2 = (i2 - 1) // self.chunkSize
+        if c1 == c2:
+            o = c1 * self.chunkSize
+            return chunks[c1][i1-o:i2-o]
+
+        parts = []
+        for c in range(c1, c2 + 1):
+            o = c * self.chunkSize
+            parts.append(chunks[c][max(i1-o, 0):min(i2-o, self.chunkSize)])
+        return np.concatenate(parts)
+
+    #
+    # Returns the times/values of the samples at an ascending array of
+    # indices, which must not be before getFirstIndex()
+    #
+    def getTimesAt(self, indices):
+        return self.take(self.timeChunks, indices, np.float64)
+
+    def getValuesAt(self, indices):
+        return self.take(self.valueChunks, indices, self.valueType)
+
+    def take(self, chunks, indices, dtype):
+        res = np.empty(len(indices), dtype=dtype)
+        if len(indices) == 0:
+            return res
+
+        chunkIdx = indices // self.chunkSize
+        c1 = int(chunkIdx[0])
+        c2 = int(chunkIdx[-1])
+        bounds = np.searchsorted(chunkIdx, np.arange(c1, c2 + 2), 'left')
+        for c in range(c1, c2 + 1):
+            i1 = bounds[c-c1]
+            i2 = bounds[c-c1+1]
+            if i1 < i2:
+                res[i1:i2] = chunks[c][indices[i1:i2] - c * self.chunkSize]
+        return res
+
+    #
+    # Iterates over (startIndex, times, values) views of the chunks
+    # overlapping the index interval [i1, i2)
+    #
+    def iterChunks(self, i1=0, i2=None):
+        if i2 == None or i2 > self.sampleCount:
+            i2 = self.sampleCount
+        i1 = max(i1, self.getFirstIndex())
+
+        c = i1 // self.chunkSize
+        while c * self.chunkSize < i2:
+            o = c * self.chunkSize
+            a = max(i1 - o, 0)
+            b = min(i2 - o, self.chunkSize)
+            yield o + a, self.timeChunks[c][a:b], self.valueChunks[c][a:b]
+            c += 1
+
+    #
+    # Returns a read-only copy of the store that is not affected by samples
+    # appended later. Only chunk references are copied.
+    #
+    def snapshot(self):
+        s = SampleStore(self.valueType, self.chunkSize)
+        count = self.lastChunkCount() if self.timeChunks else 0
+        s.timeChunks = self.timeChunks[:-1] + [self.timeChunks[-1][:count]] if self.timeChunks else []
+        s.valueChunks = self.valueChunks[:-1] + [self.valueChunks[-1][:count]] if self.valueChunks else []
+        s.firstTimes = list(self.firstTimes)
+        s.sampleCount = self.sampleCount
+        s.droppedChunks = self.droppedChunks
+        s.spilledChunks = self.spilledChunks
+        return s
+
+    #
+    # Writes the full chunks that contain only samples up to time t to the
+    # spill and replaces them with memory mapped views. The last chunk is
+    # always kept in memory.
+    #
+    def spillBefore(self, t):
+        if self.spill == None:
+            return
+
+        c = max(self.spilledChunks, self.droppedChunks)
+        while c < len(self.timeChunks) - 1 and self.firstTimes[c+1] <= t:
+            self.timeChunks[c], self.valueChunks[c] = \
+                self.spill.spillChunk(c, self.timeChunks[c], self.valueChunks[c])
+            c += 1
+            self.spilledChunks = c
+
+    #
+    # Drops the chunks that contain only samples before time t. Returns the
+    # number of bytes freed in memory and on disk. Samples are dropped in
+    # whole chunks, older ones are kept until their chunk can be dropped.
+    #
+    def dropBefore(self, t):
+        size = 0
+        while self.canDropChunk() and self.firstTimes[self.droppedChunks+1] <= t:
+            size += self.dropChunk()
+        return size
+
+    #
+    # Drops the oldest chunk, except the last one. Returns the number of
+    # bytes freed in memory and on disk.
+    #
+    def dropChunk(self):
+        if not self.canDropChunk():
+            return 0
+        c = self.droppedChunks
+
+        size = self.timeChunks[c].nbytes + self.valueChunks[c].nbytes
+        self.timeChunks[c] = None
+        self.valueChunks[c] = None
+        self.droppedChunks += 1
+        self.spilledChunks = max(self.spilledChunks, self.droppedChunks)
+
+        if self.spill != None:
+            self.spill.release(self.droppedChunks)
+        return size
+
+    def canDropChunk(self):
+        return self.droppedChunks < len(self.timeChunks) - 1
+
+    #
+    # Bytes allocated for sample data in memory
+    #
+    def getMemorySize(self):
+        size = 0
+        for c in range(self.spilledChunks, len(self.timeChunks)):
+            size += self.timeChunks[c].nbytes + self.valueChunks[c].nbytes
+        return size
+
+    #
+    # Bytes of the spilled chunks that were not dropped yet
+    #
+    def getSpilledSize(self):
+        size = 0
+        for c in range(self.droppedChunks, self.spilledChunks):
+            size += self.timeChunks[c].nbytes + self.valueChunks[c].nbytes
+        return size
+
+    #
+    # Bytes of all samples that were not dropped, in memory and on disk
+    #
+    def getRetainedSize(self):
+        return self.getMemorySize() + self.getSpilledSize()
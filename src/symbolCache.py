@@ -0,0 +1,145 @@
+
+from __future__ import print_function
+
+import os, hashlib, pickle, logging
+
+import variable
+
+# Changed when the content of the cache files changes, older files are
+# ignored then
+SYMBOL_CACHE_VERSION = 1
+
+
+#
+# Renames 'source' to 'destination', replacing it atomically if it exists.
+# Python 2 has no os.replace(), there it is removed first.
+#
+def replaceFile(source, destination):
+    if hasattr(os, 'replace'):
+        os.replace(source, destination)
+        return
+
+    if os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
+
+
+#
+# Variables of one download file (partition) and the key of the file they
+# were listed from. 'dirty' is set when they differ from the cache file.
+#
+class PartitionSymbols():
+
+    # Download file path and its key, see SymbolCache.getKey()
+    path = None
+    key = None
+
+    # Download file name, None for the default partition
+    partitionName = None
+
+    variables = None
+    dirty = False
+
+    def __init__(self, path, key, partitionName):
+        self.path = path
+        self.key = key
+        self.partitionName = partitionName
+        self.variables = []
+        self.dirty = False
+
+    #
+    # Variables as stored in the cache: name, type name, simple type, True
+    # if the array dimensions are known, the dimensions and the full name
+    # without the partition, which depends on the default partition
+    #
+    def getEntries(self):
+        suffixLength = 0
+        if self.partitionName != None:
+            suffixLength = len(',,' + self.partitionName)
+
+        entries = []
+        for var in self.variables:
+            fullName = var.fullName
+            if suffixLength > 0:
+                fullName = fullName[:-suffixLength]
+            entries.append((var.name, var.fullType, var.simpleType, var.indicesResolved,
+                            var.arrayStartIndices, var.arrayLengthIndices, fullName))
+        return entries
+
+    def setEntries(self, entries):
+        fromSymbolCache = variable.DaqVariable.fromSymbolCache
+        self.variables = [fromSymbolCache(entry[0], self.partitionName, *entry[1:]) 
+                          for entry in entries]
+
+
+#
+# Variables of the download files stored on disk, one file per download
+# file, so they are not listed from winIDEA again when the download file
+# did not change. A cache file is used only if the path, size and
+# modification time of the download file match its key.
+#
+class SymbolCache():
+
+    directory = None
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    #
+    # Returns the key of a download file, or None if it can not be read
+    #
+    def getKey(self, path):
+        try:
+            stat = os.stat(path)
+        except (IOError, OSError):
+            return None
+        return (os.path.normcase(os.path.abspath(path)), stat.st_size, stat.st_mtime)
+
+    def getFileName(self, key):
+        digest = hashlib.sha1(key[0].encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.symbols')
+
+    #
+    # Returns the entries stored for a key, see PartitionSymbols.getEntries(),
+    # or None if there are none or the download file changed
+    #
+    def load(self, key):
+        if not self.directory  or  key == None:
+            return None
+
+        fileName = self.getFileName(key)
+        if not os.path.exists(fileName):
+            return None
+
+        try:
+            with open(fileName, 'rb') as f:
+                version, fileKey, entries = pickle.load(f)
+        except Exception as ex:
+            logging.warning("Failed to read symbol cache file '%s': %s"%(fileName, str(ex)))
+            return None
+
+        if version != SYMBOL_CACHE_VERSION  or  tuple(fileKey) != key:
+            return None
+        return entries
+
+    def store(self, key, entries):
+        if not self.directory  or  key == None:
+            return
+
+        fileName = self.getFileName(key)
+        tmpFileName = fileName + '.tmp'
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+
+            with open(tmpFileName, 'wb') as f:
+                pickle.dump((SYMBOL_CACHE_VERSION, key, entries), f, pickle.HIGHEST_PROTOCOL)
+
+            replaceFile(tmpFileName, fileName)
+        except (IOError, OSError) as ex:
+            logging.warning("Failed to write symbol cache file '%s': %s"%(fileName, str(ex)))
+            try:
+                if os.path.exists(tmpFileName):
+                    os.remove(tmpFileName)
+            except OSError:
+                pass
@@ -0,0 +1,180 @@
+
+from __future__ import print_function
+
+import re, bisect
+
+from PyQt5 import QtCore
+
+# Matches returned by SymbolCatalog.find() if no limit is given
+DEFAULT_MATCH_LIMIT = 50
+
+
+#
+# Shared Qt model of the catalog names. Rows never move: a renamed symbol
+# changes only its own row, so the combo boxes showing the model keep
+# their current item and edit text.
+#
+class SymbolListModel(QtCore.QAbstractListModel):
+
+    catalog = None
+
+    def __init__(self, catalog):
+        QtCore.QAbstractListModel.__init__(self)
+        self.catalog = catalog
+
+    def rowCount(self, parent):
+        if parent.isValid():
+            return 0
+        return len(self.catalog.names)
+
+    def data(self, index, role):
+        if (index.isValid()  and
+            (role == QtCore.Qt.DisplayRole  or  role == QtCore.Qt.EditRole)):
+            return self.catalog.names[index.row()]
+        return None
+
+    def rowChanged(self, row):
+        index = self.index(row, 0)
+        self.dataChanged.emit(index, index)
+
+
+#
+# Symbol names of the download files, built once per variable list and
+# shared by all variable combo boxes: they show the same Qt model and
+# complete with find(). Names are sorted when the catalog is created,
+# names of arrays resolved later are renamed in place, see rename().
+#
+# Names are matched case-insensitively. Prefix matches come from a binary
+# search in the sorted lower-case names. Substring and fuzzy (subsequence)
+# matches are searched in all lower-case names joined into one string,
+# which is a single C-level scan, and mapped back to names by their start
+# offsets. Searches stop when enough matches are found. The search index
+# is rebuilt on the first search after a rename.
+#
+class SymbolCatalog():
+
+    # Names and the row of every name
+    names = None
+    rows = None
+
+    # Search index: lower-case names, lower-case names in lower-case order
+    # and their rows, lower-case names joined by newlines and the offset of
+    # every name. None if it must be rebuilt.
+    lowerNames = None
+    sortedKeys = None
+    sortedIndices = None
+    text = None
+    offsets = None
+
+    model = None
+
+    def __init__(self, names):
+        self.names = sorted(set(names))
+        self.rows = dict((name, row) for row, name in enumerate(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    #
+    # Qt model of the names, created on first use
+    #
+    def getModel(self):
+        if self.model == None:
+            self.model = SymbolListModel(self)
+        return self.model
+
+    #
+    # Gives a name a new one in the same row, e.g. when the dimensions of
+    # an array are known
+    #
+    def rename(self, oldName, newName):
+        row = self.rows.pop(oldName, None)
+        if row == None  or  newName in self.rows:
+            if row != None:
+                self.rows[oldName] = row
+            return
+
+        self.names[row] = newName
+        self.rows[newName] = row
+        self.text = None
+
+        if self.model != None:
+            self.model.rowChanged(row)
+
+    def updateIndex(self):
+        if self.text != None:
+            return
+
+        self.lowerNames = [name.lower() for name in self.names]
+
+        self.sortedIndices = sorted(range(len(self.names)), key=self.lowerNames.__getitem__)
+        self.sortedKeys = [self.lowerNames[i] for i in self.sortedIndices]
+
+        self.offsets = []
+        offset = 0
+        for name in self.lowerNames:
+            self.offsets.append(offset)
+            offset += len(name) + 1
+        self.text = '\n'.join(self.lowerNames)
+
+    #
+    # Returns the index of the name at an offset of 'text'
+    #
+    def getNameIndex(self, offset):
+        return bisect.bisect_right(self.offsets, offset) - 1
+
+    #
+    # Returns up to 'limit' names matching 'query': names starting with it
+    # first, then names containing it, then names containing its characters
+    # in order. Without a query the first names are returned.
+    #
+    def find(self, query, limit=DEFAULT_MATCH_LIMIT):
+        if len(query) == 0:
+            return self.names[:limit]
+
+        self.updateIndex()
+
+        query = query.lower()
+        found = []
+        foundIndices = set()
+
+        def add(idx):
+            if idx not in foundIndices:
+                foundIndices.add(idx)
+                found.append(self.names[idx])
+
+        # Prefix
+        i = bisect.bisect_left(self.sortedKeys, query)
+        while (i < len(self.sortedKeys)  and  len(found) < limit  and
+               self.sortedKeys[i].startswith(query)):
+            add(self.sortedIndices[i])
+            i += 1
+
+        # Substring, continued after the name of every match
+        pos = self.text.find(query)
+        while pos >= 0  and  len(found) < limit:
+            idx = self.getNameIndex(pos)
+            add(idx)
+            if idx + 1 >= len(self.offsets):
+                break
+            pos = self.text.find(query, self.offsets[idx + 1])
+
+        # Subsequence within one name
+        if len(found) < limit  and  len(query) > 1:
+            # a[^\nb]*b[^\nc]*c matches without backtracking
+            pattern = re.escape(query[0])
+            for c in query[1:]:
+                pattern += '[^\n%s]*%s' % (re.escape(c), re.escape(c))
+            pattern = re.compile(pattern)
+            match = pattern.search(self.text)
+            while match != None  and  len(found) < limit:
+                idx = self.getNameIndex(match.start())
+                add(idx)
+                if idx + 1 >= len(self.offsets):
+                    break
+                match = pattern.search(self.text, self.offsets[idx + 1])
+
+        return found
@@ -0,0 +1,238 @@
+
+from __future__ import print_function
+
+import os, shutil, logging, tempfile
+import numpy as np
+
+MIN_INDEX_ALLOCATION = 1 << 10
+
+
+#
+# Global time axis of the data table: the sorted, unique times of the
+# samples of all sample stores, one row per time. For every row and store
+# it keeps the index of the last sample at or before the row time, so the
+# value shown in a table cell is an O(1) array read.
+#
+# New samples are merged in batches. Rows are recomputed from the first
+# new time on, which for samples arriving in time order are only the new
+# rows and the last one. Samples of one variable that arrive after later
+# samples of another variable are still merged in their place.
+#
+# Rows [start, start + size) of the arrays are used, dropping the first
+# rows only moves 'start'.
+#
+class TimeIndex():
+
+    stores = None
+
+    times = None
+    sampleIndices = None
+
+    start = 0
+    size = 0
+
+    def __init__(self, stores):
+        self.stores = stores
+        self.times = np.empty(MIN_INDEX_ALLOCATION, dtype=np.float64)
+        self.sampleIndices = np.empty((MIN_INDEX_ALLOCATION, len(stores)), dtype=np.int64)
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row):
+        return float(self.times[self.start + row])
+
+    #
+    # Row times as a read-only view
+    #
+    def getTimes(self):
+        times = self.times[self.start:self.start + self.size]
+        times.flags.writeable = False
+        return times
+
+    def lastTime(self):
+        return self.times[self.start + self.size - 1]
+
+    #
+    # First row with a time >= t ('left') or > t ('right')
+    #
+    def searchTime(self, t, side='left'):
+        return int(np.searchsorted(self.times[self.start:self.start + self.size], t, side))
+
+    #
+    # Index of the sample of store 'storeIdx' shown in a row: the last one
+    # at or before the row time. Rows before the first sample show it,
+    # unless samples were dropped. Returns -1 if there is none.
+    #
+    def getSampleIndex(self, row, storeIdx):
+        i = self.sampleIndices[self.start + row, storeIdx]
+        firstIndex = self.stores[storeIdx].getFirstIndex()
+
+        if i < firstIndex:
+            if firstIndex == 0 and len(self.stores[storeIdx]) > 0:
+                return 0
+            return -1
+        return int(i)
+
+    #
+    # True if store 'storeIdx' has a sample at the row time
+    #
+    def isRealValue(self, row, storeIdx):
+        i = self.sampleIndices[self.start + row, storeIdx]
+        if i < self.stores[storeIdx].getFirstIndex():
+            return False
+        return self.stores[storeIdx].getTime(i) == self.times[self.start + row]
+
+    def reserve(self, required):
+        capacity = len(self.times)
+        if self.start + required <= capacity:
+            return
+
+        # Reuse the space of the dropped rows if that leaves enough room
+        if required > capacity // 2:
+            capacity *= 2
+            while capacity < required:
+                capacity *= 2
+
+        end = self.start + self.size
+        times = np.empty(capacity, dtype=np.float64)
+        times[:self.size] = self.times[self.start:end]
+        sampleIndices = np.empty((capacity, self.sampleIndices.shape[1]), dtype=np.int64)
+        sampleIndices[:self.size] = self.sampleIndices[self.start:end]
+
+        self.times = times
+        self.sampleIndices = sampleIndices
+        self.start = 0
+
+    #
+    # Returns the first changed row and the new times from it on after
+    # merging the sample times 'times' (any order, duplicates allowed)
+    #
+    def getMergedTimes(self, times):
+        times = np.unique(times)
+        rows = self.times[self.start:self.start + self.size]
+
+        r0 = int(np.searchsorted(rows, times[0], 'left'))
+        if r0 == self.size:
+            return r0, times
+        return r0, np.union1d(rows[r0:], times)
+
+    #
+    # Replaces the rows from r0 on with the given times and maps them to
+    # the samples of the stores
+    #
+    def replaceTail(self, r0, times):
+        n = r0 + len(times)
+        self.reserve(n)
+
+        i1 = self.start + r0
+        i2 = self.start + n
+        self.times[i1:i2] = times
+        for storeIdx, store in enumerate(self.stores):
+            self.sampleIndices[i1:i2, storeIdx] = store.searchTimes(times, 'right') - 1
+
+        self.size = n
+
+    #
+    # Merges the times of new samples, which must already be in the
+    # stores. Returns the first changed row, or None if nothing changed.
+    #
+    def merge(self, times):
+        if len(times) == 0:
+            return None
+
+        r0, times = self.getMergedTimes(times)
+        self.replaceTail(r0, times)
+        return r0
+
+    #
+    # Removes the first k rows, the following ones move up
+    #
+    def dropFirstRows(self, k):
+        k = min(k, self.size)
+        self.start += k
+        self.size -= k
+
+    #
+    # Bytes allocated for the rows
+    #
+    def getMemorySize(self):
+        return self.times.nbytes + self.sampleIndices.nbytes
+
+    #
+    # Releases the rows, the index must not be used afterwards
+    #
+    def close(self):
+        pass
+
+
+#
+# TimeIndex of stores that do not change any more, e.g. the ones of a
+# capture file. The rows are written block by block to files in a new
+# subdirectory of 'directory' and used through read-only memory maps of
+# them, so like the samples they are not kept in memory. 'rowTimeBlocks'
+# are blocks of row times, each one sorted, unique and after the previous
+# ones, see exporters.iterMergedBlocks().
+#
+# No times can be merged. close() removes the files.
+#
+class MappedTimeIndex(TimeIndex):
+
+    directory = None
+
+    def __init__(self, stores, rowTimeBlocks, directory):
+        TimeIndex.__init__(self, stores)
+
+        self.directory = tempfile.mkdtemp(prefix='daqIDEA-index-', dir=directory)
+        timesFileName = os.path.join(self.directory, 'times')
+        indicesFileName = os.path.join(self.directory, 'indices')
+
+        try:
+            with open(timesFileName, 'wb') as timesFile, open(indicesFileName, 'wb') as indicesFile:
+                for rowTimes in rowTimeBlocks:
+                    sampleIndices = np.empty((len(rowTimes), len(stores)), dtype=np.int64)
+                    for storeIdx, store in enumerate(stores):
+                        sampleIndices[:, storeIdx] = store.searchTimes(rowTimes, 'right') - 1
+
+                    timesFile.write(np.asarray(rowTimes, dtype=np.float64).tobytes())
+                    indicesFile.write(sampleIndices.tobytes())
+                    self.size += len(rowTimes)
+
+            # An empty file can not be mapped, the allocated rows are kept
+            if self.size > 0:
+                self.times = np.memmap(timesFileName, dtype=np.float64, mode='r')
+                self.sampleIndices = np.memmap(indicesFileName, dtype=np.int64, mode='r',
+                                               shape=(self.size, len(stores)))
+        except:
+            self.close()
+            raise
+
+    def reserve(self, required):
+        raise ValueError('capture time index is read-only')
+
+    #
+    # Memory maps take no allocated memory
+    #
+    def getMemorySize(self):
+        return 0
+
+    #
+    # Unmaps and removes the files. Returns False if they are still in use,
+    # e.g. by a view of the times on Windows.
+    #
+    def close(self):
+        self.times = None
+        self.sampleIndices = None
+        self.size = 0
+
+        if self.directory == None:
+            return True
+        try:
+            shutil.rmtree(self.directory)
+        except OSError:
+            logging.warning("Can't remove time index directory '%s'"%(self.directory))
+            return False
+        self.directory = None
+        return True
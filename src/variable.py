@@ -9,6 +9,11 @@ TYPE_STRUCT = 2
 TYPE_IO = 3
 TYPE_MEM_ADDR = 4
 
+# Formatters of the variable types
+typeFormatters = { TYPE_INT: globals.formatInteger,
+                   TYPE_FLOAT: globals.formatFloat,
+                   TYPE_STRUCT: globals.formatAll }
+
 class DaqVariable:
     # myInteger
     name = None
@@ -24,6 +29,10 @@ class DaqVariable:
     arrayStartIndices = None
     arrayLengthIndices = None
     
+    # False for an array created without a data controller, until its 
+    # dimensions are set with setIndices()
+    indicesResolved = True
+    
     # 1..8
     portBit = None
     # digital/analogue
@@ -62,6 +71,10 @@ class DaqVariable:
         c.fullType = '`' + '[' + str(c.portBit) + ']'
         return c
 
+    #
+    # Without a data controller (None) the dimensions of arrays are not 
+    # looked up, they are set later with setIndices()
+    #
     @classmethod
     def fromVariable(cls, name, partitionName, type, dataCtrl):
         c = cls()
@@ -84,16 +97,58 @@ class DaqVariable:
             c.simpleType = TYPE_STRUCT
             c.formatters = globals.formatAll
             
-        c.arrayStartIndices, c.arrayLengthIndices, c.fullName = c.extractIndices(type, name, dataCtrl)
-        
-        if (c.partitionName != None):
-            c.fullName += ',,' + partitionName
+        if (dataCtrl != None):
+            c.setIndices(*c.extractIndices(type, name, dataCtrl))
+        else:
+            c.indicesResolved = not cls.isArrayType(type)
+            c.setIndices(None, None, name)
 
         return c
+    
+    #
+    # Creates a variable from the values fromVariable() found, as stored in 
+    # the symbol cache. 'fullName' is without the partition.
+    #
+    @classmethod
+    def fromSymbolCache(cls, name, partitionName, type, simpleType, indicesResolved,
+                        indicesFirst, indicesLength, fullName):
+        c = cls()
+        c.name = name
+        c.partitionName = partitionName
+        c.fullType = type
+        c.simpleType = simpleType
+        c.formatters = typeFormatters[simpleType]
+        c.indicesResolved = indicesResolved
+        c.setIndices(indicesFirst, indicesLength, fullName)
+        return c
+    
+    @classmethod
+    def isArrayType(cls, t):
+        return '[' in t and ']' in t
+    
+    #
+    # Sets the array dimensions and the full name returned by 
+    # extractIndices()
+    #
+    def setIndices(self, indicesFirst, indicesLength, fullName):
+        self.arrayStartIndices = indicesFirst
+        self.arrayLengthIndices = indicesLength
+        self.fullName = fullName
+        
+        if (self.partitionName != None):
+            self.fullName += ',,' + self.partitionName
+        
+        if (indicesFirst != None):
+            self.indicesResolved = True
 
+    #
+    # Returns the first index and the length of every array dimension and
+    # the name with the dimensions, e.g. myTable[4]. Makes one expression 
+    # lookup in winIDEA per dimension.
+    #
     @classmethod
     def extractIndices(cls, t, name, dataCtrl):
-        if ('[' in t and ']' in t):
+        if (cls.isArrayType(t)):
             returnName = name
             
             indicesFirst = []
@@ -113,11 +168,11 @@ class DaqVariable:
                                                expr.ArrayFirstElement(), 
                                                expr.ArrayFirstElement() + expr.ArrayDimension() - 1)
 
-                self.dataCtrl.release(exprType)
+                dataCtrl.release(exprType)
                 exprType = dataCtrl.getExpressionType(0, name)
                 expr = exprType.Expression()
 
-            self.dataCtrl.release(exprType)
+            dataCtrl.release(exprType)
             return indicesFirst, indicesLength, returnName
         else:
             return None, None, name
@@ -3,7 +3,7 @@ from __future__ import print_function
 
 import xml.dom.minidom
 import codecs
-import isystem.connect as ic
+from iconnect import ic
 import globals
 import os
 import io
@@ -25,7 +25,7 @@ XML_DATA_FORMAT = 'format'
 XML_CHART_COLOR = 'color'
 
 
-userDir = os.getenv('USERPROFILE')
+userDir = os.getenv('USERPROFILE', os.path.expanduser('~'))
 iSystemDir = userDir + r'\iSYSTEM'
 daqIdeaDir = iSystemDir + r'\daqIDEA'
 daqIdeaXmlFile = daqIdeaDir + r'\daqIDEA.daq'
@@ -6,7 +6,21 @@ from PyQt5 import QtCore, QtGui, QtWidgets
 
 from math import *
 
+import time, bisect
+import numpy as np
+
 import globals, daqIO, variable
+from pipelineStats import stats
+
+# Maximum number of formatted cells cached per table column
+TABLE_CELL_CACHE_SIZE = 1 << 14
+
+# Matches of the variable name completer and how many are visible
+VARIABLE_COMPLETER_MATCHES = 50
+VARIABLE_COMPLETER_VISIBLE_ITEMS = 20
+
+# Width of the variable name combo box in characters
+VARIABLE_COMBO_CONTENTS_LENGTH = 20
 
 class DaqItemDelegate(QtWidgets.QStyledItemDelegate):
     
@@ -35,11 +49,7 @@ class DaqItemDelegate(QtWidgets.QStyledItemDelegate):
         if index.column() == 0:
             color = QtGui.QColor(0, 0, 0, 255)
         else:
-            varIdx = self.dataModel.enabledVars[index.column()-1]
-            var = self.parent.daqIdeaConfig.variableConfigs[varIdx]
-            daqIdx = var.daqConfigIndex
-            
-            realValue = self.parent.daqManager.isRealValue(index.row(), daqIdx)
+            realValue = self.dataModel.isRealValue(index.row(), index.column())
         
             if realValue:
                 color = QtGui.QColor(0, 0, 0, 255)
@@ -63,13 +73,138 @@ class DaqItemDelegate(QtWidgets.QStyledItemDelegate):
         else:
             return QtWidgets.QStyledItemDelegate.paint(self, painter, option, index)
     
+
+#
+# Cached state of one variable column of DaqTableModel. The formatter is 
+# resolved once per configuration (None if the variable is unknown). The 
+# sample shown in a row is looked up in the timeIndex.TimeIndex of the 
+# rows. Formatted strings of recently shown cells are kept in 'cells', 
+# their rows also in the sorted list 'cellRows', so the cells of replaced
+# rows are found without scanning the cache. Rows whose sample was dropped
+# from the store show no value.
+#
+class DaqTableColumn():
+    
+    daqIdx = -1
+    formatter = None
+    
+    store = None
+    timeIndex = None
+    
+    # First retained sample index of the store the cells were formatted with
+    firstIndex = 0
+    
+    cells = None
+    cellRows = None
+    
+    def __init__(self, daqIdx, formatter, store, timeIndex):
+        self.daqIdx = daqIdx
+        self.formatter = formatter
+        self.store = store
+        self.timeIndex = timeIndex
+        
+        self.firstIndex = store.getFirstIndex()
+        self.cells = dict()
+        self.cellRows = []
+        
+    #
+    # Clears the formatted cells if samples were dropped from the store, 
+    # they may show one of them
+    #
+    def update(self):
+        firstIndex = self.store.getFirstIndex()
+        if (firstIndex != self.firstIndex):
+            self.clearCells()
+            self.firstIndex = firstIndex
+    
+    #
+    # Clears all formatted cells
+    #
+    def clearCells(self):
+        self.cells.clear()
+        self.cellRows = []
+    
+    #
+    # Clears the formatted cells from row r0 on, the rows were replaced.
+    # Only the cleared cells are visited, usually the last row.
+    #
+    def invalidateRows(self, r0):
+        i = bisect.bisect_left(self.cellRows, r0)
+        for r in self.cellRows[i:]:
+            del self.cells[r]
+        del self.cellRows[i:]
+    
+    #
+    # Removes the first k rows, the following ones move up
+    #
+    def dropFirstRows(self, k):
+        i = bisect.bisect_left(self.cellRows, k)
+        self.cellRows = [r - k for r in self.cellRows[i:]]
+        self.cells = dict((r - k, text) for r, text in self.cells.items() if r >= k)
+        
+    def isRealValue(self, row):
+        return self.timeIndex.isRealValue(row, self.daqIdx)
+    
+    def getValue(self, row):
+        i = self.timeIndex.getSampleIndex(row, self.daqIdx)
+        if (i < 0):
+            return None
+        return self.store.getValue(i)
+    
+    #
+    # Formatted value of a row. Without dataModelFull only rows with a 
+    # sample of the variable have a value.
+    #
+    def getText(self, row, dataModelFull):
+        if (self.formatter == None):
+            return 'N/A'
+            
+        if (not dataModelFull) and (not self.isRealValue(row)):
+            return ''
+        
+        value = self.getValue(row)
+        if (value == None):
+            return ''
+        
+        return self.formatter.format(value)
+    
+    def getCell(self, row):
+        return self.cells.get(row)
     
+    def setCell(self, row, text):
+        if (len(self.cells) >= TABLE_CELL_CACHE_SIZE):
+            self.clearCells()
+        if row not in self.cells:
+            bisect.insort(self.cellRows, row)
+        self.cells[row] = text
+
+
 class DaqTableModel(QtCore.QAbstractTableModel):
     
     parent = None
     enabledVars = []
     dataModelFull = True
     strTimeUnit = None
+    
+    # DaqTableColumn of every enabled variable (None if it is not sampled),
+    # created for the sample data they were made for
+    columns = None
+    columnsData = None
+    
+    # Rows the views know of. The rows merged into the time index are 
+    # published by publishRows() once per frame, so the views get one 
+    # insert per frame instead of one per ingest. Table row r is row
+    # rowOffset + r of the time index. Index rows from 'firstChangedRow' on
+    # were replaced since the last publish, the published ones are 
+    # signalled with dataChanged.
+    publishedRows = 0
+    rowOffset = 0
+    firstChangedRow = 0
+    
+    # Rows shown while the acquisition is running, see 
+    # globals.TABLE_WINDOW_ALL
+    windowMode = globals.TABLE_WINDOW_ALL
+    windowRows = globals.TABLE_WINDOW_ROW_COUNT
 
     def __init__(self, parent, daqCfg, *args):
         QtCore.QAbstractTableModel.__init__(self, parent, *args)
@@ -79,7 +214,7 @@ class DaqTableModel(QtCore.QAbstractTableModel):
         return self.getRowCount() 
     
     def getRowCount(self):
-        return len(self.parent.daqManager.allTimePoints)
+        return self.publishedRows
     
     def columnCount(self, parent):
         return self.getColumnCount()
@@ -95,39 +230,202 @@ class DaqTableModel(QtCore.QAbstractTableModel):
             r = index.row()
             c = index.column()
 
-            return self.getData(r, c)
+            if (c == 0):
+                return self.getData(r, c)
+            
+            # Cached formatted value, by time index row
+            column = self.getColumn(c)
+            if (column == None):
+                return self.getData(r, c)
+            
+            text = column.getCell(self.rowOffset + r)
+            if (text == None):
+                text = self.getData(r, c)
+                column.setCell(self.rowOffset + r, text)
+            return text
         else:
             return None
+    
+    #
+    # Creates the columns of the enabled variables. Variable types are
+    # looked up only here.
+    #
+    def createColumns(self):
+        daq = self.parent.daqManager
+        
+        self.columns = []
+        self.columnsData = daq.sampleData
+        
+        for varIdx in self.enabledVars:
+            var = self.parent.daqIdeaConfig.variableConfigs[varIdx]
+            daqIdx = var.daqConfigIndex
+            
+            if (daqIdx < 0  or  daq.sampleData == None):
+                self.columns.append(None)
+                continue
+            
+            # Samples of variables unknown to the application come from a
+            # capture file, the format was valid when it was recorded
+            varType = daq.getVariableByName(var.name)
+            if (varType != None  and  
+                varType.simpleType == variable.TYPE_IO  and  
+                varType.portType == daqIO.HIL_AIN):
+                formater = '{0:f}'
+            else:
+                formater = globals.formatterStrings[var.format]
+            
+            self.columns.append(DaqTableColumn(daqIdx, formater, 
+                                               daq.sampleData[daqIdx], 
+                                               daq.timeIndex))
+    
+    #
+    # Returns the up to date DaqTableColumn of table column c > 0
+    #
+    def getColumn(self, c):
+        if (self.columns == None  or  
+            self.columnsData is not self.parent.daqManager.sampleData):
+            self.createColumns()
+        
+        column = self.columns[c-1]
+        if column != None:
+            column.update()
+        return column
+    
+    def resetColumns(self):
+        self.columns = None
+        self.columnsData = None
+    
+    #
+    # Called by the DaqManager after the rows from r0 on were replaced. The
+    # views are told by the next publishRows().
+    #
+    def invalidateRows(self, r0):
+        self.firstChangedRow = min(self.firstChangedRow, r0)
+        
+        if (self.columns == None):
+            return
+        
+        for column in self.columns:
+            if column != None:
+                column.invalidateRows(r0)
+    
+    #
+    # Called by the DaqManager before and after the first k time points 
+    # were removed. Only the published ones are removed from the views.
+    #
+    def beginDropFirstRows(self, k):
+        k = self.getDroppedRows(k)
+        if (k > 0):
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, k-1)
+    
+    def endDropFirstRows(self, k):
+        published = self.getDroppedRows(k)
+        self.publishedRows -= published
+        self.rowOffset = max(self.rowOffset - k, 0)
+        self.firstChangedRow = max(self.firstChangedRow - k, 0)
+        
+        if (self.columns != None):
+            for column in self.columns:
+                if column != None:
+                    column.dropFirstRows(k)
+        
+        if (published > 0):
+            self.endRemoveRows()
+    
+    #
+    # Published rows among the first k time index rows
+    #
+    def getDroppedRows(self, k):
+        return min(max(k - self.rowOffset, 0), self.publishedRows)
+    
+    def setWindowMode(self, mode, rows):
+        self.windowMode = mode
+        self.windowRows = rows
+    
+    #
+    # True if the table shows only the last rows of a running acquisition
+    #
+    def isWindowed(self):
+        return (self.windowMode != globals.TABLE_WINDOW_ALL  and  
+                self.parent.canvasGraph.isAnimationRunning())
+    
+    #
+    # First time index row to show
+    #
+    def getWindowStart(self):
+        timeIndex = self.parent.daqManager.timeIndex
+        if (not self.isWindowed()  or  len(timeIndex) == 0):
+            return 0
+        
+        if (self.windowMode == globals.TABLE_WINDOW_LAST_ROWS):
+            return max(len(timeIndex) - self.windowRows, 0)
+        
+        interval = self.parent.daqIdeaConfig.animationTimeInterval
+        return timeIndex.searchTime(timeIndex.lastTime() - interval)
+    
+    #
+    # Tells the views about the rows merged since the last call and moves
+    # the window: one remove or insert at the top, one dataChanged for the
+    # replaced published rows and one insert for the new ones. A running
+    # windowed table is bounded by the window, however many rows there are.
+    #
+    def publishRows(self):
+        start = time.time()
+        rowCount = len(self.parent.daqManager.timeIndex)
+        windowStart = self.getWindowStart()
+        
+        if (windowStart > self.rowOffset):
+            k = min(windowStart - self.rowOffset, self.publishedRows)
+            if (k > 0):
+                self.beginRemoveRows(QtCore.QModelIndex(), 0, k-1)
+                self.rowOffset += k
+                self.publishedRows -= k
+                self.endRemoveRows()
+            # Rows that were never published are skipped
+            if (self.publishedRows == 0):
+                self.rowOffset = windowStart
+        elif (windowStart < self.rowOffset):
+            k = self.rowOffset - windowStart
+            self.beginInsertRows(QtCore.QModelIndex(), 0, k-1)
+            self.rowOffset = windowStart
+            self.publishedRows += k
+            self.endInsertRows()
+        
+        publishedEnd = self.rowOffset + self.publishedRows
+        if (self.publishedRows > 0  and  self.firstChangedRow < publishedEnd):
+            r0 = max(self.firstChangedRow - self.rowOffset, 0)
+            self.dataChanged.emit(self.index(r0, 0),
+                                  self.index(self.publishedRows-1, self.getColumnCount()-1))
+        
+        if (rowCount > publishedEnd):
+            self.beginInsertRows(QtCore.QModelIndex(), self.publishedRows, rowCount - self.rowOffset - 1)
+            self.publishedRows = rowCount - self.rowOffset
+            self.endInsertRows()
+        
+        self.firstChangedRow = rowCount
+        
+        stats.add('table.publish.time', time.time() - start, 's')
+    
+    #
+    # The rows of the window are published with the reset
+    #
+    def endResetModel(self):
+        self.rowOffset = self.getWindowStart()
+        self.publishedRows = len(self.parent.daqManager.timeIndex) - self.rowOffset
+        self.firstChangedRow = len(self.parent.daqManager.timeIndex)
+        QtCore.QAbstractTableModel.endResetModel(self)
                 
     def getData(self, r, c):
         if (c == 0):
-            return self.parent.daqManager.allTimePoints[r]
+            return self.parent.daqManager.timeIndex[self.rowOffset + r]
         else:
-            varIdx = self.enabledVars[c-1]
-            var = self.parent.daqIdeaConfig.variableConfigs[varIdx]
-            daqIdx = var.daqConfigIndex
+            column = self.getColumn(c)
             
-            if (daqIdx >= 0):
-                daq = self.parent.daqManager
-                
-                varType = self.parent.daqManager.getVariableByName(var.name)
-                if varType == None:
-                    return 'N/A'
-                
-                if (not self.dataModelFull) and (not daq.isRealValue(r, daqIdx)):
-                    return ''
-                
-                if (varType != None  and  
-                    varType.simpleType == variable.TYPE_IO  and  
-                    varType.portType == daqIO.HIL_AIN):
-                    
-                    formater = '{0:f}'
-                    return formater.format(daq.getEstimatedValue(r, daqIdx))
-                else:
-                    formater = globals.formatterStrings[var.format]
-                    return formater.format(daq.getEstimatedValue(r, daqIdx))
-            else:
+            if (column == None):
                 return 'N/A'
+                
+            return column.getText(self.rowOffset + r, self.dataModelFull)
+    
     
     
     def headerData(self, idx, orientation, role):
@@ -153,23 +451,22 @@ class DaqTableModel(QtCore.QAbstractTableModel):
             return self.parent.daqIdeaConfig.variableConfigs[varIdx].name
         
     def getVerticalHeaderName(self, row):
-        return row + 1
+        return self.rowOffset + row + 1
     
     def isRealValue(self, row, column):
         if (column == 0):
             return True
         else:
-            varIdx = self.enabledVars[column-1]
-            var = self.parent.daqIdeaConfig.variableConfigs[varIdx]
-            daqIdx = var.daqConfigIndex
+            col = self.getColumn(column)
             
-            if (daqIdx >= 0):
-                return self.parent.daqManager.isRealValue(row, daqIdx)
+            if (col != None):
+                return col.isRealValue(self.rowOffset + row)
             else:
                 return 'N/A'
 
     def setDataModelEstimation(self, full):
         self.dataModelFull = full
+        self.resetColumns()
 
     # If the DAQ was reconfigured then we should call this
     def updateDataModel(self):
@@ -181,29 +478,173 @@ class DaqTableModel(QtCore.QAbstractTableModel):
                 
         self.beginResetModel()
         self.enabledVars = newVars
+        self.resetColumns()
         self.endResetModel()
                 
         self.updateFormatting()
 
         
+    #
+    # The cells of the variable columns are formatted again, the views 
+    # only repaint the visible ones
+    #
     def updateFormatting(self):
-        rc = len(self.parent.daqManager.allTimePoints)
+        self.resetColumns()
         
-        if (rc > 0):            
-            for rowIdx, varConfig in enumerate(self.parent.daqIdeaConfig.variableConfigs):
-                self.beginRemoveRows(QtCore.QModelIndex(), 0, rc-1)
-                self.endRemoveRows()
+        if (self.publishedRows > 0  and  self.getColumnCount() > 1):
+            self.dataChanged.emit(self.index(0, 1),
+                                  self.index(self.publishedRows-1, self.getColumnCount()-1))
 
-                self.beginInsertRows(QtCore.QModelIndex(), 0, rc-1);
-                self.endInsertRows()
-                    
 
+#
+# Data table view that measures its repaint time for the statistics. While
+# a windowed table is at its end, it follows the new rows.
+#
+class DaqTableView(QtWidgets.QTableView):
+    
+    followTail = False
+    
+    def setModel(self, model):
+        QtWidgets.QTableView.setModel(self, model)
+        model.rowsAboutToBeInserted.connect(self.checkFollowTail)
+        model.rowsInserted.connect(self.scrollToTail)
+    
+    #
+    # The scroll bar range is updated later, the header knows if the last 
+    # row is visible
+    #
+    def checkFollowTail(self, parent, first, last):
+        lastVisible = self.rowAt(self.viewport().height() - 1)
+        self.followTail = (self.model().isWindowed()  and  
+                           (lastVisible < 0  or  lastVisible >= first - 1))
+    
+    def scrollToTail(self, parent, first, last):
+        if (self.followTail):
+            self.scrollToBottom()
+        self.followTail = False
+
+    def paintEvent(self, event):
+        start = time.time()
+        QtWidgets.QTableView.paintEvent(self, event)
+        stats.add('table.paint.time', time.time() - start, 's')
+
+
+#
+# Returns a statistics value as text, times in ms and bytes in MB
+#
+def formatStatValue(value, unit):
+    if value == None:
+        return ''
+    if unit == 's':
+        return '%.2f ms' % (value * 1000)
+    if unit == 'B':
+        return '%.1f MB' % (value / float(1 << 20))
+    if value == int(value):
+        text = '%d' % value
+    else:
+        text = '%.1f' % value
+    if unit:
+        text += ' ' + unit
+    return text
+
+
+#
+# Shows the pipeline statistics, refreshed every second, and exports them
+# to a JSON file
+#
+class DiagnosticsDialog(QtWidgets.QDialog):
+
+    COLUMNS = ['Metric', 'Count', 'Rate [1/s]', 'Last', 'Mean', 'p95', 'Max']
+
+    table = None
+    refreshTimer = None
+
+    def __init__(self, parent):
+        QtWidgets.QDialog.__init__(self, parent)
+        self.setWindowTitle('Diagnostics')
+        self.resize(760, 480)
+
+        layout = QtWidgets.QVBoxLayout(self)
+
+        self.table = QtWidgets.QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QtWidgets.QHBoxLayout()
+        resetButton = QtWidgets.QPushButton('Reset')
+        resetButton.clicked.connect(self.resetStats)
+        buttons.addWidget(resetButton)
+        exportButton = QtWidgets.QPushButton('Export JSON...')
+        exportButton.clicked.connect(self.exportStats)
+        buttons.addWidget(exportButton)
+        buttons.addStretch()
+        closeButton = QtWidgets.QPushButton('Close')
+        closeButton.clicked.connect(self.close)
+        buttons.addWidget(closeButton)
+        layout.addLayout(buttons)
+
+        self.refreshTimer = QtCore.QTimer(self)
+        self.refreshTimer.timeout.connect(self.refresh)
+        self.refreshTimer.start(globals.STATS_REFRESH_INTERVAL_MS)
+
+        self.refresh()
+
+    def refresh(self):
+        rows = []
+
+        for name, counter in sorted(stats.counters.items()):
+            rows.append([name, formatStatValue(counter.total, counter.unit),
+                         '%.1f' % counter.rate, '', '', '', ''])
+
+        for name, h in sorted(stats.histograms.items()):
+            rows.append([name, '%d' % h.count, '',
+                         formatStatValue(h.last, h.unit),
+                         formatStatValue(h.getMean(), h.unit),
+                         formatStatValue(h.getPercentile(95), h.unit),
+                         formatStatValue(h.max, h.unit)])
+
+        for name, (value, unit) in sorted(stats.gauges.items()):
+            rows.append([name, '', '', formatStatValue(value, unit), '', '', ''])
+
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, text in enumerate(row):
+                self.table.setItem(r, c, QtWidgets.QTableWidgetItem(text))
+        self.table.resizeColumnsToContents()
+
+    def resetStats(self):
+        stats.reset()
+        self.refresh()
+
+    def exportStats(self):
+        fileName, fileType = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Export statistics', 'daqIDEA-stats.json', 'JSON files (*.json)')
+        if not fileName:
+            return
+
+        try:
+            stats.saveJson(fileName)
+        except (IOError, OSError) as ex:
+            QtWidgets.QMessageBox.critical(self, 'Error!', "Failed to write '%s': %s" % (fileName, str(ex)))
+
+    def closeEvent(self, event):
+        self.refreshTimer.stop()
+        QtWidgets.QDialog.closeEvent(self, event)
+
+
+#
+# Variable name combo box of a variable table row. The items are the shared
+# model of the symbolCatalog.SymbolCatalog, the completer shows the best 
+# catalog matches of the typed text.
+#
 class VariableChooserCombo(QtWidgets.QComboBox):
     
     parent = None
-    variables = []
-    allFullNames = None
+    catalog = None
     completer = None
+    completerModel = None
     lastText = None
     
     selectedVariable = None
@@ -219,27 +660,27 @@ class VariableChooserCombo(QtWidgets.QComboBox):
         self.variableConfig = varCfg
         self.itemsSet = False
     
-    def setVariables(self, vars):
-        self.variables = vars
-        self.allFullNames = []
-        
-        for var in self.variables:
-            self.allFullNames.append(var.fullName)
+    def setCatalog(self, catalog):
+        self.catalog = catalog
         
-        self.allFullNames = sorted(self.allFullNames)
-            
-        self.clear()
-        self.addItems(self.allFullNames)
+        # The width does not depend on the names, measuring all of them 
+        # takes long. Typed names must not be added to the shared model.
+        self.setSizeAdjustPolicy(QtWidgets.QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        self.setMinimumContentsLength(VARIABLE_COMBO_CONTENTS_LENGTH)
         self.setEditable(True)
+        self.setInsertPolicy(QtWidgets.QComboBox.NoInsert)
         
-        self.completer = QtWidgets.QCompleter(self.allFullNames, self.parent)
-        self.completer.setCaseSensitivity(QtCore.Qt.CaseSensitive)
-        self.completer.setModelSorting(QtWidgets.QCompleter.CaseSensitivelySortedModel)
-        self.completer.setCompletionMode(QtWidgets.QCompleter.PopupCompletion)
-        
-        self.completer.setMaxVisibleItems(20)
+        self.completerModel = QtCore.QStringListModel(self)
+        self.completer = QtWidgets.QCompleter(self.completerModel, self)
+        self.completer.setCompletionMode(QtWidgets.QCompleter.UnfilteredPopupCompletion)
+        self.completer.setMaxVisibleItems(VARIABLE_COMPLETER_VISIBLE_ITEMS)
         
         self.setCompleter(self.completer)
+        self.lineEdit().textEdited.connect(self.updateCompletions)
+        
+        # Set last, so the completer of the combo box is never built for it
+        self.setModel(catalog.getModel())
+        self.view().setUniformItemSizes(True)
 
         
         # variables with complexity of *name[3][4]        
@@ -264,6 +705,9 @@ class VariableChooserCombo(QtWidgets.QComboBox):
             
             self.parent.setVariableValidityStatus('black', 'Please select variable name for each row inside of variable table!')
         else:
+            # The current item is the configured one or none, renamed 
+            # catalog items change the text of the combo boxes showing them
+            self.setCurrentIndex(catalog.rows.get(self.variableConfig.name, -1))
             self.setEditText(self.variableConfig.name)
         
     
@@ -303,6 +747,24 @@ class VariableChooserCombo(QtWidgets.QComboBox):
         return True
     
     
+    #
+    # Shows the catalog matches of the typed text
+    #
+    def updateCompletions(self, text):
+        # Typed text is no longer the current item
+        if (self.currentIndex() >= 0):
+            cursor = self.lineEdit().cursorPosition()
+            self.setCurrentIndex(-1)
+            self.setEditText(text)
+            self.lineEdit().setCursorPosition(cursor)
+        
+        if (len(text) == 0):
+            self.completer.popup().hide()
+            return
+        
+        self.completerModel.setStringList(self.catalog.find(text, VARIABLE_COMPLETER_MATCHES))
+        self.completer.complete()
+    
     def removing(self):
         self.comboDeleted = True
 
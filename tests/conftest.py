@@ -0,0 +1,90 @@
+
+from __future__ import print_function
+
+#
+# The tests run the modules of src/ and benchmarks/ headless on the 
+# fakeConnect controllers, without winIDEA and isystem.connect:
+#
+#   python -m pytest tests
+#
+
+import os, sys, tempfile
+
+os.environ['DAQIDEA_FAKE_CONNECT'] = '1'
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# Logging and properties of the application go to the winIDEA application
+# data directory of a temporary APPDATA
+appData = tempfile.mkdtemp(prefix='daqIDEA-tests-')
+os.environ['APPDATA'] = appData
+os.environ.setdefault('USERPROFILE', appData)
+os.makedirs(os.path.join(appData, 'ASYST', 'winIDEA'))
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import matplotlib
+matplotlib.use('Agg')
+
+import pytest
+
+import globals
+globals.symbolCacheDirectory = None
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PyQt5 import QtWidgets
+    app = QtWidgets.QApplication.instance()
+    if app == None:
+        app = QtWidgets.QApplication(['daqIDEA-tests'])
+    return app
+
+
+#
+# Returns a function creating DaqManagers on a fakeDaq.FakeTarget of the
+# given signals, which are stopped after the test
+#
+@pytest.fixture
+def createManager():
+    import fakeDaq, fakeConnect, daqManager
+    managers = []
+
+    def create(signals, **targetArgs):
+        target = fakeDaq.FakeTarget(signals, **targetArgs)
+        dm = daqManager.DaqManager(fakeConnect.ConnectionMgr(target))
+        managers.append(dm)
+        return dm
+
+    yield create
+    for dm in managers:
+        dm.stopSampling()
+        dm.stopSymbolLoader()
+
+
+#
+# Table model of DaqManager.deQueueSamplingData() that only records the
+# calls
+#
+class TableModelRecorder():
+
+    invalidatedRows = None
+    droppedRows = 0
+
+    def __init__(self):
+        self.invalidatedRows = []
+        self.droppedRows = 0
+
+    def invalidateRows(self, r0):
+        self.invalidatedRows.append(r0)
+
+    def beginDropFirstRows(self, count):
+        pass
+
+    def endDropFirstRows(self, count):
+        self.droppedRows += count
+
+
+@pytest.fixture
+def tableModel():
+    return TableModelRecorder()
@@ -0,0 +1,186 @@
+from __future__ import print_function
+
+import os, time
+
+import numpy as np
+import pytest
+
+import globals, captureFile, exporters, fakeDaq, timeIndex, replay
+from iconnect import ic
+
+
+#
+# Sampling intervals of the configuration in the capture header, set by
+# the ApplicationWindow otherwise
+#
+@pytest.fixture(autouse=True)
+def samplingIntervals(monkeypatch):
+    monkeypatch.setattr(globals, 'samplingIntervalRaw', ['0', '0.001', '0.01', '0.1', '1'])
+    monkeypatch.setattr(globals, 'samplingIntervalNames', ['MAX', '1 ms', '10 ms', '100 ms', '1 s'])
+    monkeypatch.setattr(globals, 'samplingIntervalValues',
+                        [ic.CDAQController.daqSampleMax, ic.CDAQController.daqSample1ms,
+                         ic.CDAQController.daqSample10ms, ic.CDAQController.daqSample100ms,
+                         ic.CDAQController.daqSample1s])
+
+
+def createCapture(fileName, signals, clock):
+    config = fakeDaq.createConfiguration(signals)
+    valueTypes = [signal.getValueType() for signal in signals]
+    return captureFile.CaptureWriter(fileName, config, valueTypes, clock=clock)
+
+
+def readSampleCount(fileName):
+    return captureFile.CaptureFile(fileName).getSampleCount()
+
+
+def test_writerFlushesTailRecords(tmp_path, monkeypatch):
+    syncs = []
+    monkeypatch.setattr(os, 'fsync', lambda fd: syncs.append(fd))
+
+    now = [0.0]
+    signals = fakeDaq.createSignals(2, 1000.0)
+    stores = fakeDaq.createStores(signals, 100.0)
+    fileName = str(tmp_path / 'flush.daqcap')
+    writer = createCapture(fileName, signals, lambda: now[0])
+
+    for daqIdx, store in enumerate(stores):
+        writer.write(daqIdx, store.getTimes(0, 100), store.getValues(0, 100))
+    writer.flushIfDue()
+    assert readSampleCount(fileName) == 0
+
+    now[0] = captureFile.CAPTURE_FLUSH_INTERVAL
+    writer.flushIfDue()
+    assert readSampleCount(fileName) == 200
+    assert syncs == []
+
+    # The tail records are replaced, not appended
+    for daqIdx, store in enumerate(stores):
+        writer.write(daqIdx, store.getTimes(100, 150), store.getValues(100, 150))
+    now[0] = captureFile.CAPTURE_SYNC_INTERVAL
+    writer.flushIfDue()
+    assert readSampleCount(fileName) == 300
+    assert len(syncs) == 1
+
+    # A full record removes the tail records, the next flushIfDue() 
+    # writes them again at once
+    n = captureFile.CAPTURE_RECORD_SIZE
+    writer.write(0, stores[0].getTimes(150, 150 + n), stores[0].getValues(150, 150 + n))
+    assert readSampleCount(fileName) == n
+    writer.flushIfDue()
+    assert readSampleCount(fileName) == 300 + n
+
+    writer.close()
+    capture = captureFile.CaptureFile(fileName)
+    for store, captured in zip(stores, capture.stores):
+        assert np.array_equal(captured.getTimes(0, len(captured)), store.getTimes(0, len(captured)))
+        assert np.array_equal(captured.getValues(0, len(captured)), store.getValues(0, len(captured)))
+
+
+def test_recordedCaptureIsMemoryMapped(tmp_path):
+    now = [0.0]
+    signals = fakeDaq.createSignals(4, 10000.0)
+    stores = fakeDaq.createStores(signals, 60.0)
+    fileName = str(tmp_path / 'mapped.daqcap')
+    writer = createCapture(fileName, signals, lambda: now[0])
+
+    # Reopens the capture and checks that its full chunks are mapped
+    def checkCapture(sampleCounts):
+        capture = captureFile.CaptureFile(fileName)
+        for store, captured, count in zip(stores, capture.stores, sampleCounts):
+            assert len(captured) == count
+            assert np.array_equal(captured.getTimes(0, count), store.getTimes(0, count))
+            assert np.array_equal(captured.getValues(0, count), store.getValues(0, count))
+
+            fullChunks = count // captured.chunkSize
+            assert fullChunks > 0
+            for times, values in zip(captured.timeChunks[:fullChunks], captured.valueChunks[:fullChunks]):
+                assert np.shares_memory(times, capture.data)
+                assert np.shares_memory(values, capture.data)
+        capture.close()
+
+    # Ingests of 0.1 s like during an acquisition
+    batch = 1000
+    for k in range(0, len(stores[0]), batch):
+        for daqIdx, store in enumerate(stores):
+            end = min(k + batch, len(store))
+            writer.write(daqIdx, store.getTimes(k, end), store.getValues(k, end))
+        now[0] += 0.1
+        writer.flushIfDue()
+
+        if k == 300 * batch:
+            writer.flush()
+            checkCapture([k + batch] * len(stores))
+
+    writer.close()
+    checkCapture([len(store) for store in stores])
+
+
+def test_openCaptureMapsTheTimeIndex(createManager, tmp_path):
+    signals = fakeDaq.createSignals(3, 1000.0)
+    signals[1].rate = 700.0
+    stores = fakeDaq.createStores(signals, 200.0)
+    fileName = str(tmp_path / 'index.daqcap')
+    writer = createCapture(fileName, signals, lambda: 0.0)
+    for daqIdx, store in enumerate(stores):
+        writer.write(daqIdx, store.getTimes(0, len(store)), store.getValues(0, len(store)))
+    writer.close()
+
+    dm = createManager(signals)
+    dm.openCapture(captureFile.CaptureFile(fileName))
+    index = dm.timeIndex
+    assert isinstance(index, timeIndex.MappedTimeIndex)
+
+    expected = timeIndex.TimeIndex(dm.sampleData)
+    for rowTimes, times, values in exporters.iterMergedBlocks(dm.sampleData, [0] * len(stores)):
+        expected.merge(rowTimes)
+    assert len(index) == len(expected)
+    assert np.array_equal(index.getTimes(), expected.getTimes())
+    for row in [0, 1, len(index) // 2, len(index) - 1]:
+        for storeIdx in range(len(stores)):
+            assert index.getSampleIndex(row, storeIdx) == expected.getSampleIndex(row, storeIdx)
+            assert index.isRealValue(row, storeIdx) == expected.isRealValue(row, storeIdx)
+
+    directory = index.directory
+    assert os.path.isdir(directory)
+    dm.closeSpills()
+    assert not os.path.exists(directory)
+
+
+def test_replayedCaptureMatchesTheRecordedSamples(createManager, tableModel, tmp_path, monkeypatch):
+    # Several merge blocks and reads per store
+    monkeypatch.setattr(replay, 'REPLAY_MERGE_SIZE', 1000)
+    monkeypatch.setattr(replay, 'REPLAY_READ_SIZE', 1500)
+
+    signals = fakeDaq.createSignals(3, 1000.0)
+    signals[1].rate = 700.0
+    stores = fakeDaq.createStores(signals, 10.0)
+    fileName = str(tmp_path / 'replay.daqcap')
+    writer = createCapture(fileName, signals, lambda: 0.0)
+    for daqIdx, store in enumerate(stores):
+        writer.write(daqIdx, store.getTimes(0, len(store)), store.getValues(0, len(store)))
+    writer.close()
+
+    capture = captureFile.CaptureFile(fileName)
+    replayCtrl = replay.ReplayDaqController(capture, None)
+    dm = createManager(signals)
+    dm.setReplay(replayCtrl)
+    assert dm.startSampling(capture.config.variableConfigs)
+    try:
+        count = sum(len(store) for store in stores)
+        end = time.time() + 30.0
+        while sum(len(store) for store in dm.getRawData()) < count:
+            assert time.time() < end
+            time.sleep(0.01)
+            dm.deQueueSamplingData(tableModel)
+        assert replayCtrl.isFinished()
+    finally:
+        dm.stopSampling()
+    assert not dm.isReplaying()
+
+    for store, replayed in zip(stores, dm.getRawData()):
+        assert len(replayed) == len(store)
+        # Times are replayed in DAQ clock ticks
+        assert np.allclose(replayed.getTimes(0, len(replayed)), store.getTimes(0, len(store)),
+                           rtol=0.0, atol=replay.REPLAY_TICK_NS * 1e-9)
+        assert np.array_equal(replayed.getValues(0, len(replayed)), store.getValues(0, len(store)))
+        assert replayed.getValues(0, 1).dtype == store.getValues(0, 1).dtype
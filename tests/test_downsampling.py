@@ -0,0 +1,247 @@
+
+from __future__ import print_function
+
+import sys
+import numpy as np
+import pytest
+
+import daqManager
+
+
+#
+# Returns a DaqManager with the traces. Without 'lod' the slot statistics
+# are always computed from the raw samples.
+#
+def createManager(traces, lod=True):
+    dm = daqManager.DaqManager(None)
+    dm.resetPlotData([None] * len(traces), [values.dtype.type for times, values in traces])
+    dm.resetDownsampleMetadata(len(traces))
+    for store, pyramid, (times, values) in zip(dm.sampleData, dm.sampleLod, traces):
+        store.extend(times, values)
+        pyramid.extend(times, values)
+        if not lod:
+            pyramid.getSlots = lambda t0, s, c: None
+    return dm
+
+
+#
+# getDownsampledPlotData() before it was vectorized: the samples are put
+# into the slots one by one and the empty slots are interpolated slot by
+# slot. The old code raised an IndexError when the adjusted interval had no
+# samples, these windows are returned as raw data like the sparse ones.
+#
+def downsamplePerSample(dm, varIndex, reqTimeStart, reqTimeEnd, scaleFactor, reqSampleCount):
+    store = dm.sampleData[varIndex]
+
+    t0, s, c = dm.getAdjustedTimeSlices(reqTimeStart, reqTimeEnd, reqSampleCount)
+
+    adjTimeStart = t0
+    adjTimeEnd = t0 + s*c
+    adjSampleCount = c
+    adjTimeSlice = s
+
+    rawIdxStart = store.searchTime(adjTimeStart, 'left')
+    rawIdxEnd = store.searchTime(adjTimeEnd, 'right')
+    if rawIdxEnd >= len(store): rawIdxEnd = len(store)-1
+
+    offset = min(rawIdxStart, rawIdxEnd)
+    rawx = store.getTimes(offset, rawIdxEnd+1).tolist()
+    rawy = store.getValues(offset, rawIdxEnd+1).tolist()
+    rawIdxStart -= offset
+    rawIdxEnd -= offset
+
+    if len([t for t in rawx if adjTimeStart <= t < adjTimeEnd]) == 0:
+        x, y = dm.getRawPlotData(varIndex, reqTimeStart, reqTimeEnd, scaleFactor)
+        return x, y, None, None
+
+    res_time = [None] * adjSampleCount
+    res_miny = [sys.float_info.max] * adjSampleCount
+    res_maxy = [-sys.float_info.max] * adjSampleCount
+    res_avgy = [0] * adjSampleCount
+    res_dps = [0] * adjSampleCount
+
+    for i in range(0, adjSampleCount):
+        res_time[i] = adjTimeStart + i*adjTimeSlice
+
+    while (rawx[rawIdxStart] < adjTimeStart):
+        rawIdxStart += 1
+    while (rawx[rawIdxEnd] >= adjTimeEnd):
+        rawIdxEnd -= 1
+
+    firstUsedSlotIndex = None
+    lastUsedSlotIndex = None
+
+    slotEndTime = adjTimeStart + adjTimeSlice
+
+    slotIdx = 0
+    rawIdx = rawIdxStart
+    while (rawIdx <= rawIdxEnd):
+        t = rawx[rawIdx]
+
+        while (t >= slotEndTime):
+            slotEndTime += adjTimeSlice
+            slotIdx += 1
+            if (slotIdx >= adjSampleCount):
+                break
+
+        res_miny[slotIdx] = min(res_miny[slotIdx], rawy[rawIdx])
+        res_maxy[slotIdx] = max(res_maxy[slotIdx], rawy[rawIdx])
+        res_avgy[slotIdx] += rawy[rawIdx]
+        res_dps[slotIdx] += 1
+
+        rawIdx +=1
+        lastUsedSlotIndex = slotIdx
+
+    avgDps = 0
+    for i in range(adjSampleCount):
+        if (res_dps[i] > 0):
+            res_avgy[i] /= float(res_dps[i])
+            if firstUsedSlotIndex == None:
+                firstUsedSlotIndex = i
+            res_miny[i] *= scaleFactor
+            res_maxy[i] *= scaleFactor
+            res_avgy[i] *= scaleFactor
+            avgDps += res_dps[i]
+
+    if (avgDps < 3):
+        x, y = dm.getRawPlotData(varIndex, reqTimeStart, reqTimeEnd, scaleFactor)
+        return x, y, None, None
+
+    lastFoundIdx = None
+    i = 0
+    while i < adjSampleCount:
+        if (res_dps[i] == 0):
+            li = lastFoundIdx
+            ri = None
+            while (i < adjSampleCount  and  res_dps[i] == 0):
+                i += 1
+            if (i < adjSampleCount):
+                ri = i
+            interpolate(res_avgy, res_miny, res_maxy, li, ri)
+        else:
+            lastFoundIdx = i
+            i += 1
+
+    if firstUsedSlotIndex < lastUsedSlotIndex:
+        i1 = firstUsedSlotIndex
+        i2 = lastUsedSlotIndex + 1
+        return res_time[i1:i2], res_avgy[i1:i2], res_miny[i1:i2], res_maxy[i1:i2]
+    else:
+        return [], [], [], []
+
+
+def interpolate(a, min, max, i1, i2):
+    if i1 == None:
+        for i in range(i2):
+            v = a[i2]
+            a[i] = v
+            min[i] = v
+            max[i] = v
+    elif i2 == None:
+        for i in range(i1+1, len(a)):
+            v = a[i1]
+            a[i] = v
+            min[i] = v
+            max[i] = v
+    else:
+        for i in range(i1+1, i2):
+            v = a[i1] + ((i-i1) / float(i2-i1) * (a[i2]-a[i1]))
+            a[i] = v
+            min[i] = v
+            max[i] = v
+
+
+def createRandomTrace(random, count, isFloat):
+    times = np.cumsum(random.exponential(1e-3, count))
+    if isFloat:
+        return times, random.standard_normal(count) * 100.0
+    return times, random.randint(-1000, 1000, count).astype(np.int64)
+
+
+#
+# Bursts of samples with gaps of up to several seconds between them
+#
+def createGappyTrace(random, count, isFloat):
+    times, values = createRandomTrace(random, count, isFloat)
+    gaps = np.zeros(count)
+    gaps[random.randint(0, count, 20)] = random.uniform(0.5, 5.0, 20)
+    return times + np.cumsum(gaps), values
+
+
+def createTraces(random):
+    return [createRandomTrace(random, 20000, True),
+            createRandomTrace(random, 20000, False),
+            createGappyTrace(random, 20000, True),
+            createGappyTrace(random, 20000, False),
+            (np.zeros(0), np.zeros(0)),
+            (np.array([0.5, 0.75]), np.array([1.0, 2.0]))]
+
+
+def assertSameResults(old, new):
+    assert (old[2] is None) == (new[2] is None)
+    for a, b in zip(old, new):
+        if a is None:
+            continue
+        assert len(a) == len(b)
+        assert np.allclose(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64),
+                           rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('lod', [False, True])
+def test_downsamplingMatchesTheSlotLoop(lod):
+    random = np.random.RandomState(5)
+    traces = createTraces(random)
+    dm = createManager(traces, lod)
+
+    windows = [(0.0, 30.0), (1.0, 1.5), (-2.0, 0.1), (3.3, 3.31), (100.0, 200.0)]
+    for k in range(20):
+        start = random.uniform(-1.0, 40.0)
+        windows.append((start, start + random.uniform(0.001, 20.0)))
+
+    for varIndex in range(len(traces)):
+        for start, end in windows:
+            for count, scaleFactor in [(1000, 1.0), (37, 2.5)]:
+                dm.resetDownsampleMetadata(len(traces))
+                old = downsamplePerSample(dm, varIndex, start, end, scaleFactor, count)
+                dm.resetDownsampleMetadata(len(traces))
+                new = dm.getDownsampledPlotData(varIndex, start, end, scaleFactor, count)
+                assertSameResults(old, new)
+
+
+def test_chartDataIsAnEnvelopeOfTheSlots():
+    random = np.random.RandomState(7)
+    times, values = createRandomTrace(random, 100000, True)
+    dm = createManager([(times, values)])
+
+    x, y, isEnvelope = dm.getChartPlotData(0, 10.0, 60.0, 1.0, 500)
+    assert isEnvelope
+    t, avg, mins, maxs = dm.getDownsampledPlotData(0, 10.0, 60.0, 1.0, 500)
+    assert np.array_equal(x, np.repeat(t, 2))
+    assert np.array_equal(y[0::2], mins)
+    assert np.array_equal(y[1::2], maxs)
+
+    inside = (times >= 10.0) & (times < 60.0)
+    assert y.min() <= values[inside].min()
+    assert y.max() >= values[inside].max()
+
+    x, y, isEnvelope = dm.getChartPlotData(0, 10.0, 10.2, 1.0, 500)
+    assert not isEnvelope
+    assert np.array_equal(y, dm.getRawPlotData(0, 10.0, 10.2, 1.0)[1])
+
+
+def test_wideWindowsUseThePyramid():
+    random = np.random.RandomState(9)
+    dm = createManager([createRandomTrace(random, 100000, True)])
+    pyramid = dm.sampleLod[0]
+
+    queries = []
+    getSlots = pyramid.getSlots
+    def countSlots(t0, s, c):
+        slots = getSlots(t0, s, c)
+        queries.append(slots is not None)
+        return slots
+    pyramid.getSlots = countSlots
+
+    x, y, isEnvelope = dm.getChartPlotData(0, 0.0, 100.0, 1.0, 1000)
+    assert isEnvelope
+    assert queries == [True]
@@ -0,0 +1,21 @@
+from __future__ import print_function
+
+import excelBenchmark
+
+
+def test_columnWiseExportMatchesTheCells(tmp_path):
+    dm = excelBenchmark.createManager(5000, 3)
+    try:
+        for bFull in [False, True]:
+            cellRate, columnRate, bMatch = excelBenchmark.benchmarkExport(dm, bFull)
+            assert bMatch
+
+        # Every table row is exported, without the full data model only
+        # one variable has a value per row
+        fileName = str(tmp_path / 'columns.xlsx')
+        excelBenchmark.exportByColumn(fileName, dm, ['a', 'b', 'c'], False)
+        rows = excelBenchmark.readRows(fileName)
+        assert len(rows) == 5000
+        assert all(sum(value != None for value in row[1:]) == 1 for row in rows)
+    finally:
+        dm.closeSpills()
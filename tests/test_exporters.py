@@ -0,0 +1,143 @@
+from __future__ import print_function
+
+import numpy as np
+import pytest
+
+import exporters, sampleStore
+
+
+#
+# The CSV export before it was merged block-wise: one search per row and
+# store over the sorted set of all sample times
+#
+def exportRowByRow(fileName, sampleData, separator, varNames, bFillInMissingValues):
+    f = open(fileName, 'w')
+
+    f.write('Time [s]')
+    for n in varNames:
+        f.write(separator + n)
+    
+    lastValues = []
+    allTimes = []
+    for store in sampleData:
+        for startIdx, x, y in store.iterChunks():
+            allTimes.extend(x.tolist())
+        lastValues.append(store.getValue(0).item())
+    
+    allTimes = sorted(list(set(allTimes)))
+            
+    for t in allTimes:
+        f.write('\n')
+
+        f.write(str(t))
+        val = None
+        
+        for di, store in enumerate(sampleData):
+            strVal = ""
+            idx = store.searchTime(t, 'left')
+            if idx < len(store) and store.getTime(idx) == t:
+                val = store.getValue(idx).item()
+                lastValues[di] = val
+                strVal = str(val)
+            else:
+                if bFillInMissingValues:
+                    val = lastValues[di]
+                    strVal = str(val)
+
+            f.write(separator + strVal)
+    f.close()
+
+
+#
+# Stores sampled at random times of a coarse grid, so they interleave, 
+# share times and have gaps. Every store repeats some of its times.
+#
+def createStores(seed):
+    rng = np.random.RandomState(seed)
+    grid = np.round(np.arange(3000) * 0.001, 3)
+
+    stores = []
+    for valueType in [np.float64, np.int64, np.float64, np.uint64]:
+        times = np.sort(rng.choice(grid, rng.randint(100, 2000)))
+        if valueType == np.float64:
+            values = np.round(rng.standard_normal(len(times)) * 100.0, rng.randint(0, 8))
+        else:
+            values = rng.randint(0, 1 << 40, len(times)).astype(valueType)
+
+        store = sampleStore.SampleStore(valueType)
+        store.extend(times, values)
+        stores.append(store)
+    return stores
+
+
+def readFile(fileName):
+    with open(fileName) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('blockSize', [7, 256, exporters.EXPORT_BLOCK_SIZE])
+@pytest.mark.parametrize('bFillInMissingValues', [False, True])
+def test_exportMatchesTheRowByRowExport(tmp_path, monkeypatch, blockSize, bFillInMissingValues):
+    monkeypatch.setattr(exporters, 'EXPORT_BLOCK_SIZE', blockSize)
+    varNames = ['a', 'b', 'c', 'd']
+
+    for seed in range(3):
+        stores = createStores(seed)
+        expectedName = str(tmp_path / 'expected.csv')
+        exportedName = str(tmp_path / 'exported.csv')
+
+        exportRowByRow(expectedName, stores, ',', varNames, bFillInMissingValues)
+        assert exporters.exportToCharSeparatedValues(exportedName, stores, ',', varNames, 
+                                                     bFillInMissingValues)
+        assert readFile(exportedName) == readFile(expectedName)
+
+
+#
+# Progress callback failing like a full disk after the first block
+#
+def failingProgress(done, total):
+    raise IOError('No space left on device')
+
+
+@pytest.mark.parametrize('bCancel', [False, True])
+def test_failedCsvExportRemovesThePartialFile(tmp_path, monkeypatch, bCancel):
+    monkeypatch.setattr(exporters, 'EXPORT_BLOCK_SIZE', 7)
+    fileName = str(tmp_path / 'exported.csv')
+
+    if bCancel:
+        assert not exporters.exportToCharSeparatedValues(fileName, createStores(0), ',', 
+                                                         ['a', 'b', 'c', 'd'], False, 
+                                                         lambda done, total: False)
+    else:
+        with pytest.raises(IOError):
+            exporters.exportToCharSeparatedValues(fileName, createStores(0), ',', 
+                                                  ['a', 'b', 'c', 'd'], False, failingProgress)
+    assert not (tmp_path / 'exported.csv').exists()
+
+
+def test_failedExcelExportRemovesThePartialFile(tmp_path, monkeypatch):
+    fileName = str(tmp_path / 'exported.xlsx')
+
+    # Save that fails after writing part of the file
+    files = []
+    def failingSave(book, f):
+        files.append(f)
+        f.write(b'PK')
+        raise IOError('No space left on device')
+    monkeypatch.setattr(exporters.openpyxl.Workbook, 'save', failingSave)
+
+    with pytest.raises(IOError):
+        exporters.exportToExcel(None, fileName, createStores(0), ['a', 'b', 'c', 'd'], False)
+    assert files[0].closed
+    assert not (tmp_path / 'exported.xlsx').exists()
+
+
+def test_excelExportIsReadable(tmp_path):
+    fileName = str(tmp_path / 'exported.xlsx')
+    stores = createStores(0)
+
+    assert exporters.exportToExcel(None, fileName, stores, ['a', 'b', 'c', 'd'], True)
+    sheet = exporters.openpyxl.load_workbook(fileName, read_only=True).worksheets[0]
+    rows = list(sheet.iter_rows(values_only=True))
+    assert rows[0] == ('Time [s]', 'a', 'b', 'c', 'd')
+    assert len(rows) - 1 == len(np.unique(np.concatenate([s.getTimes(0, len(s)) for s in stores])))
@@ -0,0 +1,99 @@
+
+from __future__ import print_function
+
+import time
+import numpy as np
+
+from iconnect import ic
+import fakeConnect, fakeDaq
+
+
+def createConfiguration(dm, signals):
+    config = fakeDaq.createConfiguration(signals)
+    for varConfig in config.variableConfigs:
+        varConfig.variable = dm.getVariableByName(varConfig.name)
+    return config
+
+
+def acquire(dm, tableModel, count, timeout=30.0):
+    end = time.time() + timeout
+    while sum(len(store) for store in dm.getRawData()) < count and time.time() < end:
+        time.sleep(0.01)
+        dm.deQueueSamplingData(tableModel)
+
+
+def test_fakeConnectIsUsed():
+    assert ic is fakeConnect
+
+
+def test_variablesAreListed(createManager):
+    signals = fakeDaq.createSignals(3, 1000.0)
+    dm = createManager(signals, downloadFiles=[('app.elf', 'app.elf', [('counter', 'unsigned short')]),
+                                               ('boot.elf', 'boot.elf', [('table', 'int[4][2]')])])
+
+    names = [var.name for var in dm.getVariables()]
+    for signal in signals:
+        assert signal.name in names
+    assert 'counter' in names
+
+    # Array dimensions are looked up through CDataController2.getExpressionType()
+    table = dm.resolveArray('table[4][2],,boot.elf')
+    assert table.arrayLengthIndices == [4, 2]
+
+
+def test_startSamplingConfiguresTheSignals(createManager, tableModel):
+    signals = fakeDaq.createSignals(2, 1000.0)
+    dm = createManager(signals, speed=None)
+    config = createConfiguration(dm, signals)
+
+    assert dm.startSampling(config.variableConfigs)
+    try:
+        assert dm.daqCtrl.signals == signals
+        acquire(dm, tableModel, 20000)
+    finally:
+        dm.stopSampling()
+
+    for signal, store in zip(signals, dm.getRawData()):
+        times, values = signal.getSamples(0, 100)
+        # The initial value at time 0 comes from CDataController2.evaluate()
+        assert store.getValue(0) == values[0]
+        assert np.allclose(store.getTimes(1, 101), times)
+        assert np.allclose(store.getValues(1, 101), values)
+
+
+def test_startSamplingRejectsUnknownVariables(createManager):
+    signals = fakeDaq.createSignals(1, 1000.0)
+    dm = createManager(signals)
+    config = createConfiguration(dm, signals)
+    varConfig = config.variableConfigs[0]
+
+    varConfig.name = 'missing'
+    assert not dm.startSampling(config.variableConfigs)
+    assert dm.lastErrorMsg == "Could not evaluate expression: 'missing'"
+
+
+def test_startSamplingRejectsCompoundTypes(createManager):
+    signals = [fakeDaq.FakeSignal('point', typeName='struct point')]
+    dm = createManager(signals)
+    config = createConfiguration(dm, signals)
+
+    assert not dm.startSampling(config.variableConfigs)
+    assert dm.lastErrorMsg == "Only simple types allowed for sampling: 'point'"
+
+
+def test_overflowIsReported(createManager, tableModel):
+    signals = fakeDaq.createSignals(1, 100000.0)
+    dm = createManager(signals, speed=1.0, bufferSize=1000)
+    config = createConfiguration(dm, signals)
+
+    assert dm.startSampling(config.variableConfigs)
+    try:
+        dm.sampleReaderThread.stopRunning()
+        dm.sampleReaderThread.join()
+        time.sleep(0.1)
+        numAvailable, overflow = dm.queueSamplingData()
+    finally:
+        dm.stopSampling()
+
+    assert overflow
+    assert dm.daqCtrl.overflowCount > 0
@@ -0,0 +1,141 @@
+
+from __future__ import print_function
+
+import time
+
+import pytest
+
+import frameScheduler
+from pipelineStats import stats
+
+
+#
+# Runs frame timer ticks every tickInterval for 'duration' seconds, each
+# drawn frame takes drawTime. Returns the scheduler and the frame count.
+#
+def runFrames(scheduler, drawTime, duration, tickInterval=0.02):
+    now = 0.0
+    frames = 0
+    while now < duration:
+        if scheduler.isFrameDue(now):
+            scheduler.frameDone(now, now + drawTime)
+            frames += 1
+            now += drawTime
+        now += tickInterval
+    return frames
+
+
+def test_fastFramesRunAtTheTargetRate():
+    scheduler = frameScheduler.FrameScheduler(0.02, 0.5, 0.5)
+    frames = runFrames(scheduler, 0.002, 10.0)
+
+    assert abs(scheduler.getFrameRate() - 1 / 0.022) < 2.0
+    assert scheduler.getDroppedFrames() == 0
+    assert frames > 400
+
+
+def test_slowFramesKeepTheDrawBudget():
+    scheduler = frameScheduler.FrameScheduler(0.02, 0.5, 0.5)
+    runFrames(scheduler, 0.05, 10.0)
+
+    # Drawing takes at most half of the time, the other frames are dropped
+    assert scheduler.getFrameInterval() >= 0.1
+    assert scheduler.getFrameRate() <= 1 / 0.1 + 0.5
+    assert scheduler.getDroppedFrames() > 0
+
+
+def test_minimumRefreshRate():
+    scheduler = frameScheduler.FrameScheduler(0.02, 0.5, 0.5)
+    runFrames(scheduler, 1.0, 20.0)
+
+    assert scheduler.getFrameInterval() == 0.5
+
+
+def test_ingestLatency():
+    scheduler = frameScheduler.FrameScheduler()
+    smoothing = scheduler.smoothing
+
+    # Simulated clock: an ingest every 10 ms that takes 1 ms
+    now = [0.0]
+    def ingest(wait):
+        now[0] += wait
+        start = now[0]
+        now[0] += 0.001
+        scheduler.ingestDone(start, now[0])
+
+    # The first ingest has no latency, a sample waited at most from the 
+    # start of the previous ingest to the end of this one
+    ingest(0.0)
+    assert scheduler.getIngestLatency() == 0.0
+    assert scheduler.getMaxIngestLatency() == 0.0
+
+    expected = 0.0
+    for k in range(10):
+        ingest(0.009)
+        expected += smoothing * (0.011 - expected)
+        assert scheduler.getIngestLatency() == pytest.approx(expected, abs=1e-12)
+    assert scheduler.getMaxIngestLatency() == pytest.approx(0.011, abs=1e-12)
+
+    # A stalled GUI thread delays one ingest by 0.5 s
+    ingest(0.5)
+    expected += smoothing * (0.502 - expected)
+    assert scheduler.getIngestLatency() == pytest.approx(expected, abs=1e-12)
+    assert scheduler.getMaxIngestLatency() == pytest.approx(0.502, abs=1e-12)
+
+
+#
+# The application window acquiring from the fake target, drawn by Agg on
+# the offscreen Qt platform
+#
+def test_schedulerStatsArePublished(qapp):
+    import daqBenchmark, fakeDaq, widgets
+
+    signals = fakeDaq.createSignals(2, 10000.0)
+    window = daqBenchmark.createWindow(signals)
+    window.daqManager.daqCtrl.speed = 1.0
+    try:
+        window.chartPlayButtonPressed()
+        end = time.time() + 2.0
+        while time.time() < end:
+            qapp.processEvents()
+            time.sleep(0.001)
+        window.updatePipelineStats()
+
+        assert stats.getGauge('chart.frame.rate') > 0
+        assert stats.getGauge('ingest.latency') > 0
+        assert stats.getGauge('ingest.latency.max') >= stats.getGauge('ingest.latency')
+        assert stats.getGauge('chart.frames.dropped') >= 0
+        assert 'fps' in window.statsLabel.text()
+
+        dialog = widgets.DiagnosticsDialog(window)
+        names = [dialog.table.item(r, 0).text() for r in range(dialog.table.rowCount())]
+        dialog.close()
+        for name in ['chart.frame.rate', 'chart.frames.dropped', 'ingest.latency', 'ingest.latency.max']:
+            assert name in names
+    finally:
+        window.chartStopButtonPressed()
+        window.daqManager.stopSymbolLoader()
+        window.daqManager.closeSpills()
+        # close() would ask to save the configuration
+        window.hide()
+        window.deleteLater()
+
+
+def test_resizeRecomputesTheLayout(qapp):
+    import daqBenchmark, fakeDaq
+    from PyQt5 import QtCore, QtGui
+
+    window = daqBenchmark.createWindow(fakeDaq.createSignals(1, 1000.0))
+    canvas = window.canvasGraph
+    try:
+        canvas.layoutDirty = False
+        canvas.drawnLimits = []
+        canvas.resizeEvent(QtGui.QResizeEvent(QtCore.QSize(640, 480), canvas.size()))
+
+        assert canvas.layoutDirty
+        assert canvas.drawnLimits == None
+    finally:
+        window.daqManager.stopSymbolLoader()
+        window.daqManager.closeSpills()
+        window.hide()
+        window.deleteLater()
@@ -0,0 +1,16 @@
+from __future__ import print_function
+
+import panZoomBenchmark
+
+
+def test_searchedWindowsMatchTheEdgeWalking():
+    dm = panZoomBenchmark.createManager(200000, 10000.0)
+    windows = panZoomBenchmark.createWindows(20.0, 300, seed=3)
+
+    walkTime, searchTime, mismatches = panZoomBenchmark.benchmarkPanZoom(dm, windows)
+    searchTime, searched = panZoomBenchmark.runWindows(dm, dm.getRawPlotData, windows, 2.0)
+    dm.closeSpills()
+
+    # The same samples in every step, most windows are not empty
+    assert mismatches == []
+    assert sum(1 for x, y in searched if len(x) > 0) > len(windows) // 2
@@ -0,0 +1,82 @@
+from __future__ import print_function
+
+import json
+
+import pipelineStats
+
+
+def test_histogramSnapshot():
+    histogram = pipelineStats.Histogram('read', 's')
+    for value in [1.0, 1.5, 3.0, 0.25, 0.0, 100.0]:
+        histogram.add(value)
+
+    # Bucket e holds [2**(e-1), 2**e), zero goes to the first bucket
+    assert histogram.toDict() == {
+        'unit': 's', 'count': 6, 'mean': 17.625, 'min': 0.0, 'max': 100.0, 'last': 100.0,
+        'p50': 2.0, 'p95': 100.0, 'p99': 100.0,
+        'buckets': {repr(2.0**pipelineStats.HISTOGRAM_MIN_EXPONENT): 1, '0.5': 1,
+                    '2.0': 2, '4.0': 1, '128.0': 1}}
+
+
+def test_histogramClampsToTheLastBucket():
+    histogram = pipelineStats.Histogram('size', 'samples')
+    histogram.add(1e30)
+
+    assert histogram.toDict()['buckets'] == {repr(2.0**pipelineStats.HISTOGRAM_MAX_EXPONENT): 1}
+    assert histogram.getPercentile(50) == 2.0**pipelineStats.HISTOGRAM_MAX_EXPONENT
+
+    histogram.reset()
+    assert histogram.toDict() == {
+        'unit': 'samples', 'count': 0, 'mean': None, 'min': None, 'max': None, 'last': None,
+        'p50': None, 'p95': None, 'p99': None, 'buckets': {}}
+
+
+def test_counterRate():
+    counter = pipelineStats.Counter('samples', 'samples')
+    counter.add(5)
+    counter.add()
+    counter.updateRate(10.0)
+    assert counter.toDict() == {'unit': 'samples', 'total': 6, 'rate': 0.0}
+
+    counter.add(30)
+    counter.updateRate(12.0)
+    assert counter.toDict() == {'unit': 'samples', 'total': 36, 'rate': 15.0}
+
+    # No new rate without time passing
+    counter.add(10)
+    counter.updateRate(12.0)
+    assert counter.rate == 15.0
+
+
+def test_statsSnapshot(tmp_path):
+    stats = pipelineStats.PipelineStats()
+    stats.count('daq.samples', 4, 'samples')
+    stats.count('daq.samples', 6)
+    stats.add('daq.read', 0.25, 's')
+    stats.add('daq.read', 0.75)
+    stats.setGauge('queue.depth', 7, 'samples')
+    stats.updateRates(1.0)
+    stats.count('daq.samples', 20)
+    stats.updateRates(3.0)
+
+    expected = {'counters': {'daq.samples': {'unit': 'samples', 'total': 30, 'rate': 10.0}},
+                'gauges': {'queue.depth': {'value': 7, 'unit': 'samples'}}}
+    snapshot = stats.toDict()
+    assert snapshot['counters'] == expected['counters']
+    assert snapshot['gauges'] == expected['gauges']
+    assert snapshot['histograms']['daq.read']['count'] == 2
+    assert snapshot['histograms']['daq.read']['mean'] == 0.5
+    assert snapshot['histograms']['daq.read']['buckets'] == {'0.5': 1, '1.0': 1}
+    assert stats.getGauge('queue.depth') == 7
+    assert stats.getGauge('missing') == None
+
+    fileName = str(tmp_path / 'stats.json')
+    stats.saveJson(fileName)
+    with open(fileName) as f:
+        saved = json.load(f)
+    assert saved['counters'] == expected['counters']
+    assert saved['histograms']['daq.read'] == snapshot['histograms']['daq.read']
+
+    stats.reset()
+    snapshot = stats.toDict()
+    assert snapshot['counters'] == snapshot['histograms'] == snapshot['gauges'] == {}
@@ -0,0 +1,102 @@
+
+from __future__ import print_function
+
+import fakeDaq
+from daqManager import AdaptivePollScheduler
+
+
+#
+# FakeDaqController running on a simulated clock, advanced by the poll
+# intervals instead of sleeping
+#
+class SimulatedDaq():
+
+    now = 0.0
+    controller = None
+
+    def __init__(self, rate, bufferSize, enabled=True):
+        self.now = 0.0
+        signals = [fakeDaq.FakeSignal('fake', rate=rate)]
+        self.controller = fakeDaq.FakeDaqController(signals, bufferSize=bufferSize, clock=self.clock)
+        self.controller.enableGlobal(enabled)
+
+    def clock(self):
+        return self.now
+
+    #
+    # Reads the available samples like DaqManager.queueSamplingData().
+    # Returns the number of samples available and the overflow flag.
+    #
+    def poll(self):
+        status = self.controller.status()
+        numAvailable = status.getNumSamplesAvailable()
+        if numAvailable > 0:
+            daqSamples = []
+            while len(daqSamples) < numAvailable and self.controller.getAvailableCount(self.now) > 0:
+                self.controller.read(daqSamples)
+        return numAvailable, status.getOverflow()
+
+    #
+    # Polls for 'duration' simulated seconds. Returns the number of polls
+    # and overflows.
+    #
+    def run(self, getInterval, duration):
+        polls = 0
+        overflows = 0
+        end = self.now + duration
+        while self.now < end:
+            numAvailable, overflow = self.poll()
+            polls += 1
+            overflows += overflow
+            self.now += getInterval(self.now, numAvailable, overflow)
+        return polls, overflows
+
+
+def test_fixedIntervalOverflowsAtHighRates():
+    daq = SimulatedDaq(rate=100000.0, bufferSize=4096)
+    polls, overflows = daq.run(lambda now, n, overflow: 1.0 / 20, 10.0)
+    assert overflows > polls / 2
+
+
+def test_intervalFollowsTheSampleRate():
+    daq = SimulatedDaq(rate=100000.0, bufferSize=4096)
+    scheduler = AdaptivePollScheduler()
+    daq.run(scheduler.update, 1.0)
+
+    polls, overflows = daq.run(scheduler.update, 10.0)
+    assert overflows == 0
+    assert abs(scheduler.getSampleRate() - 100000.0) < 5000.0
+
+    expected = scheduler.targetFill * scheduler.bufferSize / 100000.0
+    assert abs(scheduler.getPollInterval() - expected) < 0.2 * expected
+
+
+def test_slowRatesArePolledRarely():
+    daq = SimulatedDaq(rate=100.0, bufferSize=4096)
+    scheduler = AdaptivePollScheduler()
+
+    polls, overflows = daq.run(scheduler.update, 10.0)
+    assert overflows == 0
+    assert scheduler.getPollInterval() == scheduler.maxInterval
+    assert polls < 10.0 / scheduler.maxInterval + 10
+
+
+def test_idleControllerBacksOff():
+    daq = SimulatedDaq(rate=1000.0, bufferSize=4096, enabled=False)
+    scheduler = AdaptivePollScheduler()
+
+    polls, overflows = daq.run(scheduler.update, 5.0)
+    assert scheduler.getPollInterval() == scheduler.maxInterval
+    assert polls < 5.0 / scheduler.maxInterval + 10
+
+
+def test_smallerBufferIsLearnedFromOverflows():
+    daq = SimulatedDaq(rate=100000.0, bufferSize=1000)
+    scheduler = AdaptivePollScheduler(bufferSize=4096)
+    daq.run(scheduler.update, 1.0)
+
+    assert scheduler.getOverflowCount() > 0
+    assert scheduler.bufferSize <= 1000
+
+    polls, overflows = daq.run(scheduler.update, 10.0)
+    assert overflows == 0
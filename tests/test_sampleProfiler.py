@@ -0,0 +1,89 @@
+from __future__ import print_function
+
+import json, threading
+
+import sampleProfiler
+
+
+MAIN = ('main', '/app/src/daqIDEA.py', 10)
+UPDATE = ('updateFigure', '/app/src/chart.py', 20)
+RUN = ('run', '/app/src/daqManager.py', 30)
+READ = ('read;samples', '/app/src/fakeDaq.py', 40)
+
+
+#
+# Profiler with a synthetic sample: 6 samples in 0.06 s
+#
+def createProfiler():
+    profiler = sampleProfiler.SamplingProfiler()
+    profiler.stacks = {'MainThread': {(MAIN, UPDATE): 3, (MAIN,): 1},
+                       'DaqWorkerThread': {(RUN, READ): 2}}
+    profiler.sampleCount = 6
+    profiler.startTime = 100.0
+    profiler.stopTime = 100.06
+    return profiler
+
+
+def test_collapsedStacks(tmp_path):
+    fileName = str(tmp_path / 'profile.collapsed')
+    createProfiler().writeCollapsed(fileName)
+
+    # Threads and stacks in order, ';' in names replaced
+    with open(fileName) as f:
+        assert f.read().splitlines() == [
+            'DaqWorkerThread;run (daqManager.py:30);read:samples (fakeDaq.py:40) 2',
+            'MainThread;main (daqIDEA.py:10) 1',
+            'MainThread;main (daqIDEA.py:10);updateFigure (chart.py:20) 3']
+
+
+def test_speedscopeProfiles(tmp_path):
+    collapsedFile, speedscopeFile = createProfiler().save(str(tmp_path / 'profile'))
+    assert collapsedFile.endswith('.collapsed')
+
+    with open(speedscopeFile) as f:
+        data = json.load(f)
+    assert data['$schema'] == 'https://www.speedscope.app/file-format-schema.json'
+
+    # Every frame once, samples refer to them root first
+    frames = data['shared']['frames']
+    keys = [(frame['name'], frame['file'], frame['line']) for frame in frames]
+    assert sorted(keys) == sorted([MAIN, UPDATE, RUN, READ])
+
+    profiles = data['profiles']
+    assert [profile['name'] for profile in profiles] == ['DaqWorkerThread', 'MainThread']
+    for profile in profiles:
+        assert profile['type'] == 'sampled'
+        assert profile['unit'] == 'seconds'
+        assert len(profile['samples']) == len(profile['weights'])
+        assert abs(profile['endValue'] - sum(profile['weights'])) < 1e-12
+
+    stacks = [[keys[i] for i in sample] for sample in profiles[1]['samples']]
+    assert stacks == [[MAIN], [MAIN, UPDATE]]
+    assert [round(w, 9) for w in profiles[0]['weights']] == [0.02]
+    assert [round(w, 9) for w in profiles[1]['weights']] == [0.01, 0.03]
+
+
+def waitForProfiler(started, event):
+    started.set()
+    event.wait()
+
+
+def test_sampleTakesTheStacksOfNamedThreads():
+    started = threading.Event()
+    event = threading.Event()
+    thread = threading.Thread(target=waitForProfiler, args=(started, event), name='WaitingThread')
+    thread.start()
+    try:
+        assert started.wait(10.0)
+        profiler = sampleProfiler.SamplingProfiler()
+        profiler.sample()
+    finally:
+        event.set()
+        thread.join()
+
+    assert profiler.sampleCount == 1
+    stacks = profiler.stacks['WaitingThread']
+    assert sum(stacks.values()) == 1
+    names = [key[0] for key in list(stacks)[0]]
+    assert 'waitForProfiler' in names
+    assert names.index('run') < names.index('waitForProfiler')
@@ -0,0 +1,66 @@
+
+from __future__ import print_function
+
+import numpy as np
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import replay, sampleRing, ringBenchmark
+
+
+def test_integersAreExact(tableModel):
+    dm = ringBenchmark.createManager([np.int64, np.uint64, np.float64])
+    big = 2**53 + 1
+    huge = 2**63 + 5
+    daqSamples = [replay.ReplaySample(0, 1, big, False),
+                  replay.ReplaySample(1, 1, huge, False),
+                  replay.ReplaySample(2, 1, 0.25, True),
+                  replay.ReplaySample(2, 2, float('inf'), True),
+                  replay.ReplaySample(0, 2, -big, False),
+                  replay.ReplaySample(1, 2, 2**64 - 1, False)]
+
+    dm.sampleQueue.pushMany(*dm.decodeSamples(daqSamples))
+    dm.deQueueSamplingData(tableModel)
+
+    stores = dm.getRawData()
+    assert stores[0].getValues(0, 2).tolist() == [big, -big]
+    assert stores[1].getValues(0, 2).tolist() == [huge, 2**64 - 1]
+    assert stores[2].getValues(0, 1).tolist() == [0.25]
+    assert len(stores[2]) == 1
+
+
+def test_signedUint64PatternIsKept():
+    dm = ringBenchmark.createManager([np.uint64])
+    daqSamples = [replay.ReplaySample(0, 1, -1, False)]
+
+    indices, times, values, intValues = dm.decodeSamples(daqSamples)
+    assert intValues.view(np.uint64).tolist() == [2**64 - 1]
+
+
+def test_ringWrapsAround():
+    ring = sampleRing.SampleRing(capacity=8, policy=sampleRing.POLICY_DROP)
+    drained = []
+
+    def consume(indices, times, values, intValues):
+        drained.extend(intValues.tolist())
+
+    for start in range(0, 20, 5):
+        ints = np.arange(start, start + 5, dtype=np.int64) + 2**60
+        assert ring.pushMany(np.zeros(5, np.int32), ints, ints.astype(np.float64), ints) == 5
+        ring.drainInto(consume)
+
+    assert drained == [2**60 + k for k in range(20)]
+
+
+def test_bulkTransferMatchesPerSample():
+    varCount = 4
+    dm = ringBenchmark.createManager([np.float64, np.int64] * (varCount // 2))
+    daqSamples = ringBenchmark.createSamples(20000, varCount)
+
+    perSample = ringBenchmark.transferPerSample(dm, daqSamples, queue.Queue())
+    bulk = ringBenchmark.transferBulk(dm, daqSamples, sampleRing.SampleRing(len(daqSamples)))
+    assert ringBenchmark.compareTransfers(perSample, bulk)
+    assert [len(times) for times in bulk[0]] == [len(daqSamples) // varCount] * varCount
@@ -0,0 +1,114 @@
+from __future__ import print_function
+
+import os
+
+import numpy as np
+
+import globals, sampleStore, sampleSpill, daqManager
+
+CHUNK = 256
+
+
+def createStore(directory, valueType=np.float64):
+    spill = sampleSpill.SampleSpill(str(directory), 'test', CHUNK, valueType)
+    return sampleStore.SampleStore(valueType, CHUNK, spill=spill)
+
+
+def test_spilledChunksAreReadBack(tmp_path, monkeypatch):
+    monkeypatch.setattr(sampleSpill, 'SPILL_SEGMENT_CHUNKS', 4)
+    store = createStore(tmp_path, np.int64)
+    times = np.arange(10 * CHUNK + 17) * 0.01
+    values = np.arange(len(times)) * 3 - 1000
+    store.extend(times, values)
+    memory = store.getMemorySize()
+
+    # Chunks with samples only before t are spilled, the last one never
+    store.spillBefore(times[7 * CHUNK])
+    assert store.spilledChunks == 7
+    assert store.getMemorySize() == memory - 7 * CHUNK * 16
+    assert store.getSpilledSize() == 7 * CHUNK * 16
+    for c in range(7):
+        assert isinstance(store.timeChunks[c].base, np.memmap)
+
+    # The files hold only the spilled chunks
+    assert sorted(os.listdir(str(tmp_path))) == ['test-0.spill', 'test-1.spill']
+    assert store.spill.getDiskSize() == 7 * CHUNK * 16
+    assert os.path.getsize(str(tmp_path / 'test-1.spill')) == 3 * CHUNK * 16
+
+    assert np.array_equal(store.getTimes(0, len(store)), times)
+    assert np.array_equal(store.getValues(0, len(store)), values)
+    assert store.searchTime(times[CHUNK + 5]) == CHUNK + 5
+
+    store.spill.close()
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_retentionDropsWholeChunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(sampleSpill, 'SPILL_SEGMENT_CHUNKS', 4)
+    store = createStore(tmp_path)
+    times = np.arange(10 * CHUNK) * 0.01
+    store.extend(times, np.sin(times))
+    store.spillBefore(times[-1])
+
+    # Chunk 5 keeps samples before t, so it is not dropped
+    size = store.dropBefore(times[5 * CHUNK + 10])
+    assert size == 5 * CHUNK * 16
+    assert store.getFirstIndex() == 5 * CHUNK
+    assert store.firstTime() == times[5 * CHUNK]
+    assert np.array_equal(store.getTimes(5 * CHUNK, len(store)), times[5 * CHUNK:])
+
+    # Only the file whose chunks were all dropped is removed
+    assert sorted(os.listdir(str(tmp_path))) == ['test-1.spill', 'test-2.spill']
+
+    # The last chunk is always kept
+    store.dropBefore(times[-1] + 1.0)
+    assert store.getFirstIndex() == 9 * CHUNK
+    store.spill.close()
+
+
+def test_retentionDropsTheTableRows(tmp_path, monkeypatch, tableModel):
+    # Spilled after 100 s, dropped after 200 s
+    monkeypatch.setattr(globals, 'getSampleStorageSettings', 
+                        lambda: (100, 200, 0, str(tmp_path)))
+
+    dm = daqManager.DaqManager(None)
+    dm.resetPlotData([None, None], [np.float64, np.int64])
+    dm.resetDownsampleMetadata(2)
+    try:
+        fast, slow = dm.sampleData
+        assert fast.spill != None
+
+        # 1 kHz and 10 Hz variables for 400 s
+        fastTimes = np.arange(400000) * 0.001
+        slowTimes = np.arange(4000) * 0.1
+        for t0 in range(0, 400, 10):
+            f = (fastTimes >= t0) & (fastTimes < t0 + 10)
+            s = (slowTimes >= t0) & (slowTimes < t0 + 10)
+            fast.extend(fastTimes[f], np.sin(fastTimes[f]))
+            slow.extend(slowTimes[s], np.arange(len(slowTimes))[s])
+            dm.timeIndex.merge(np.concatenate([fastTimes[f], slowTimes[s]]))
+            dm.limitSampleMemory()
+            dm.dropTableRows(tableModel)
+
+        lastTime = fastTimes[-1]
+        assert fast.spilledChunks > 0
+        assert fast.getFirstIndex() > 0
+        assert fast.firstTime() <= lastTime - 200
+        assert fast.firstTime() > lastTime - 200 - fast.chunkSize * 0.001
+
+        # The slow variable fits into one chunk and keeps all samples
+        assert slow.getFirstIndex() == 0
+
+        # The table starts at the first retained sample of the fast variable
+        index = dm.timeIndex
+        assert tableModel.droppedRows > 0
+        assert index[0] == fast.firstTime()
+        assert len(index) == len(np.union1d(fastTimes[fastTimes >= index[0]], 
+                                            slowTimes[slowTimes >= index[0]]))
+        for row in [0, 1, len(index) // 2, len(index) - 1]:
+            i = index.getSampleIndex(row, 0)
+            assert fast.getTime(i) == index[row]
+            assert slow.getTime(index.getSampleIndex(row, 1)) <= index[row]
+    finally:
+        dm.closeSpills()
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,37 @@
+
+from __future__ import print_function
+
+import numpy as np
+
+from iconnect import ic
+import sampleStore, variable
+
+
+def test_symbolValueTypes():
+    SType = ic.SType
+    assert sampleStore.getSymbolValueType(SType(SType.tFloat, 32)) == np.float64
+    assert sampleStore.getSymbolValueType(SType(SType.tSigned, 8)) == np.int64
+    assert sampleStore.getSymbolValueType(SType(SType.tSigned, 64)) == np.int64
+    assert sampleStore.getSymbolValueType(SType(SType.tUnsigned, 32)) == np.int64
+    assert sampleStore.getSymbolValueType(SType(SType.tUnsigned, 64)) == np.uint64
+    assert sampleStore.getSymbolValueType(SType(SType.tCompound, 0)) == np.float64
+
+
+def test_variableValueTypesFallBackToFloat():
+    assert sampleStore.getValueType(None) == np.float64
+    assert sampleStore.getValueType(variable.DaqVariable.fromMemAddress(0x1000)) == np.int64
+    assert sampleStore.getValueType(variable.DaqVariable.fromVariable('position', None, 'struct coord', None)) == np.float64
+
+
+def test_startSamplingTakesTypesFromSymbols(createManager):
+    import fakeDaq
+    signals = [fakeDaq.FakeSignal('speed', typeName='float'),
+               fakeDaq.FakeSignal('count', isFloat=False, typeName='unsigned long long'),
+               fakeDaq.FakeSignal('delta', isFloat=False, typeName='signed char')]
+    dm = createManager(signals)
+    config = fakeDaq.createConfiguration(signals)
+    for varConfig in config.variableConfigs:
+        varConfig.variable = dm.getVariableByName(varConfig.name)
+
+    assert dm.startSampling(config.variableConfigs)
+    assert [store.valueType for store in dm.getRawData()] == [np.float64, np.uint64, np.int64]
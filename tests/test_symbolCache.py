@@ -0,0 +1,51 @@
+from __future__ import print_function
+
+import os
+
+import globals, symbolCache, symbolBenchmark, fakeConnect
+
+
+def test_storeReplacesTheCacheFile(tmp_path):
+    cache = symbolCache.SymbolCache(str(tmp_path))
+    key = (str(tmp_path / 'app.elf'), 1024, 1.0)
+
+    cache.store(key, [('first',)])
+    cache.store(key, [('second',)])
+    assert cache.load(key) == [('second',)]
+    assert os.listdir(str(tmp_path)) == [os.path.basename(cache.getFileName(key))]
+
+
+def test_failedStoreRemovesTheTemporaryFile(tmp_path, monkeypatch):
+    def failReplace(source, destination):
+        raise OSError('replace failed')
+    monkeypatch.setattr(symbolCache, 'replaceFile', failReplace)
+
+    cache = symbolCache.SymbolCache(str(tmp_path))
+    key = (str(tmp_path / 'app.elf'), 1024, 1.0)
+    cache.store(key, [('entry',)])
+    assert cache.load(key) == None
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_warmStartLoadsTheFakeTargetFromTheCache(tmp_path, monkeypatch):
+    monkeypatch.setattr(globals, 'symbolCacheDirectory', str(tmp_path / 'cache'))
+    target = symbolBenchmark.createFakeTarget(str(tmp_path), 200, 0.0)
+    cmgr = fakeConnect.ConnectionMgr(target)
+
+    # The cold start lists the variables and looks up every array
+    listed, resolved, count = symbolBenchmark.benchmarkStartup(cmgr)
+    assert target.calls['getVariables'] == 2
+    arrays = sum(1 for path, fileName, variables in target.downloadFiles 
+                 for name, typeName in variables if '[' in typeName)
+    assert target.calls['getExpressionType'] >= arrays > 0
+
+    # The warm start takes both from the cache
+    target.calls.clear()
+    warm = symbolBenchmark.benchmarkStartup(cmgr)
+    assert warm[2] == count
+    assert target.calls['getVariables'] == 0
+    assert target.calls['getExpressionType'] == 0
+
+    # Both runs of the benchmark list the same variables
+    cold, warm = symbolBenchmark.benchmarkStartups(cmgr, 1)
+    assert cold[3] == warm[3] == count
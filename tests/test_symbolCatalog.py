@@ -0,0 +1,87 @@
+from __future__ import print_function
+
+from PyQt5 import QtCore
+
+import symbolCatalog
+
+
+NAMES = ['counter', 'motorSpeed', 'speedLimit', 'SPEED_MAX', 'spindle',
+         'gearRatio', 'status.speed', 'sysPeriod']
+
+
+def test_findRanksPrefixThenSubstringThenFuzzy():
+    catalog = symbolCatalog.SymbolCatalog(NAMES)
+
+    # Prefix matches in case-insensitive order, then the names containing
+    # 'spe', then the names containing s..p..e, both in name order
+    assert catalog.find('spe') == ['SPEED_MAX', 'speedLimit', 'motorSpeed', 'status.speed',
+                                   'sysPeriod', 'spindle']
+
+    # Only fuzzy matches
+    assert catalog.find('spd') == ['SPEED_MAX', 'motorSpeed', 'speedLimit', 'spindle',
+                                   'status.speed', 'sysPeriod']
+    assert catalog.find('xyz') == []
+
+
+def test_findIsCaseInsensitive():
+    catalog = symbolCatalog.SymbolCatalog(NAMES)
+
+    assert catalog.find('SpEeD') == catalog.find('speed')
+    assert catalog.find('GEARRATIO') == ['gearRatio']
+
+
+def test_findStopsAtTheLimit():
+    catalog = symbolCatalog.SymbolCatalog(NAMES)
+
+    assert catalog.find('spe', limit=3) == ['SPEED_MAX', 'speedLimit', 'motorSpeed']
+    assert catalog.find('spe', limit=5) == ['SPEED_MAX', 'speedLimit', 'motorSpeed',
+                                            'status.speed', 'sysPeriod']
+    assert catalog.find('s', limit=1) == ['SPEED_MAX']
+    assert catalog.find('', limit=2) == ['SPEED_MAX', 'counter']
+    assert len(catalog.find('')) == len(NAMES)
+
+
+def test_findReturnsEveryNameOnce():
+    catalog = symbolCatalog.SymbolCatalog(NAMES + ['speed'])
+
+    # 'speed' matches as a prefix, a substring and a subsequence
+    found = catalog.find('speed')
+    assert found[0] == 'speed'
+    assert len(found) == len(set(found))
+
+
+def test_renameRebuildsTheIndexAndChangesTheRow(qapp):
+    catalog = symbolCatalog.SymbolCatalog(NAMES + ['samples'])
+    model = catalog.getModel()
+    changed = []
+    model.dataChanged.connect(lambda first, last: changed.append((first.row(), last.row())))
+
+    assert catalog.find('samples[') == []
+    row = catalog.names.index('samples')
+
+    catalog.rename('samples', 'samples[16]')
+
+    # The name keeps its row, only that row is reported as changed
+    assert changed == [(row, row)]
+    assert catalog.names[row] == 'samples[16]'
+    assert model.rowCount(QtCore.QModelIndex()) == len(NAMES) + 1
+    assert model.data(model.index(row, 0), QtCore.Qt.DisplayRole) == 'samples[16]'
+
+    assert catalog.find('samples[') == ['samples[16]']
+    assert catalog.find('[16') == ['samples[16]']
+    assert 'samples' not in catalog
+    assert 'samples[16]' in catalog
+
+
+def test_renameKeepsExistingNames(qapp):
+    catalog = symbolCatalog.SymbolCatalog(NAMES)
+    model = catalog.getModel()
+    changed = []
+    model.dataChanged.connect(lambda first, last: changed.append(first.row()))
+
+    catalog.rename('counter', 'spindle')
+    catalog.rename('missing', 'other')
+
+    assert changed == []
+    assert catalog.names == sorted(NAMES)
+    assert catalog.find('counter') == ['counter']
@@ -0,0 +1,157 @@
+from __future__ import print_function
+
+import time, threading
+
+import pytest
+
+import globals, daqManager, fakeDaq, fakeConnect, symbolCache, symbolBenchmark
+
+
+#
+# Holds the array lookups of the fake target at a gate, so the tests see
+# the variable list before, while and after the dimensions are resolved.
+# The first 'passed' lookups go through, 'blocked' is set when one waits.
+#
+class ExpressionGate():
+
+    passed = 0
+    opened = None
+    blocked = None
+
+    def __init__(self, passed):
+        self.passed = passed
+        self.opened = threading.Event()
+        self.blocked = threading.Event()
+
+    def wait(self, target, call):
+        if call == 'getExpressionType':
+            if self.passed > 0:
+                self.passed -= 1
+            else:
+                self.blocked.set()
+                self.opened.wait()
+        fakeDaq.FakeTarget.wait(target, call)
+
+
+@pytest.fixture
+def gatedManager(tmp_path, monkeypatch):
+    monkeypatch.setattr(globals, 'symbolCacheDirectory', str(tmp_path / 'cache'))
+    target = symbolBenchmark.createFakeTarget(str(tmp_path), 40, 0.001)
+    managers = []
+
+    def create(passed):
+        gate = ExpressionGate(passed)
+        target.wait = lambda call: gate.wait(target, call)
+        dm = daqManager.DaqManager(fakeConnect.ConnectionMgr(target))
+        managers.append((dm, gate))
+        return dm, gate, target
+
+    yield create
+    for dm, gate in managers:
+        gate.opened.set()
+        dm.stopSymbolLoader()
+
+
+#
+# Array variables of the fake target by their name before the lookup and
+# the full name with the dimensions
+#
+def getArrayNames(target):
+    names = {}
+    for fileIdx, (path, fileName, variables) in enumerate(target.downloadFiles):
+        suffix = ''
+        if fileIdx != target.defaultFile:
+            suffix = ',,' + fileName
+        for name, typeName in variables:
+            if '[' in typeName:
+                names[name + suffix] = name + typeName[typeName.index('['):] + suffix
+    return names
+
+
+def waitForSymbols(dm):
+    deadline = time.time() + 30.0
+    while dm.isResolvingSymbols():
+        assert time.time() < deadline
+        time.sleep(0.005)
+        dm.applyResolvedSymbols()
+
+
+#
+# Returns the cache entries of the download files by full name
+#
+def loadCacheEntries(target):
+    cache = symbolCache.SymbolCache(globals.getSymbolCacheDirectory())
+    entries = {}
+    for fileIdx, (path, fileName, variables) in enumerate(target.downloadFiles):
+        suffix = ''
+        if fileIdx != target.defaultFile:
+            suffix = ',,' + fileName
+        for entry in cache.load(cache.getKey(path)):
+            entries[entry[6] + suffix] = entry
+    return entries
+
+
+def test_variableListIsUsableBeforeTheDimensionsAreResolved(gatedManager):
+    dm, gate, target = gatedManager(0)
+    arrays = getArrayNames(target)
+    assert len(arrays) > 0
+
+    # Listed without a single array lookup finished
+    assert gate.blocked.wait(10.0)
+    assert dm.isResolvingSymbols()
+    assert dm.applyResolvedSymbols() == 0
+    assert dm.getUnresolvedSymbolCount() == len(arrays)
+
+    catalog = dm.getSymbolCatalog()
+    for name in arrays:
+        assert name in catalog
+    assert 'var0' in catalog
+    assert catalog.find('var1', limit=1) == ['var1,,boot.elf']
+
+    # Resolved arrays are renamed in the catalog
+    gate.opened.set()
+    waitForSymbols(dm)
+    assert dm.getUnresolvedSymbolCount() == 0
+    for name, fullName in arrays.items():
+        assert name not in catalog
+        assert fullName in catalog
+    assert len(catalog) == len(dm.getVariables())
+
+    entries = loadCacheEntries(target)
+    assert all(entry[3] for entry in entries.values())
+
+
+def test_stoppedLoaderKeepsTheUnresolvedArraysInTheCache(gatedManager):
+    # The first array has one dimension, two lookups
+    dm, gate, target = gatedManager(2)
+    arrays = getArrayNames(target)
+
+    assert gate.blocked.wait(10.0)
+    dm.symbolLoader.stopRunning()
+    gate.opened.set()
+    dm.stopSymbolLoader()
+    assert not dm.isResolvingSymbols()
+
+    unresolved = set(dm.unresolvedArrays)
+    assert 0 < len(unresolved) < len(arrays)
+
+    catalog = dm.getSymbolCatalog()
+    entries = loadCacheEntries(target)
+    for name, fullName in arrays.items():
+        if name in unresolved:
+            assert name in catalog
+            assert entries[name][3] == False
+        else:
+            assert fullName in catalog
+            assert entries[fullName][3] == True
+
+    # The next start takes the resolved arrays from the cache and looks up
+    # only the others
+    target.calls.clear()
+    gate = ExpressionGate(1 << 30)
+    target.wait = lambda call: gate.wait(target, call)
+    dm = daqManager.DaqManager(fakeConnect.ConnectionMgr(target))
+    assert target.calls['getVariables'] == 0
+    assert set(dm.unresolvedArrays) == unresolved
+    waitForSymbols(dm)
+    assert dm.getUnresolvedSymbolCount() == 0
@@ -0,0 +1,70 @@
+from __future__ import print_function
+
+import widgets
+
+
+class FirstIndexStore():
+
+    def getFirstIndex(self):
+        return 0
+
+
+def createColumn():
+    return widgets.DaqTableColumn(0, None, FirstIndexStore(), None)
+
+
+def test_invalidateRowsClearsTheReplacedRows():
+    column = createColumn()
+    for row in [7, 3, 12, 5, 3]:
+        column.setCell(row, 'r%d' % row)
+
+    column.invalidateRows(6)
+    assert sorted(column.cells) == [3, 5]
+    assert column.cellRows == [3, 5]
+    assert column.getCell(7) == None
+
+    column.setCell(9, 'r9')
+    column.dropFirstRows(4)
+    assert column.cells == {1: 'r5', 5: 'r9'}
+    assert column.cellRows == [1, 5]
+
+
+#
+# Cell dictionary that counts the cells visited by iterating over it and
+# the deleted ones
+#
+class CountingCells(dict):
+
+    visited = 0
+    deleted = 0
+
+    def __iter__(self):
+        for row in dict.__iter__(self):
+            self.visited += 1
+            yield row
+
+    def items(self):
+        self.visited += len(self)
+        return dict.items(self)
+
+    def __delitem__(self, row):
+        self.deleted += 1
+        dict.__delitem__(self, row)
+
+
+def test_invalidateRowsDoesNotScanTheCache():
+    column = createColumn()
+    for row in range(widgets.TABLE_CELL_CACHE_SIZE - 1):
+        column.setCell(row, 'x')
+    last = widgets.TABLE_CELL_CACHE_SIZE - 2
+
+    # Invalidating the last row on every ingest visits only that cell
+    column.cells = CountingCells(column.cells)
+    for i in range(100):
+        column.invalidateRows(last)
+        column.setCell(last, 'x')
+
+    assert column.cells.visited == 0
+    assert column.cells.deleted == 100
+    assert len(column.cells) == widgets.TABLE_CELL_CACHE_SIZE - 1
+    assert column.cellRows == list(range(widgets.TABLE_CELL_CACHE_SIZE - 1))
@@ -0,0 +1,194 @@
+from __future__ import print_function
+
+import numpy as np
+import pytest
+from PyQt5 import QtCore
+
+import globals, widgets, fakeDaq
+
+
+#
+# Application window of a DaqTableModel: the DaqManager, the configuration
+# and the chart, which tells whether the acquisition is running
+#
+class TableWindow(QtCore.QObject):
+
+    daqManager = None
+    daqIdeaConfig = None
+    canvasGraph = None
+    running = False
+
+    def __init__(self, daqManager, config):
+        QtCore.QObject.__init__(self)
+        self.daqManager = daqManager
+        self.daqIdeaConfig = config
+        self.canvasGraph = self
+
+    def isAnimationRunning(self):
+        return self.running
+
+
+#
+# Table model on a DaqManager with empty stores of the signals, and the
+# sample stores the acquisition is fed from. The views are replaced by a
+# count of the inserted and removed rows.
+#
+class TableFixture():
+
+    window = None
+    model = None
+    dm = None
+    source = None
+    viewRows = 0
+
+    def __init__(self, dm, signals, duration):
+        config = fakeDaq.createConfiguration(signals)
+        dm.resetPlotData(config.variableConfigs, [signal.getValueType() for signal in signals])
+        dm.wasConfigured = True
+
+        self.dm = dm
+        self.source = fakeDaq.createStores(signals, duration)
+        self.window = TableWindow(dm, config)
+        self.model = widgets.DaqTableModel(self.window, config)
+        self.model.enabledVars = list(range(len(signals)))
+
+        self.model.rowsInserted.connect(self.rowsInserted)
+        self.model.rowsRemoved.connect(self.rowsRemoved)
+
+    def rowsInserted(self, parent, first, last):
+        self.viewRows += last - first + 1
+
+    def rowsRemoved(self, parent, first, last):
+        self.viewRows -= last - first + 1
+
+    #
+    # Ingests the source samples in [t0, t1) of the given DAQ indices (all
+    # if None) like DaqManager.deQueueSamplingData()
+    #
+    def ingest(self, t0, t1, daqIndices=None):
+        if daqIndices == None:
+            daqIndices = range(len(self.source))
+
+        allTimes = []
+        for daqIdx in daqIndices:
+            store = self.dm.sampleData[daqIdx]
+            source = self.source[daqIdx]
+            i0 = source.searchTime(t0, 'left')
+            i1 = source.searchTime(t1, 'left')
+            if i1 > i0:
+                store.extend(source.getTimes(i0, i1), source.getValues(i0, i1))
+                allTimes.append(source.getTimes(i0, i1))
+
+        r0 = self.dm.timeIndex.merge(np.concatenate(allTimes))
+        self.model.invalidateRows(r0)
+
+    #
+    # Drops the first k rows like DaqManager.dropTableRows()
+    #
+    def dropFirstRows(self, k):
+        self.model.beginDropFirstRows(k)
+        self.dm.timeIndex.dropFirstRows(k)
+        self.model.endDropFirstRows(k)
+
+    def getRowCount(self):
+        return self.model.rowCount(QtCore.QModelIndex())
+
+    def getText(self, r, c):
+        return self.model.data(self.model.index(r, c), QtCore.Qt.DisplayRole)
+
+    #
+    # Checks the shown rows against the time index: the row time and the
+    # formatted last value of every variable at that time
+    #
+    def checkRows(self):
+        rowCount = self.getRowCount()
+        assert rowCount == self.viewRows
+
+        timeIndex = self.dm.timeIndex
+        for r in range(rowCount):
+            t = timeIndex[self.model.rowOffset + r]
+            assert self.getText(r, 0) == t
+
+            for c, store in enumerate(self.dm.sampleData, 1):
+                i = store.searchTime(t, 'right') - 1
+                formatter = globals.formatterStrings[self.window.daqIdeaConfig.variableConfigs[c-1].format]
+                assert self.getText(r, c) == formatter.format(store.getValue(i))
+
+
+@pytest.fixture
+def table(qapp, createManager):
+    signals = fakeDaq.createSignals(2, 1000.0)
+    signals[1].rate = 300.0
+    return TableFixture(createManager(signals), signals, 1.0)
+
+
+def test_publishRowsShowsTheMergedRows(table):
+    table.ingest(0.0, 0.1)
+    assert table.getRowCount() == 0
+
+    table.model.publishRows()
+    assert table.getRowCount() == len(table.dm.timeIndex)
+    table.checkRows()
+
+    # Samples of the slow variable arriving after the ones of the fast
+    # variable replace the published rows from their first time on. The
+    # cached cells of the replaced rows are formatted again.
+    table.ingest(0.1, 0.2, [0])
+    table.model.publishRows()
+    table.checkRows()
+
+    changed = []
+    table.model.dataChanged.connect(lambda first, last: changed.append((first.row(), last.row())))
+    published = table.getRowCount()
+    firstTime = table.source[1].getTime(table.source[1].searchTime(0.1, 'left'))
+    r0 = table.dm.timeIndex.searchTime(firstTime, 'left')
+
+    table.ingest(0.1, 0.2, [1])
+    table.model.publishRows()
+    assert 0 < r0 < published
+    assert changed == [(r0, published - 1)]
+    assert table.getRowCount() == len(table.dm.timeIndex) > published
+    table.checkRows()
+
+
+def test_dropFirstRowsKeepsTheRowsInStep(table):
+    table.ingest(0.0, 0.2)
+    table.model.publishRows()
+    table.checkRows()
+    rows = table.getRowCount()
+
+    table.dropFirstRows(50)
+    assert table.getRowCount() == rows - 50
+    assert table.model.getVerticalHeaderName(0) == 1
+    table.checkRows()
+
+    # Rows merged but not published yet are dropped from the index only
+    table.ingest(0.2, 0.3)
+    k = table.getRowCount() + 20
+    table.dropFirstRows(k)
+    assert table.getRowCount() == 0
+    table.model.publishRows()
+    assert table.getRowCount() == len(table.dm.timeIndex)
+    table.checkRows()
+
+
+def test_windowedTableShowsTheLastRows(table):
+    table.model.setWindowMode(globals.TABLE_WINDOW_LAST_ROWS, 100)
+    table.window.running = True
+
+    for k in range(5):
+        table.ingest(k * 0.1, (k + 1) * 0.1)
+        table.model.publishRows()
+        assert table.getRowCount() == 100
+        assert table.model.rowOffset == len(table.dm.timeIndex) - 100
+        table.checkRows()
+
+    table.dropFirstRows(len(table.dm.timeIndex) - 150)
+    assert table.getRowCount() == 100
+    table.checkRows()
+
+    # Stopped, all rows are shown again
+    table.window.running = False
+    table.model.publishRows()
+    assert table.getRowCount() == len(table.dm.timeIndex) == 150
+    table.checkRows()
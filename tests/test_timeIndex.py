@@ -0,0 +1,102 @@
+from __future__ import print_function
+
+import bisect
+
+import numpy as np
+import pytest
+
+import sampleStore, timeIndex
+
+
+#
+# Row times and, for every row and store, the index of the last sample at
+# or before the row time computed from scratch
+#
+def bruteForceRows(stores):
+    storeTimes = [store.getTimes(0, len(store)).tolist() for store in stores]
+    rowTimes = sorted(set(t for times in storeTimes for t in times))
+    sampleIndices = []
+    for t in rowTimes:
+        sampleIndices.append([bisect.bisect_right(times, t) - 1 for times in storeTimes])
+    return rowTimes, sampleIndices
+
+
+def checkIndex(index, stores, firstRow=0):
+    rowTimes, sampleIndices = bruteForceRows(stores)
+    rowTimes = rowTimes[firstRow:]
+    sampleIndices = sampleIndices[firstRow:]
+
+    assert len(index) == len(rowTimes)
+    assert index.getTimes().tolist() == rowTimes
+    for row, t in enumerate(rowTimes):
+        for storeIdx, store in enumerate(stores):
+            i = sampleIndices[row][storeIdx]
+            if i < 0:
+                # Rows before the first sample show it
+                expected = 0 if len(store) > 0 else -1
+            else:
+                expected = i
+            assert index.getSampleIndex(row, storeIdx) == expected
+            assert index.isRealValue(row, storeIdx) == (i >= 0 and store.getTime(i) == t)
+
+
+#
+# Batches of samples per store. The stores lag each other, so batches
+# arrive out of order, and times repeat within and across stores.
+#
+@pytest.mark.parametrize('seed', range(5))
+def test_mergedBatchesMatchTheBruteForceRows(seed):
+    rng = np.random.RandomState(seed)
+    stores = [sampleStore.SampleStore(np.float64, chunkSize=64) for i in range(3)]
+    index = timeIndex.TimeIndex(stores)
+    lastTimes = [0.0] * len(stores)
+
+    for batch in range(40):
+        storeIdx = rng.randint(len(stores))
+        n = rng.randint(0, 30)
+        times = lastTimes[storeIdx] + np.sort(rng.randint(0, 20, n)) * 0.5
+        if n > 0:
+            lastTimes[storeIdx] = times[-1]
+        stores[storeIdx].extend(times, times * 2)
+
+        r0 = index.merge(times)
+        if n == 0:
+            assert r0 == None
+        else:
+            assert index.getTimes()[r0] <= times.min()
+        checkIndex(index, stores)
+
+
+def test_dropFirstRowsKeepsTheRemainingRows():
+    stores = [sampleStore.SampleStore(np.float64, chunkSize=16) for i in range(2)]
+    index = timeIndex.TimeIndex(stores)
+
+    for k in range(0, 3000, 100):
+        times = np.arange(k, k + 100) * 0.25
+        stores[0].extend(times, times)
+        stores[1].extend(times[::3] + 0.1, times[::3])
+        index.merge(np.concatenate([times, times[::3] + 0.1]))
+
+        if k % 500 == 0:
+            index.dropFirstRows(50)
+
+    # Dropped rows are reused when the arrays grow
+    dropped = len(bruteForceRows(stores)[0]) - len(index)
+    assert dropped == 6 * 50
+    checkIndex(index, stores, dropped)
+    assert index.searchTime(index[10]) == 10
+
+    index.dropFirstRows(len(index) + 5)
+    assert len(index) == 0
+
+
+def test_mappedIndexIsReadOnly(tmp_path):
+    store = sampleStore.SampleStore(np.float64)
+    times = np.arange(100) * 0.5
+    store.extend(times, times)
+
+    index = timeIndex.MappedTimeIndex([store], [times[:40], times[40:]], str(tmp_path))
+    checkIndex(index, [store])
+    with pytest.raises(ValueError):
+        index.merge(np.array([100.0]))
+    assert index.close()